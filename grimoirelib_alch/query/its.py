@@ -375,6 +375,26 @@ class Query (GrimoireQuery):
         return query
 
 
+    def group_by_period (self, period = "months", date = "change"):
+        """Group by time period
+
+        Parameters
+        ----------
+
+        period: {"days" | "weeks" | "months" | "years"}
+           Period to group by (default: months)
+        date: {"change"}
+           Date to group by (default: change)
+
+        """
+
+        if date == "change":
+            date_field = DB.Changes.changed_on
+        else:
+            raise Exception ("group_by_period: Unknown kind of date: %s." \
+                                 % date)
+        return self._group_by_period(date_field, period)
+
     def group_by_person (self):
         """Group by person
 
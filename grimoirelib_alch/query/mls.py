@@ -401,6 +401,32 @@ class Query (GrimoireQuery):
         return query
 
 
+    def group_by_period (self, period = "months", date = "arrival"):
+        """Group by time period
+
+        Parameters
+        ----------
+
+        period: {"days" | "weeks" | "months" | "years"}
+           Period to group by (default: months)
+        date: {"arrival"|"first"}
+           consider either arrival date or first date (default: arrival)
+
+        """
+
+        query = self
+        if DB.Messages not in self.joined:
+            query = query.join(DB.Messages)
+            self.joined.append (DB.Messages)
+        if date == "arrival":
+            date_field = DB.Messages.arrival_date
+        elif date == "first":
+            date_field = DB.Messages.first_date
+        else:
+            raise Exception ("group_by_period: Unknown kind of date: %s." \
+                                 % date)
+        return query._group_by_period(date_field, period)
+
     def group_by_person (self):
         """Group by person
 
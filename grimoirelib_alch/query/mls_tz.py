@@ -26,6 +26,7 @@
 
 from sqlalchemy.sql import label
 from sqlalchemy import func
+from common import int_div
 from mls import DB
 from mls import Query as MLSQuery
 
@@ -48,7 +49,7 @@ class Query (MLSQuery):
 
         query = self.add_columns(
             label("tz",
-                  ((DB.Messages.first_date_tz.op('div')(3600) + 36) % 24) - 12),
+                  ((int_div(DB.Messages.first_date_tz, 3600) + 36) % 24) - 12),
             label("messages",
                   func.count(func.distinct(DB.Messages.message_ID))),
             label("authors",
@@ -736,14 +736,27 @@ class Query (GrimoireQuery):
             .filter (DB.Enrollments.organization_id.in_(list))
         return query
 
-    def group_by_period (self):
-        """Group by time period (per month)"""
+    def group_by_period (self, period = "months", date = "commit"):
+        """Group by time period
 
-        return self \
-            .add_columns (label("month", func.month(DB.SCMLog.date)),
-                          label("year", func.year(DB.SCMLog.date))) \
-            .group_by("month", "year").order_by("year", "month")
+        Parameters
+        ----------
+
+        period: {"days" | "weeks" | "months" | "years"}
+           Period to group by (default: months)
+        date: {"commit" | "author"}
+           Date to group by (default: commit)
 
+        """
+
+        if date == "author":
+            scmlog_date = DB.SCMLog.author_date
+        elif date == "commit":
+            scmlog_date = DB.SCMLog.date
+        else:
+            raise Exception ("group_by_period: Unknown kind of date: %s." \
+                                 % date)
+        return self._group_by_period(scmlog_date, period)
 
     def group_by_person (self):
         """Group by person
@@ -790,24 +803,6 @@ class Query (GrimoireQuery):
         query = query.group_by("repo").order_by("repo")
         return query
 
-    def timeseries (self):
-        """Return a TimeSeries object.
-
-        The query has to include a group_by_period filter.
-
-        """
-
-        data = []
-        for row in self.all():
-            # Extract real values (entries which are not year or month)
-            values = tuple(row[i] for i, k in enumerate(row.keys())
-                           if not k in ("year", "month"))
-            data.append ((datetime (row.year, row.month, 1),
-                         values))
-        return TimeSeries (period = "months",
-                           start = self.start, end = self.end,
-                           data = data)
-
     def activity (self):
         """Return an ActivityList object.
 
@@ -26,6 +26,7 @@
 
 from sqlalchemy.sql import label
 from sqlalchemy import func
+from common import int_div
 from scm import DB
 from scm import Query as SCMQuery
 
@@ -48,7 +49,7 @@ class Query (SCMQuery):
 
         query = self.add_columns(
             label("tz",
-                  ((DB.SCMLog.author_date_tz.op('div')(3600) + 36) % 24) - 12),
+                  ((int_div(DB.SCMLog.author_date_tz, 3600) + 36) % 24) - 12),
             label("commits", func.count(func.distinct(DB.SCMLog.id))),
             label("authors", func.count(func.distinct(DB.SCMLog.author_id))))
         return query
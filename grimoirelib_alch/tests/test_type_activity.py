@@ -25,7 +25,7 @@
 from support import equal_JSON
 from grimoirelib_alch.type.activity import Period, ActivityList
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.util import KeyedTuple
 from jsonpickle import encode
 import unittest
@@ -85,6 +85,35 @@ class TestActivityList (unittest.TestCase):
                                         labels = rowlabels)))
         activity_json = encode(list, unpicklable=False)
         self.assertTrue( equal_JSON( activity_json, correct_json ))
+        self.assertTrue( equal_JSON( list.json(), correct_json ))
+
+    def test_activity_active (self):
+        """Test ActivityList active, maxend and idle"""
+
+        rowlabels = ["person_id", "name", "firstdate", "lastdate"]
+        list = ActivityList((KeyedTuple([12, "Fulano Larguiño",
+                                         datetime(2011,12,1),
+                                         datetime(2012,11,1)],
+                                        labels = rowlabels),
+                             KeyedTuple([3, "Mengana Corta",
+                                         datetime(2010,2,3),
+                                         datetime(2013,2,3)],
+                                        labels = rowlabels),
+                             KeyedTuple([7, "Zutano",
+                                         datetime(2013,1,1),
+                                         datetime(2013,1,5)],
+                                        labels = rowlabels)))
+        self.assertEqual (list.maxend(), datetime(2013,2,3))
+        active = list.active(after = datetime(2012,12,1))
+        self.assertEqual ([actor["id"] for actor in active.list], [3, 7])
+        active = list.active(before = datetime(2012,1,1))
+        self.assertEqual ([actor["id"] for actor in active.list], [12, 3])
+        active = list.active(after = datetime(2012,11,1),
+                             before = datetime(2012,12,31))
+        self.assertEqual ([actor["id"] for actor in active.list], [12, 3])
+        idle = list.idle(datetime(2013,1,1))
+        self.assertEqual ([actor["age"] for actor in idle.list],
+                          [timedelta(days=61), 0, 0])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## Unit tests for timeseries.py
+##
+## Authors:
+##   Jesus M. Gonzalez-Barahona <jgb@bitergia.com>
+##
+
+from support import equal_JSON
+from grimoirelib_alch.type.timeseries import TimeSeries
+
+from datetime import datetime
+import unittest
+
+
+class TestTimeSeries (unittest.TestCase):
+    """Unit tests for class TimeSeries"""
+
+    def test_months (self):
+        """Test months time series, with periods with no values"""
+
+        ts = TimeSeries ("months", start = datetime(2013,11,13),
+                         end = datetime(2014,3,1),
+                         data = [(datetime(2014,1,1), (4L, 5L)),
+                                 (datetime(2013,11,1), (1L, 2L))])
+        self.assertEqual (ts.data,
+                          [(datetime(2013,11,13), (1L, 2L)),
+                           (datetime(2013,12,13), (0L, 0L)),
+                           (datetime(2014,1,13), (4L, 5L)),
+                           (datetime(2014,2,13), (0L, 0L)),
+                           (datetime(2014,3,13), (0L, 0L))])
+
+    def test_periods (self):
+        """Test days, weeks and years time series"""
+
+        data = [(datetime(2014,1,31,10), (1,)),
+                (datetime(2014,2,3,10), (2,))]
+        ts = TimeSeries ("days", start = datetime(2014,1,30), end = None,
+                         data = data)
+        self.assertEqual ([value for (date, value) in ts.data],
+                          [(0,), (1,), (0,), (0,), (2,)])
+        # Weeks start on monday: 2014-02-03 is in the second week
+        ts = TimeSeries ("weeks", start = datetime(2014,1,30), end = None,
+                         data = data)
+        self.assertEqual (ts.data,
+                          [(datetime(2014,1,30), (1,)),
+                           (datetime(2014,2,6), (2,))])
+        ts = TimeSeries ("years", start = datetime(2012,2,29),
+                         end = datetime(2014,1,1), data = data[0:1])
+        self.assertEqual (ts.data,
+                          [(datetime(2012,2,29), (0,)),
+                           (datetime(2013,2,28), (0,)),
+                           (datetime(2014,2,28), (1,))])
+
+    def test_errors (self):
+        """Test wrong periods and data"""
+
+        data = [(datetime(2014,1,1), (1,)), (datetime(2014,1,20), (2,))]
+        self.assertRaises (Exception, TimeSeries, "decades",
+                           None, None, data)
+        self.assertRaises (Exception, TimeSeries, "months",
+                           None, None, data)
+        self.assertRaises (Exception, TimeSeries, "days",
+                           datetime(2014,1,2), None, data)
+
+    def test_json (self):
+        """Test TimeSeries producing JSON"""
+
+        correct_json = """
+{
+    "first_date": "2013-12-01T00:00:00",
+    "last_date": "2014-02-01T00:00:00",
+    "period": "months",
+    "values": [["2013-12-01T00:00:00", [1, 2]],
+               ["2014-01-01T00:00:00", [0, 0]],
+               ["2014-02-01T00:00:00", [3, 4]]]
+}
+"""
+        ts = TimeSeries ("months", start = None, end = None,
+                         data = [(datetime(2013,12,1), (1, 2)),
+                                 (datetime(2014,2,1), (3, 4))])
+        self.assertTrue (equal_JSON (ts.json(), correct_json))
+        self.assertTrue (equal_JSON (ts.json(pretty=True), correct_json))
+
+if __name__ == "__main__":
+    unittest.main()
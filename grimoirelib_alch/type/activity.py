@@ -25,7 +25,9 @@
 
 from datetime import datetime, timedelta
 from sqlalchemy.util import KeyedTuple
+import json
 import jsonpickle
+import numpy as np
 
 class DatetimeHandler(jsonpickle.handlers.BaseHandler):
     def flatten(self, obj, data):
@@ -163,6 +165,11 @@ class ActivityList:
 
     List of actors, with activity information (start and end dates)
     for each of them.
+
+    Actors are stored in columns (numpy arrays with the id, name, start
+    and end of activity of each actor). Indexes with actors sorted by
+    start and by end are built the first time they are needed, so that
+    active() finds actors in a period with binary searches.
     """
 
     def __init__ (self, list = []):
@@ -179,18 +186,88 @@ class ActivityList:
 
         """
 
-        self.list = []
+        ids, names, starts, ends = [], [], [], []
         for entry in list:
-            item = {}
-            item["id"] =  entry.person_id
-            item["name"] = entry.name
-            item["period"]  = Period(start = entry.firstdate,
-                                     end = entry.lastdate)
-            self.list.append(item)
+            ids.append(entry.person_id)
+            names.append(entry.name)
+            starts.append(entry.firstdate)
+            ends.append(entry.lastdate)
+        self._set_columns(ids, names, starts, ends)
+
+    def _set_columns (self, ids, names, starts, ends):
+        """Set the columns of the list.
+
+        Parameters
+        ----------
+
+        ids, names: list or numpy.array
+           Ids and names of actors
+        starts, ends: list of datetime.datetime or numpy.array
+           Start and end of activity of actors
+
+        """
+
+        self.ids = np.array(ids)
+        self.names = np.empty(len(names), dtype=object)
+        self.names[:] = names
+        self.starts = np.array(starts, dtype="M8[us]")
+        self.ends = np.array(ends, dtype="M8[us]")
+        # Indexes by start and end, built by _sorted()
+        self._index = None
+
+    def _select (self, rows):
+        """Get an ActivityList object with the actors in rows.
+
+        """
+
+        selected = ActivityList()
+        selected._set_columns(self.ids[rows], self.names[rows],
+                              self.starts[rows], self.ends[rows])
+        return selected
+
+    def _sorted (self):
+        """Indexes of actors sorted by start and by end.
+
+        Returns
+        -------
+
+        tuple: (by_start, sorted_starts, by_end, sorted_ends)
+
+        """
+
+        if self._index is None:
+            by_start = np.argsort(self.starts, kind="mergesort")
+            by_end = np.argsort(self.ends, kind="mergesort")
+            self._index = (by_start, self.starts[by_start],
+                           by_end, self.ends[by_end])
+        return self._index
+
+    @property
+    def list (self):
+        """List of actors, as dictionaries.
+
+        Each dictionary includes id, name and period (Period object)
+        for an actor.
+
+        """
+
+        return [{"id": id, "name": name,
+                 "period": Period(start = start, end = end)}
+                for (id, name, start, end) in zip(self.ids.tolist(),
+                                                  self.names.tolist(),
+                                                  self.starts.tolist(),
+                                                  self.ends.tolist())]
+
+    def __len__ (self):
+
+        return len(self.ids)
 
     def __eq__(self, other):
         return (isinstance(other, self.__class__)
-            and self.__dict__ == other.__dict__)
+            and np.array_equal(self.ids, other.ids)
+            and np.array_equal(self.names, other.names)
+            and np.array_equal(self.starts, other.starts)
+            and np.array_equal(self.ends, other.ends))
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -215,16 +292,44 @@ class ActivityList:
     def __setstate__(self, state):
         """Set the state from pckling.
 
-        Not really used, just needed by jsonpickle.
-
         """
 
-        self.list = state
+        self._set_columns([actor["id"] for actor in state],
+                          [actor["name"] for actor in state],
+                          [actor["period"].start for actor in state],
+                          [actor["period"].end for actor in state])
 
     def json (self):
-        """Produce a JSON string from the object."""
+        """Produce a JSON string from the object.
 
-        return jsonpickle.encode(self, unpicklable=False)
+        Same JSON produced by jsonpickle, but built directly from the
+        columns.
+
+        """
+
+        starts = [date.isoformat() for date in self.starts.tolist()]
+        ends = [date.isoformat() for date in self.ends.tolist()]
+        list = [{"id": id, "name": name,
+                 "period": {"start": start, "end": end}}
+                for (id, name, start, end) in zip(self.ids.tolist(),
+                                                  self.names.tolist(),
+                                                  starts, ends)]
+        return json.dumps(list, sort_keys=True, indent=4,
+                          separators=(',', ': '),
+                          ensure_ascii=False, encoding="utf8")
+
+    def long_format (self):
+        """Get long version of the object.
+
+        Dictionary with the list of values for each column
+        (id, name, start, end).
+
+        """
+
+        return {"id": self.ids.tolist(),
+                "name": self.names.tolist(),
+                "start": self.starts.tolist(),
+                "end": self.ends.tolist()}
 
     def maxend (self):
         """Obtain the maximum end date for all the periods.
@@ -236,11 +341,7 @@ class ActivityList:
 
         """
 
-        maxend = self.list[0]["period"].end
-        for actor in self.list:
-            if maxend < actor["period"].end:
-                maxend = actor["period"].end
-        return maxend
+        return self._sorted()[3][-1].tolist()
 
     def active (self, after = None, before = None):
         """Get an ActivityList object with thse active between dates.
@@ -265,13 +366,27 @@ class ActivityList:
 
         """
 
-        active = ActivityList()
-        active.list = [actor for actor in self.list
-                       if (after == None or
-                           actor["period"].end >= after) and
-                          (before == None or
-                           actor["period"].start <= before)]
-        return active
+        (by_start, starts, by_end, ends) = self._sorted()
+        rows = None
+        if after is not None:
+            # Actors with end >= after
+            rows = by_end[np.searchsorted(ends, np.datetime64(after, "us"),
+                                          side = "left"):]
+        if before is not None:
+            # Actors with start <= before
+            started = by_start[:np.searchsorted(starts,
+                                                np.datetime64(before, "us"),
+                                                side = "right")]
+            if rows is None:
+                rows = started
+            elif len(started) < len(rows):
+                rows = started[self.ends[started] >= np.datetime64(after, "us")]
+            else:
+                rows = rows[self.starts[rows] <= np.datetime64(before, "us")]
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        # Actors are kept in the same order
+        return self._select(np.sort(rows))
 
 
     def age (self, date, offset = timedelta(0)):
@@ -298,10 +413,12 @@ class ActivityList:
 
         """
 
-        ages = [{"id": actor["id"],
-                 "name": actor["name"],
-                 "age": date - actor["period"].start + offset}
-                for actor in self.list]
+        ages = np.datetime64(date, "us") - self.starts + \
+            np.timedelta64(offset)
+        ages = [{"id": id, "name": name, "age": age}
+                for (id, name, age) in zip(self.ids.tolist(),
+                                           self.names.tolist(),
+                                           ages.tolist())]
         return ActorsDuration(ages, date)
 
     def idle (self, date, offset = timedelta(0)):
@@ -327,18 +444,14 @@ class ActivityList:
 
         """
 
-        list = []
-        for actor in self.list:
-            id = actor["id"]
-            name = actor["name"]
-            if actor["period"].end >= date:
-                idle = 0
-            else:
-                idle = date - actor["period"].end + offset
-            list.append ({"id": id,
-                          "name": name,
-                          "age": idle}
-                         )
+        date64 = np.datetime64(date, "us")
+        idles = (date64 - self.ends + np.timedelta64(offset)).tolist()
+        active = (self.ends >= date64).tolist()
+        list = [{"id": id, "name": name,
+                 "age": 0 if is_active else idle}
+                for (id, name, idle, is_active) in zip(self.ids.tolist(),
+                                                       self.names.tolist(),
+                                                       idles, active)]
         return ActorsDuration(list, date)
 
 
@@ -23,8 +23,8 @@
 ##
 
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
 from json import dumps
+import numpy as np
 
 def json_serial(obj):
     """JSON serializer for objects not serializable by default json code"""
@@ -41,13 +41,23 @@ class TimeSeries:
     - start: starting date for the time series (datetime)
     - end: end date for the time series (datetime)
     - period: sampling period (string)
-    - data: list of tuples, each tuple being:
+    - dates: time for the beginning of each period (numpy datetime64 array)
+    - values: values for each period (numpy array, one row per period)
+    The index in dates and values is the period number, starting with 0.
+
+    data is available too, as a list of tuples, each tuple being:
        - time for the beginning of the period (datetime)
-       - string for representing the name of the period (datetime)
        - tuple with the values for that period
-       The index in data is the period number, starting with 0.
     """
 
+    # Supported periods, with their numpy datetime64 unit
+    periods = {"days": "D", "weeks": "W", "months": "M", "years": "Y"}
+    # Names of periods used by the rest of *Grimoire
+    periods["day"] = periods["days"]
+    periods["week"] = periods["weeks"]
+    periods["month"] = periods["months"]
+    periods["year"] = periods["years"]
+
     def _min_date (self, data):
         """Calculate min date for all items in data
 
@@ -55,11 +65,7 @@ class TimeSeries:
             (date, values).
         """
 
-        min = data[0][0]
-        for (date, value) in data:
-            if date < min:
-                min = date
-        return min
+        return min(date for (date, value) in data)
 
     def _max_date (self, data):
         """Calculate maximum date for all items in data
@@ -72,20 +78,52 @@ class TimeSeries:
 
         """
 
-        max = data[0][0]
-        for (date, value) in data:
-            if date > max:
-                max = date
-        return max
+        return max(date for (date, value) in data)
+
+    def _periods (self, dates):
+        """Get period ids (from self.start) corresponding to dates
+
+        Periods are calendar days, weeks (starting on monday), months
+        or years, and period ids are integers, starting at 0.
+
+        Parameters
+        ----------
+
+        dates: numpy datetime64 array
+
+        """
+
+        unit = TimeSeries.periods[self.period]
+        if unit == "W":
+            # numpy weeks start on thursday (1970-01-01 was a thursday)
+            days = dates.astype("M8[D]").astype(np.int64)
+            start = np.datetime64(self.start, "D").astype(np.int64)
+            return (days + 3) // 7 - (start + 3) // 7
+        start = np.datetime64(self.start, unit)
+        return (dates.astype("M8[" + unit + "]") - start).astype(np.int64)
 
-    def _period (self, date):
-        """Get period id (from self.start) corresponding to a date
+    def _period_dates (self, periods):
+        """Dates for the beginning of the periods
+
+        Each period begins the same time (day of year, day of month or
+        time of day) self.start does, or in the last day of the month
+        if the month is shorter.
 
-        period ids are integers, starting at 0
         """
 
-        return date.year * 12 + date.month - \
-            self.start.year * 12 - self.start.month
+        start = np.datetime64(self.start, "us")
+        unit = TimeSeries.periods[self.period]
+        if unit in ("D", "W"):
+            return start + np.arange(periods) * np.timedelta64(1, unit)
+        if unit == "M":
+            months = np.datetime64(self.start, "M") + np.arange(periods)
+        else:
+            months = np.datetime64(self.start, "M") + np.arange(periods) * 12
+        month_days = (months + 1).astype("M8[D]") - months.astype("M8[D]")
+        day = np.timedelta64(self.start.day - 1, "D")
+        time = start - start.astype("M8[D]")
+        return months.astype("M8[D]") + \
+            np.minimum(day, month_days - np.timedelta64(1, "D")) + time
 
     def _normalize (self, data, novalue = None):
         """Normalize data intended to store as data in the class.
@@ -94,30 +132,41 @@ class TimeSeries:
             (date, values), being values also a tuple of values
         - novalue: value to use for tuples with no value
 
-        Produces data suitable for self.data, with
-        tuples for those periods with no tuples,
-        and sorts the result in ascending time order.
+        Produces dates and values suitable for self.dates and
+        self.values, with novalue for those periods with no tuples,
+        sorted in ascending time order.
         """
 
-        periods = self._period(self.end) + 1
-        # Fill in result to return with dates and novalue
-        result = [(self.start + relativedelta(months=period), novalue)
-                  for period in xrange(periods)]
-        # Fill in the values for the dates received in data
-        for (date, value) in data:
-            period = self._period(date)
-            if result [period] == novalue:
-                raise Exception("Dup period")
-            else:
-                result [period] = (result[period][0], value)
-        return result
+        nperiods = int(self._periods(np.array([self.end], "M8[us]"))[0]) + 1
+        dates = np.array([date for (date, value) in data], "M8[us]")
+        periods = self._periods(dates)
+        if ((periods < 0) | (periods >= nperiods)).any():
+            raise Exception("Date out of the time series")
+        if len(np.unique(periods)) < len(periods):
+            raise Exception("Dup period")
+        data_values = np.array([value for (date, value) in data])
+        values = np.empty((nperiods, len(novalue)), data_values.dtype)
+        values[:] = novalue
+        values[periods] = data_values
+        return (self._period_dates(nperiods), values)
+
+    @property
+    def data (self):
+
+        return [(date, tuple(value)) for (date, value)
+                in zip(self.dates.tolist(), self.values.tolist())]
 
     def json (self, pretty=False):
 
+        if (self.dates.astype("M8[s]") == self.dates).all():
+            unit = "s"
+        else:
+            unit = "us"
+        dates = np.datetime_as_string(self.dates, unit).tolist()
         data = {"period": self.period,
                 "first_date": self.start,
                 "last_date": self.end,
-                "values": self.data}
+                "values": zip(dates, self.values.tolist())}
         separators=(',', ': ')
         encoding="utf-8"
         if pretty:
@@ -132,7 +181,10 @@ class TimeSeries:
 
     def __eq__(self, other):
         return (isinstance(other, self.__class__)
-            and self.__dict__ == other.__dict__)
+            and self.period == other.period
+            and self.start == other.start and self.end == other.end
+            and np.array_equal(self.dates, other.dates)
+            and np.array_equal(self.values, other.values))
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -149,7 +201,8 @@ class TimeSeries:
     def __init__ (self, period, start, end, data, zerovalue = 0L):
         """Intialize a TimeSeries object
         
-        - period: period for the time series (for now, "months")
+        - period: period for the time series
+            ("days", "weeks", "months" or "years")
         - start: starting time for the time series
         - end: ending time for the time series
         - data: list of tuples, each tuple of the form
@@ -160,6 +213,8 @@ class TimeSeries:
         start and/or end could be None
         """
 
+        if period not in TimeSeries.periods:
+            raise Exception("TimeSeries: Unknown period: %s" % period)
         self.period = period
         if start is None:
             self.start = self._min_date(data)
@@ -171,7 +226,7 @@ class TimeSeries:
             self.end = end
         # Use tuple of 0s for no values, same length as tuples in data
         novalue = (zerovalue,) * len (data[0][1])
-        self.data = self._normalize(data, novalue)
+        (self.dates, self.values) = self._normalize(data, novalue)
 
 if __name__ == "__main__":
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+## Python script to benchmark the GrimoireLib reports
+
+## Copyright (C) 2015 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, "vizGrimoireJS"))
+
+description = """
+Benchmark of the GrimoireLib reports
+
+Times each phase of report_tool.py (evolutionary, aggregated, filters
+and studies reports) for each data source and hot paths of the library,
+and counts the queries executed in each phase. Phases failing for a data
+source are recorded with their error. Use it with the databases created by
+synthetic_data.py to get a reproducible baseline, and compare with a
+previous baseline to find regressions.
+"""
+
+# report_tool.py functions for each phase
+PHASES = ["create_evol_report", "create_agg_report",
+          "create_reports_filters", "create_reports_studies"]
+
+
+class QueryCounter(object):
+    """ Counts the queries executed by the cursors of some classes """
+
+    def __init__(self):
+        self.queries = 0
+
+    def install(self, cursor_class):
+        execute = cursor_class.execute
+        counter = self
+        def counted_execute(cursor, query, *args, **kwargs):
+            counter.queries += 1
+            return execute(cursor, query, *args, **kwargs)
+        cursor_class.execute = counted_execute
+
+
+def timed(function, repeat = 1):
+    """ Best time of repeat calls to function """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    return best
+
+def run_phases(opts, counter):
+    """ Time and number of queries of each report_tool.py phase and data source
+
+    A phase failing for a data source (i.e. a query not supported with
+    SQLite) is recorded with its error, and the benchmark goes on.
+    """
+    import report_tool
+    from vizgrimoire.report import Report
+    from vizgrimoire.GrimoireUtils import getPeriod, read_main_conf, createJSON, JSONBundle
+
+    automator = read_main_conf(opts.config_file)
+    period = getPeriod(automator['r'].get('period', 'months'))
+    startdate = "'" + automator['r']['start_date'] + "'"
+    enddate = "'" + automator['r']['end_date'] + "'"
+    identities_db = automator['generic']['db_identities']
+
+    # Globals set by report_tool.py when run as a script
+    report_tool.Report = Report
+    report_tool.period = period
+    report_tool.opts = opts
+    report_tool.createJSON = createJSON
+    report_tool.JSONBundle = JSONBundle
+
+    phases_args = {
+        "create_evol_report": (startdate, enddate, opts.destdir, identities_db),
+        "create_agg_report": (startdate, enddate, opts.destdir, identities_db),
+        "create_reports_filters": (period, startdate, enddate, opts.destdir,
+                                   opts.npeople, identities_db),
+        "create_reports_studies": (period, startdate, enddate, opts.destdir)
+        }
+    results = {}
+    data_sources = Report.get_data_sources()
+    try:
+        for phase in opts.phases:
+            for ds in data_sources:
+                name = phase + " " + ds.get_name()
+                logging.info("Running " + name)
+                Report.set_data_sources([ds])
+                queries = counter.queries
+                try:
+                    phase_time = timed(lambda: getattr(report_tool, phase)(*phases_args[phase]))
+                except Exception, e:
+                    logging.error("%s failed: %s" % (name, str(e)))
+                    results[name] = {"error": "%s: %s" % (type(e).__name__, str(e))}
+                    continue
+                results[name] = {"time": phase_time, "queries": counter.queries - queries}
+                logging.info("%s: %.2f s, %i queries" % (name, phase_time, results[name]["queries"]))
+    finally:
+        Report.set_data_sources(data_sources)
+    return results
+
+def run_hot_paths(repeat):
+    """ Time of library functions called for each metric and item """
+    from vizgrimoire.metrics.query_builder import DSQuery
+    from vizgrimoire.GrimoireUtils import fill_and_order_items
+
+    def get_sql_period():
+        for period in ["day", "week", "month", "year"] * 250:
+            DSQuery.GetSQLPeriod(period, "s.date", "count(distinct(s.id)) as commits",
+                                 "scmlog s, people_uidentities pup",
+                                 "s.author_id = pup.people_id", "'2010-01-01'",
+                                 "'2014-01-01'")
+
+    items = ["item%i" % (item) for item in range(2000)]
+    def fill_and_order():
+        # Items with data in reverse order, and the half of them without data
+        data = {"name": items[::-2], "commits": range(len(items[::-2]))}
+        fill_and_order_items(items, data, "name")
+
+    results = {}
+    for (name, function) in [("GetSQLPeriod", get_sql_period),
+                             ("fill_and_order_items", fill_and_order)]:
+        results[name] = {"time": timed(function, repeat)}
+        logging.info("%s: %.4f s" % (name, results[name]["time"]))
+    return results
+
+def compare(results, baseline, tolerance):
+    """ Regressions in results from the baseline results """
+    regressions = []
+    for (group, measures) in results.items():
+        for (name, values) in measures.items():
+            if name not in baseline.get(group, {}): continue
+            old = baseline[group][name]
+            if "error" in values:
+                if "error" not in old:
+                    regressions.append("%s failed: %s" % (name, values["error"]))
+                continue
+            if "error" in old: continue
+            if values["time"] > old["time"] * (1 + tolerance):
+                regressions.append("%s time: %.4f s, was %.4f s" % (name, values["time"], old["time"]))
+            if values.get("queries", 0) > old.get("queries", 0):
+                regressions.append("%s queries: %i, was %i" % (name, values["queries"], old["queries"]))
+    return regressions
+
+def read_options():
+    parser = argparse.ArgumentParser(description = description)
+    parser.add_argument("--config-file", default="synthetic/automator.conf",
+                        dest="config_file",
+                        help="Automator config file (default: synthetic/automator.conf)")
+    parser.add_argument("--metrics", dest="metrics_path",
+                        default = os.path.join(base_dir, "vizgrimoire", "metrics"),
+                        help="Path to the metrics modules to be loaded " \
+                            + "(default: ../vizgrimoire/metrics)")
+    parser.add_argument("--sqlite-dir", dest="sqlite_dir",
+                        help="Directory with the SQLite files, used instead of MySQL")
+    parser.add_argument("--phases", default=",".join(PHASES),
+                        help="Comma separated report_tool.py phases to run " \
+                            + "(default: all of them)")
+    parser.add_argument("--data-sources", dest="data_sources",
+                        help="Comma separated data sources to use " \
+                            + "(default: all the configured ones)")
+    parser.add_argument("--npeople", default="10",
+                        help="Limit for people analysis (default: 10)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Executions of each hot path, the best one is " \
+                            + "used (default: 5)")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--baseline",
+                        help="JSON file with the results of a previous run " \
+                            + "to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative increase of time reported as a " \
+                            + "regression (default: 0.25)")
+    opts = parser.parse_args()
+    opts.phases = [phase for phase in opts.phases.split(",") if phase]
+    for phase in opts.phases:
+        if phase not in PHASES: parser.error("Wrong phase " + phase)
+    # Options used by report_tool.py functions
+    opts.bundle = False
+    return opts
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    opts = read_options()
+    os.environ["LANG"] = ""
+
+    import MySQLdb.cursors
+    from vizgrimoire.metrics.query_builder import DSQuery
+    from vizgrimoire.report import Report
+
+    counter = QueryCounter()
+    counter.install(MySQLdb.cursors.BaseCursor)
+    if opts.sqlite_dir:
+        from vizgrimoire.GrimoireSQLite import Cursor
+        counter.install(Cursor)
+        DSQuery.set_sqlite_dir(opts.sqlite_dir)
+
+    names = None
+    if opts.data_sources: names = opts.data_sources.split(",")
+    Report.init(opts.config_file, opts.metrics_path, names)
+    if names:
+        Report.set_data_sources([ds for ds in Report.get_data_sources()
+                                 if ds.get_name() in names])
+    opts.destdir = tempfile.mkdtemp()
+    try:
+        results = {"phases": run_phases(opts, counter),
+                   "hot_paths": run_hot_paths(opts.repeat)}
+    finally:
+        shutil.rmtree(opts.destdir)
+
+    if opts.output:
+        output = open(opts.output, "w")
+        json.dump(results, output, indent=4, sort_keys=True)
+        output.close()
+
+    if opts.baseline:
+        regressions = compare(results, json.load(open(opts.baseline)), opts.tolerance)
+        for regression in regressions:
+            logging.warning("Regression in " + regression)
+        if regressions: sys.exit(1)
@@ -0,0 +1,52 @@
+## Python script to create SQLite databases from the dumps
+
+import os
+import sys
+import subprocess
+import argparse
+
+sys.path.insert(0, "..")
+from vizgrimoire.GrimoireSQLite import load_mysql_dump, get_db_file
+
+description = """
+Simple script to deploy databases for testing GrimoireLib without MySQL
+
+Creates a SQLite file for each database, in the destination directory,
+with the data from the MySQL dumps in the db directory, after
+uncompressing them. Use it with test_data_source_api.py --sqlite-dir.
+"""
+
+dumps = {
+    "db": ["bicho", "cvsanaly", "downloads", "gerrit", "irc",
+           "mediawiki", "mlstats", "pullpo", "releases", "sibyl",
+           "sortinghat","projects"
+           ],
+    }
+
+def parse_args ():
+    """
+    Parse command line arguments, returns the destination directory
+
+    """
+
+    parser = argparse.ArgumentParser(description = description)
+    parser.add_argument("--dest", default = "sqlite",
+                        help = "Directory for the SQLite files " \
+                            + "(default: sqlite)")
+    args = parser.parse_args()
+    return args.dest
+
+dest = parse_args()
+if not os.path.isdir(dest): os.makedirs(dest)
+for dir in dumps:
+    print dir
+    for dump in dumps[dir]:
+        file = os.path.join (dir, dump + ".mysql.7z")
+        database = "cp_" + dump + "_GrimoireLibTests"
+        db_file = get_db_file(dest, database)
+        print "Processing:", db_file, file
+        uncompress_cmd = ["7z", "x", file, "-so"]
+        print "*** Uncompress / convert dump:", " ".join(uncompress_cmd)
+        uncompress = subprocess.Popen(uncompress_cmd, stdout=subprocess.PIPE)
+        load_mysql_dump(uncompress.stdout, db_file)
+        uncompress.wait()
@@ -0,0 +1,629 @@
+## Python script to create synthetic databases for benchmarking GrimoireLib
+
+## Copyright (C) 2015 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+
+import os
+import sys
+import math
+import random
+import hashlib
+import argparse
+import logging
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+description = """
+Deterministic generator of synthetic databases for GrimoireLib
+
+Creates cvsanaly, bicho, gerrit, mlstats, irc, sortinghat and projects
+databases, with the tables and columns used by the GrimoireLib queries,
+as MySQL dumps (and SQLite files with --sqlite) in the destination
+directory, together with an automator.conf file to run report_tool.py
+or benchmark.py on them. The same seed and scale produce the same data.
+"""
+
+# (columns, keys) of the tables of each database
+SCHEMAS = {
+    "cvsanaly": [
+        ("repositories", ["id int(11) NOT NULL", "uri varchar(255) DEFAULT NULL",
+                          "name varchar(255) DEFAULT NULL", "type varchar(30) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("people", ["id int(11) NOT NULL", "name varchar(255) DEFAULT NULL",
+                    "email varchar(255) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("people_uidentities", ["people_id int(11) NOT NULL", "uuid varchar(128) NOT NULL"],
+         ["PRIMARY KEY (people_id)", "KEY uuid (uuid)"]),
+        ("scmlog", ["id int(11) NOT NULL", "rev mediumtext", "committer_id int(11) DEFAULT NULL",
+                    "author_id int(11) DEFAULT NULL", "date datetime DEFAULT NULL",
+                    "date_tz int(11) DEFAULT NULL", "author_date datetime DEFAULT NULL",
+                    "author_date_tz int(11) DEFAULT NULL", "message longtext",
+                    "composed_rev tinyint(1) DEFAULT NULL", "repository_id int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY date (date)", "KEY author_id (author_id)",
+          "KEY repository_id (repository_id)"]),
+        ("branches", ["id int(11) NOT NULL", "name varchar(255) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("files", ["id int(11) NOT NULL", "file_name varchar(255) DEFAULT NULL",
+                   "repository_id int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("file_types", ["id int(11) NOT NULL", "file_id int(11) DEFAULT NULL",
+                        "type mediumtext"],
+         ["PRIMARY KEY (id)", "KEY file_id (file_id)"]),
+        ("file_links", ["id int(11) NOT NULL", "parent_id int(11) DEFAULT NULL",
+                        "file_id int(11) DEFAULT NULL", "commit_id int(11) DEFAULT NULL",
+                        "file_path varchar(4096) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY file_id (file_id)"]),
+        ("actions", ["id int(11) NOT NULL", "type varchar(1) DEFAULT NULL",
+                     "file_id int(11) DEFAULT NULL", "commit_id int(11) DEFAULT NULL",
+                     "branch_id int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY commit_id (commit_id)", "KEY file_id (file_id)"]),
+        ("commits_lines", ["id int(11) NOT NULL", "commit_id int(11) DEFAULT NULL",
+                           "added int(11) DEFAULT NULL", "removed int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY commit_id (commit_id)"]),
+        ("tags", ["id int(11) NOT NULL", "name varchar(255) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("tag_revisions", ["id int(11) NOT NULL", "tag_id int(11) DEFAULT NULL",
+                           "commit_id int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ],
+    "bicho": [
+        ("supported_trackers", ["id int(11) NOT NULL", "name varchar(64) NOT NULL",
+                                "version varchar(64) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("trackers", ["id int(11) NOT NULL", "url varchar(255) NOT NULL",
+                      "type int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("people", ["id int(11) NOT NULL", "name varchar(64) DEFAULT NULL",
+                    "email varchar(64) DEFAULT NULL", "user_id varchar(64) NOT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("people_uidentities", ["people_id int(11) NOT NULL", "uuid varchar(128) NOT NULL"],
+         ["PRIMARY KEY (people_id)", "KEY uuid (uuid)"]),
+        ("issues", ["id int(11) NOT NULL", "tracker_id int(11) NOT NULL",
+                    "issue varchar(255) NOT NULL", "type varchar(32) DEFAULT NULL",
+                    "summary varchar(255) NOT NULL", "description text",
+                    "status varchar(32) NOT NULL", "resolution varchar(32) DEFAULT NULL",
+                    "priority varchar(32) DEFAULT NULL", "submitted_by int(11) DEFAULT NULL",
+                    "submitted_on datetime NOT NULL", "assigned_to int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY submitted_on (submitted_on)",
+          "KEY submitted_by (submitted_by)", "KEY tracker_id (tracker_id)"]),
+        ("changes", ["id int(11) NOT NULL", "issue_id int(11) NOT NULL",
+                     "field varchar(64) NOT NULL", "old_value varchar(255) DEFAULT NULL",
+                     "new_value varchar(255) DEFAULT NULL", "changed_by int(11) NOT NULL",
+                     "changed_on datetime NOT NULL"],
+         ["PRIMARY KEY (id)", "KEY issue_id (issue_id)", "KEY changed_on (changed_on)"]),
+        ("comments", ["id int(11) NOT NULL", "issue_id int(11) NOT NULL",
+                      "comment_id int(11) DEFAULT NULL", "text text",
+                      "submitted_by int(11) NOT NULL", "submitted_on datetime NOT NULL"],
+         ["PRIMARY KEY (id)", "KEY issue_id (issue_id)"]),
+        ],
+    "mlstats": [
+        ("mailing_lists", ["mailing_list_url varchar(255) NOT NULL",
+                           "mailing_list_name varchar(255) DEFAULT NULL",
+                           "project_name varchar(255) DEFAULT NULL",
+                           "last_analysis datetime DEFAULT NULL"],
+         ["PRIMARY KEY (mailing_list_url)"]),
+        ("people", ["email_address varchar(255) NOT NULL", "name varchar(255) DEFAULT NULL",
+                    "username varchar(255) DEFAULT NULL", "domain_name varchar(255) DEFAULT NULL",
+                    "top_level_domain varchar(64) DEFAULT NULL"],
+         ["PRIMARY KEY (email_address)"]),
+        ("people_uidentities", ["people_id varchar(255) NOT NULL", "uuid varchar(128) NOT NULL"],
+         ["PRIMARY KEY (people_id)", "KEY uuid (uuid)"]),
+        ("messages", ["message_ID varchar(255) NOT NULL",
+                      "mailing_list_url varchar(255) NOT NULL",
+                      "mailing_list varchar(255) DEFAULT NULL", "first_date datetime DEFAULT NULL",
+                      "first_date_tz int(11) DEFAULT NULL", "arrival_date datetime DEFAULT NULL",
+                      "arrival_date_tz int(11) DEFAULT NULL", "subject varchar(1024) DEFAULT NULL",
+                      "message_body mediumtext", "is_response_of varchar(255) DEFAULT NULL",
+                      "mail_path text"],
+         ["PRIMARY KEY (message_ID, mailing_list_url)", "KEY first_date (first_date)",
+          "KEY is_response_of (is_response_of)"]),
+        ("messages_people", ["type_of_recipient varchar(5) NOT NULL",
+                             "email_address varchar(255) NOT NULL",
+                             "message_id varchar(255) NOT NULL",
+                             "mailing_list_url varchar(255) NOT NULL"],
+         ["PRIMARY KEY (type_of_recipient, email_address, message_id)",
+          "KEY message_id (message_id)"]),
+        ],
+    "irc": [
+        ("channels", ["id int(11) NOT NULL", "name varchar(255) DEFAULT NULL",
+                      "public tinyint(1) DEFAULT 1"],
+         ["PRIMARY KEY (id)"]),
+        ("people_uidentities", ["people_id varchar(255) NOT NULL", "uuid varchar(128) NOT NULL"],
+         ["PRIMARY KEY (people_id)", "KEY uuid (uuid)"]),
+        ("irclog", ["id int(11) NOT NULL", "date datetime DEFAULT NULL",
+                    "nick varchar(255) DEFAULT NULL", "message text",
+                    "type varchar(32) DEFAULT NULL", "channel_id int(11) DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY date (date)", "KEY nick (nick)"]),
+        ],
+    "sortinghat": [
+        ("uidentities", ["uuid varchar(128) NOT NULL", "last_modified datetime DEFAULT NULL",
+                         "identifier varchar(255) DEFAULT NULL"],
+         ["PRIMARY KEY (uuid)"]),
+        ("identities", ["id varchar(128) NOT NULL", "name varchar(128) DEFAULT NULL",
+                        "email varchar(128) DEFAULT NULL", "username varchar(128) DEFAULT NULL",
+                        "source varchar(32) NOT NULL", "uuid varchar(128) DEFAULT NULL",
+                        "last_modified datetime DEFAULT NULL"],
+         ["PRIMARY KEY (id)", "KEY uuid (uuid)"]),
+        ("countries", ["code varchar(2) NOT NULL", "name varchar(255) NOT NULL",
+                       "alpha3 varchar(3) NOT NULL"],
+         ["PRIMARY KEY (code)"]),
+        ("profiles", ["uuid varchar(128) NOT NULL", "name varchar(128) DEFAULT NULL",
+                      "email varchar(128) DEFAULT NULL", "gender varchar(32) DEFAULT NULL",
+                      "gender_acc int(11) DEFAULT NULL", "is_bot tinyint(1) DEFAULT NULL",
+                      "country_code varchar(2) DEFAULT NULL"],
+         ["PRIMARY KEY (uuid)"]),
+        ("organizations", ["id int(11) NOT NULL", "name varchar(191) NOT NULL"],
+         ["PRIMARY KEY (id)", "UNIQUE KEY name (name)"]),
+        ("domains_organizations", ["id int(11) NOT NULL", "domain varchar(128) NOT NULL",
+                                   "is_top_domain tinyint(1) DEFAULT NULL",
+                                   "organization_id int(11) NOT NULL"],
+         ["PRIMARY KEY (id)"]),
+        ("enrollments", ["id int(11) NOT NULL", "start datetime NOT NULL",
+                         "end datetime NOT NULL", "uuid varchar(128) NOT NULL",
+                         "organization_id int(11) NOT NULL"],
+         ["PRIMARY KEY (id)", "KEY uuid (uuid)"]),
+        ],
+    "projects": [
+        ("projects", ["project_id int(11) NOT NULL", "id varchar(255) NOT NULL",
+                      "title varchar(255) NOT NULL"],
+         ["PRIMARY KEY (project_id)"]),
+        ("project_repositories", ["project_id int(11) NOT NULL",
+                                  "data_source varchar(32) NOT NULL",
+                                  "repository_name varchar(255) NOT NULL"],
+         ["KEY project_id (project_id)"]),
+        ("project_children", ["project_id int(11) NOT NULL", "subproject_id int(11) NOT NULL"],
+         ["KEY project_id (project_id)"]),
+        ],
+    }
+# gerrit reviews are stored by bicho
+SCHEMAS["gerrit"] = SCHEMAS["bicho"] + [
+    ("issues_ext_gerrit", ["id int(11) NOT NULL", "branch text", "url text",
+                           "change_id varchar(255) DEFAULT NULL", "project_name varchar(255) DEFAULT NULL",
+                           "status varchar(32) DEFAULT NULL", "mod_date datetime DEFAULT NULL",
+                           "open varchar(8) DEFAULT NULL", "issue_id int(11) NOT NULL"],
+     ["PRIMARY KEY (id)", "KEY issue_id (issue_id)"]),
+    ]
+
+# automator.conf [generic] option for each database
+DB_OPTIONS = [("db_cvsanaly", "cvsanaly"), ("db_bicho", "bicho"), ("db_gerrit", "gerrit"),
+              ("db_mlstats", "mlstats"), ("db_irc", "irc"), ("db_identities", "sortinghat"),
+              ("db_sortinghat", "sortinghat"), ("db_projects", "projects")]
+
+COUNTRIES = [("es", "Spain", "ESP"), ("us", "United States", "USA"), ("de", "Germany", "DEU"),
+             ("fr", "France", "FRA"), ("in", "India", "IND"), ("br", "Brazil", "BRA"),
+             ("cn", "China", "CHN"), ("jp", "Japan", "JPN")]
+
+FILE_TYPES = ["code", "code", "code", "devel-doc", "build", "i18n", "ui", "documentation"]
+
+
+def sql_value(value):
+    """ MySQL literal for a Python value """
+    if value is None: return "NULL"
+    if isinstance(value, (int, long, float)): return str(value)
+    if isinstance(value, datetime): return "'" + value.strftime("%Y-%m-%d %H:%M:%S") + "'"
+    value = value.replace("\\", "\\\\").replace("'", "\\'").replace("\n", "\\n")
+    return "'" + value + "'"
+
+
+class Dump(object):
+    """ Writer of the tables of a database as a MySQL dump """
+
+    insert_rows = 500 # rows per INSERT statement
+
+    def __init__(self, out):
+        self.out = out
+        self.rows = {}
+
+    def create_table(self, table, columns, keys):
+        definitions = ",\n  ".join(columns + keys)
+        self.out.write("DROP TABLE IF EXISTS %s;\n" % (table))
+        self.out.write("CREATE TABLE %s (\n  %s\n) ENGINE=MyISAM DEFAULT CHARSET=utf8;\n" %
+                       (table, definitions))
+        self.rows[table] = []
+
+    def insert(self, table, *values):
+        rows = self.rows[table]
+        rows.append("(" + ",".join([sql_value(value) for value in values]) + ")")
+        if len(rows) >= self.insert_rows: self._flush(table)
+
+    def _flush(self, table):
+        if not self.rows[table]: return
+        self.out.write("INSERT INTO %s VALUES %s;\n" % (table, ",".join(self.rows[table])))
+        self.rows[table] = []
+
+    def close(self):
+        for table in self.rows: self._flush(table)
+
+
+class SyntheticData(object):
+    """ Synthetic activity of a community in all the data sources
+
+    The same people (with their organizations and countries) are active in
+    all the data sources, with a long tailed distribution of activity, and
+    each of them is active only in a period of time, so studies about new
+    and gone contributors get meaningful data. Each data source has its own
+    random generator, seeded from the global seed, so the data of one of
+    them does not depend on the others.
+    """
+
+    def __init__(self, seed = 0, people = 200, repos = 10, years = 2,
+                 events_per_day = 20, start = datetime(2010, 1, 1)):
+        self.seed = seed
+        self.npeople = people
+        self.nrepos = repos
+        self.days = int(years * 365)
+        self.events_per_day = events_per_day
+        self.start = start
+        self.end = start + timedelta(days = self.days)
+        self.norgs = max(1, people / 10)
+        self.nprojects = max(1, repos / 3)
+        self._init_people()
+
+    def _random(self, name):
+        return random.Random(int(hashlib.md5("%s-%s" % (self.seed, name)).hexdigest(), 16))
+
+    def _init_people(self):
+        rnd = self._random("people")
+        self.people = []
+        weights = 0
+        self.weights = []
+        for person in range(self.npeople):
+            uuid = hashlib.sha1("synthetic-%d-%d" % (self.seed, person)).hexdigest()
+            org = min(int(rnd.paretovariate(1.0)) - 1, self.norgs - 1)
+            first = rnd.randint(0, self.days - 1)
+            last = min(self.days - 1, first + 30 + int(rnd.expovariate(2.0 / self.days)))
+            self.people.append({"uuid": uuid, "name": "Person %d" % (person),
+                                "email": "person%d@org%d.com" % (person, org),
+                                "nick": "person%d" % (person), "org": org,
+                                "country": COUNTRIES[rnd.randint(0, len(COUNTRIES) - 1)][0],
+                                "first": first, "last": last,
+                                "bot": person == 0})
+            weights += rnd.paretovariate(1.2)
+            self.weights.append(weights)
+
+    def _pick_person(self, rnd, day):
+        """ Index of a person active in day, weighted by activity """
+        for tries in range(10):
+            person = bisect_left(self.weights, rnd.random() * self.weights[-1])
+            person = min(person, self.npeople - 1)
+            if self.people[person]["first"] <= day <= self.people[person]["last"]: break
+        return person
+
+    def _events(self, rnd, scale = 1.0):
+        """ (day, date) of each event, fewer in weekends """
+        mean = self.events_per_day * scale
+        for day in range(self.days):
+            date = self.start + timedelta(days = day)
+            day_mean = mean
+            if date.weekday() >= 5: day_mean = mean / 4.0
+            events = max(0, int(round(rnd.gauss(day_mean, math.sqrt(day_mean)))))
+            for event in range(events):
+                yield (day, date + timedelta(seconds = rnd.randint(0, 86399)))
+
+    def _later(self, rnd, date, mean_days):
+        """ Date some time after date, None if it is out of the data span """
+        later = date + timedelta(seconds = int(rnd.expovariate(1.0 / (mean_days * 86400))) + 60)
+        if later >= self.end: return None
+        return later
+
+    def _people_tables(self, dump, with_user = False):
+        for (person_id, person) in enumerate(self.people):
+            values = [person_id + 1, person["name"], person["email"]]
+            if with_user: values.append(person["nick"])
+            dump.insert("people", *values)
+            dump.insert("people_uidentities", person_id + 1, person["uuid"])
+
+    def repositories(self):
+        return ["https://git.example.com/repo%d.git" % (repo) for repo in range(self.nrepos)]
+
+    def trackers(self, name):
+        return ["https://%s.example.com/product%d" % (name, repo)
+                for repo in range(max(1, self.nrepos / 2))]
+
+    def mailing_lists(self):
+        return ["https://lists.example.com/list%d" % (repo)
+                for repo in range(max(1, self.nrepos / 3))]
+
+    def cvsanaly(self, dump):
+        rnd = self._random("cvsanaly")
+        repos = self.repositories()
+        for (repo_id, uri) in enumerate(repos):
+            dump.insert("repositories", repo_id + 1, uri, uri.split("/")[-1], "git")
+        self._people_tables(dump)
+        for (branch_id, name) in enumerate(["master", "develop", "stable"]):
+            dump.insert("branches", branch_id + 1, name)
+
+        repo_files = [[] for repo in repos]
+        file_id = action_id = tag_id = 0
+        commit_id = 0
+        for (day, date) in self._events(rnd):
+            commit_id += 1
+            repo = min(int(rnd.paretovariate(1.0)) - 1, len(repos) - 1)
+            author = self._pick_person(rnd, day)
+            committer = author
+            if rnd.random() < 0.1: committer = self._pick_person(rnd, day)
+            tz = (rnd.randint(-8, 8)) * 3600
+            dump.insert("scmlog", commit_id, hashlib.sha1(str(commit_id)).hexdigest(),
+                        committer + 1, author + 1, date, tz, date, tz,
+                        "Commit %d\n\nSynthetic change" % (commit_id), 0, repo + 1)
+            branch = 1
+            if rnd.random() < 0.2: branch = rnd.randint(2, 3)
+            for action in range(rnd.randint(1, 5)):
+                action_id += 1
+                files = repo_files[repo]
+                if not files or rnd.random() < 0.15:
+                    file_id += 1
+                    files.append(file_id)
+                    path = "src/module%d/file%d.c" % (file_id % 20, file_id)
+                    dump.insert("files", file_id, path.split("/")[-1], repo + 1)
+                    dump.insert("file_types", file_id, file_id,
+                                FILE_TYPES[rnd.randint(0, len(FILE_TYPES) - 1)])
+                    dump.insert("file_links", file_id, None, file_id, commit_id, path)
+                    dump.insert("actions", action_id, "A", file_id, commit_id, branch)
+                else:
+                    action_type = "M"
+                    if rnd.random() < 0.02: action_type = "D"
+                    dump.insert("actions", action_id, action_type,
+                                files[rnd.randint(0, len(files) - 1)], commit_id, branch)
+            dump.insert("commits_lines", commit_id, commit_id,
+                        int(rnd.paretovariate(0.8)), int(rnd.paretovariate(1.0)) - 1)
+            if rnd.random() < 0.005:
+                tag_id += 1
+                dump.insert("tags", tag_id, "v%d.%d" % (tag_id / 10, tag_id % 10))
+                dump.insert("tag_revisions", tag_id, tag_id, commit_id)
+
+    def _issue_changes(self, dump, rnd, changes, issue_id, submitted, statuses, changer):
+        """ Insert the changes of status of an issue, returning the last status """
+        status = statuses[0][0]
+        date = submitted
+        for (new_status, probability, mean_days) in statuses[1:]:
+            if rnd.random() >= probability: break
+            date = self._later(rnd, date, mean_days)
+            if date is None: break
+            changes[0] += 1
+            dump.insert("changes", changes[0], issue_id, "Status", status, new_status,
+                        changer + 1, date)
+            status = new_status
+        return status
+
+    def bicho(self, dump):
+        rnd = self._random("bicho")
+        trackers = self.trackers("bugzilla")
+        dump.insert("supported_trackers", 1, "bugzilla", None)
+        for (tracker_id, url) in enumerate(trackers):
+            dump.insert("trackers", tracker_id + 1, url, 1)
+        self._people_tables(dump, with_user = True)
+
+        # (status, probability of reaching it from the previous one, mean days)
+        statuses = [("NEW", 1, 0), ("ASSIGNED", 0.7, 3), ("RESOLVED", 0.8, 20),
+                    ("CLOSED", 0.6, 7)]
+        changes = [0]
+        comment_id = 0
+        for (issue_id, (day, date)) in enumerate(self._events(rnd, 0.3)):
+            issue_id += 1
+            submitter = self._pick_person(rnd, day)
+            assignee = self._pick_person(rnd, day)
+            tracker = rnd.randint(0, len(trackers) - 1)
+            status = self._issue_changes(dump, rnd, changes, issue_id, date, statuses, assignee)
+            resolution = None
+            if status in ("RESOLVED", "CLOSED"): resolution = "FIXED"
+            dump.insert("issues", issue_id, tracker + 1, str(issue_id), "bug",
+                        "Issue %d" % (issue_id), "Synthetic issue", status, resolution,
+                        ["Low", "Normal", "High"][rnd.randint(0, 2)], submitter + 1,
+                        date, assignee + 1)
+            comment_date = date
+            for comment in range(rnd.randint(0, 4)):
+                comment_date = self._later(rnd, comment_date, 2)
+                if comment_date is None: break
+                comment_id += 1
+                dump.insert("comments", comment_id, issue_id, comment, "Comment",
+                            self._pick_person(rnd, day) + 1, comment_date)
+
+    def gerrit(self, dump):
+        rnd = self._random("gerrit")
+        trackers = self.trackers("gerrit")
+        dump.insert("supported_trackers", 1, "gerrit", None)
+        for (tracker_id, url) in enumerate(trackers):
+            dump.insert("trackers", tracker_id + 1, url, 1)
+        self._people_tables(dump, with_user = True)
+
+        change_id = 0
+        for (issue_id, (day, date)) in enumerate(self._events(rnd, 0.5)):
+            issue_id += 1
+            submitter = self._pick_person(rnd, day)
+            tracker = rnd.randint(0, len(trackers) - 1)
+            status = "NEW"
+            upload = date
+            patchsets = 1 + int(rnd.expovariate(0.7))
+            for patchset in range(1, patchsets + 1):
+                if patchset > 1: upload = self._later(rnd, upload, 2)
+                if upload is None: break
+                change_id += 1
+                dump.insert("changes", change_id, issue_id, "Upload", str(patchset),
+                            str(patchset), submitter + 1, upload)
+                review = upload
+                for (field, values) in [("Verified", ["1", "1", "-1"]),
+                                        ("Code-Review", ["2", "1", "1", "-1", "-2"])]:
+                    review = self._later(rnd, review, 1)
+                    if review is None: break
+                    change_id += 1
+                    dump.insert("changes", change_id, issue_id, field, str(patchset),
+                                values[rnd.randint(0, len(values) - 1)],
+                                self._pick_person(rnd, day) + 1, review)
+                if review is None: break
+                if patchset == patchsets and rnd.random() < 0.9:
+                    status = "MERGED"
+                    if rnd.random() < 0.15: status = "ABANDONED"
+                    change_id += 1
+                    dump.insert("changes", change_id, issue_id, "status", None, status,
+                                submitter + 1, review)
+            dump.insert("issues", issue_id, tracker + 1, str(issue_id), "change",
+                        "Change %d" % (issue_id), "Synthetic review", status, None, None,
+                        submitter + 1, date, None)
+            dump.insert("issues_ext_gerrit", issue_id, "master", trackers[tracker],
+                        hashlib.sha1("change%d" % (issue_id)).hexdigest(),
+                        trackers[tracker].split("/")[-1], status, upload or date,
+                        str(status == "NEW").lower(), issue_id)
+
+    def mlstats(self, dump):
+        rnd = self._random("mlstats")
+        lists = self.mailing_lists()
+        for url in lists:
+            dump.insert("mailing_lists", url, url.split("/")[-1], "synthetic", self.end)
+        for person in self.people:
+            domain = person["email"].split("@")[1]
+            dump.insert("people", person["email"], person["name"], person["nick"],
+                        domain, domain.split(".")[-1])
+            dump.insert("people_uidentities", person["email"], person["uuid"])
+
+        recent = [] # (message id, list, date) of the last messages, to be answered
+        for (message, (day, date)) in enumerate(self._events(rnd, 0.5)):
+            message_id = "<%d@lists.example.com>" % (message)
+            sender = self.people[self._pick_person(rnd, day)]
+            parent = None
+            url = lists[rnd.randint(0, len(lists) - 1)]
+            if recent and rnd.random() < 0.6:
+                (parent, url, parent_date) = recent[rnd.randint(0, len(recent) - 1)]
+                date = max(date, parent_date + timedelta(minutes = 5))
+            subject = "Thread %d" % (message)
+            if parent is not None: subject = "Re: thread"
+            dump.insert("messages", message_id, url, url.split("/")[-1], date, 0, date, 0,
+                        subject, "Synthetic message\n-- \n" + sender["name"], parent,
+                        None)
+            dump.insert("messages_people", "From", sender["email"], message_id, url)
+            recent.append((message_id, url, date))
+            if len(recent) > 50: recent.pop(0)
+
+    def irc(self, dump):
+        rnd = self._random("irc")
+        channels = max(1, self.nrepos / 3)
+        for channel in range(channels):
+            dump.insert("channels", channel + 1, "#channel%d" % (channel), 1)
+        for person in self.people:
+            dump.insert("people_uidentities", person["nick"], person["uuid"])
+        for (message, (day, date)) in enumerate(self._events(rnd, 3)):
+            dump.insert("irclog", message + 1, date, self.people[self._pick_person(rnd, day)]["nick"],
+                        "Synthetic message %d" % (message), "COMMENT",
+                        rnd.randint(1, channels))
+
+    def sortinghat(self, dump):
+        rnd = self._random("sortinghat")
+        for (code, name, alpha3) in COUNTRIES:
+            dump.insert("countries", code, name, alpha3)
+        for org in range(self.norgs):
+            dump.insert("organizations", org + 1, "Organization %d" % (org))
+            dump.insert("domains_organizations", org + 1, "org%d.com" % (org), 0, org + 1)
+        enrollment = 0
+        for person in self.people:
+            dump.insert("uidentities", person["uuid"], self.end, person["name"])
+            for source in ["scm", "its", "scr", "mls", "irc"]:
+                dump.insert("identities", hashlib.sha1(source + person["uuid"]).hexdigest(),
+                            person["name"], person["email"], person["nick"], source,
+                            person["uuid"], self.end)
+            dump.insert("profiles", person["uuid"], person["name"], person["email"],
+                        None, None, int(person["bot"]), person["country"])
+            # Some people move to other organization in the middle
+            periods = [(datetime(1900, 1, 1), datetime(2100, 1, 1), person["org"])]
+            if self.norgs > 1 and rnd.random() < 0.2:
+                moved = self.start + timedelta(days = rnd.randint(person["first"], person["last"]))
+                periods = [(datetime(1900, 1, 1), moved, rnd.randint(0, self.norgs - 1)),
+                           (moved, datetime(2100, 1, 1), person["org"])]
+            for (start, end, org) in periods:
+                enrollment += 1
+                dump.insert("enrollments", enrollment, start, end, person["uuid"], org + 1)
+
+    def projects(self, dump):
+        repositories = [("scm", self.repositories()), ("its", self.trackers("bugzilla")),
+                        ("scr", self.trackers("gerrit")), ("mls", self.mailing_lists())]
+        # The main project has all the other ones as subprojects
+        dump.insert("projects", 1, "main", "Main project")
+        for project in range(self.nprojects):
+            dump.insert("projects", project + 2, "project%d" % (project),
+                        "Project %d" % (project))
+            dump.insert("project_children", 1, project + 2)
+        for (data_source, names) in repositories:
+            for (index, name) in enumerate(names):
+                dump.insert("project_repositories", index % self.nprojects + 2,
+                            data_source, name)
+
+    def write(self, database, out):
+        """ Write the MySQL dump of a database (a SCHEMAS key) to out """
+        dump = Dump(out)
+        for (table, columns, keys) in SCHEMAS[database]:
+            dump.create_table(table, columns, keys)
+        getattr(self, database)(dump)
+        dump.close()
+
+    def write_automator_conf(self, conf_file, databases):
+        """ automator.conf to run the reports with the databases """
+        conf = open(conf_file, "w")
+        conf.write("[generic]\nproject = Synthetic\ndb_user = root\ndb_password = \n")
+        for (option, database) in DB_OPTIONS:
+            conf.write("%s = %s\n" % (option, databases[database]))
+        conf.write("\n[bicho]\nbackend = bg\n\n[gerrit]\ntrackers = gerrit.example.com\n\n")
+        conf.write("[r]\n")
+        conf.write("start_date = %s\n" % (self.start.strftime("%Y-%m-%d")))
+        conf.write("end_date = %s\n" % (self.end.strftime("%Y-%m-%d")))
+        conf.write("reports = repositories,organizations,countries,projects\n")
+        conf.write("period = months\n")
+        conf.write("studies = contributors_new_gone,onion,quarters_data,timezone\n")
+        conf.close()
+
+
+def parse_args ():
+    parser = argparse.ArgumentParser(description = description)
+    parser.add_argument("--dest", default = "synthetic",
+                        help = "Directory for the dumps (default: synthetic)")
+    parser.add_argument("--seed", type = int, default = 0,
+                        help = "Seed for the random generators (default: 0)")
+    parser.add_argument("--people", type = int, default = 200,
+                        help = "Number of people (default: 200)")
+    parser.add_argument("--repos", type = int, default = 10,
+                        help = "Number of repositories (default: 10)")
+    parser.add_argument("--years", type = float, default = 2,
+                        help = "Years of activity (default: 2)")
+    parser.add_argument("--events-per-day", type = float, default = 20,
+                        dest = "events_per_day",
+                        help = "Mean number of commits per working day, the " \
+                            + "other data sources are scaled from it (default: 20)")
+    parser.add_argument("--prefix", default = "synth_",
+                        help = "Prefix for the database names (default: synth_)")
+    parser.add_argument("--sqlite", action = "store_true",
+                        help = "Convert the dumps to SQLite files, for " \
+                            + "--sqlite-dir in benchmark.py and report_tool.py")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    args = parse_args()
+    if not os.path.isdir(args.dest): os.makedirs(args.dest)
+    data = SyntheticData(args.seed, args.people, args.repos, args.years,
+                         args.events_per_day)
+    databases = {}
+    for database in sorted(SCHEMAS):
+        databases[database] = args.prefix + database
+        dump_file = os.path.join(args.dest, databases[database] + ".mysql")
+        logging.info("Creating " + dump_file)
+        out = open(dump_file, "w")
+        data.write(database, out)
+        out.close()
+        if args.sqlite:
+            sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+            from vizgrimoire.GrimoireSQLite import load_mysql_dump, get_db_file
+            db_file = get_db_file(args.dest, databases[database])
+            logging.info("Creating " + db_file)
+            load_mysql_dump(open(dump_file), db_file)
+    data.write_automator_conf(os.path.join(args.dest, "automator.conf"), databases)
@@ -38,6 +38,9 @@ class DataSourceTest(unittest.TestCase):
     @staticmethod
     def init():
         opts = read_options()
+        if opts.sqlite_dir:
+            from vizgrimoire.metrics.query_builder import DSQuery
+            DSQuery.set_sqlite_dir(opts.sqlite_dir)
         Report.init(opts.config_file, opts.metrics_path)
         logging.info("Init Data Source")
 
@@ -503,6 +506,9 @@ def read_options():
                         default = "../vizgrimoire/metrics",
                         help="Path to the metrics modules to be loaded " \
                             + "(default: ../vizgrimoire/metrics)")
+    parser.add_argument("--sqlite-dir", dest="sqlite_dir",
+                        help="Directory with the SQLite files created " \
+                            + "by feed_sqlite.py, used instead of MySQL")
     args = parser.parse_args()
     return args
 
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Unit tests for the fused metrics queries in metrics/metrics.py"""
+
+import unittest
+from sets import Set
+
+from vizgrimoire.metrics.metrics import Metrics
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.GrimoireUtils import fill_and_order_items
+
+class FakeDB(object):
+    """ Query builder returning a fixed result for the fused query """
+
+    database = "scm"
+
+    def __init__(self, result):
+        self.result = result
+        self.queries = 0
+
+    def BuildQuery(self, *args):
+        return "SELECT ..."
+
+    def ExecuteQuery(self, sql):
+        self.queries += 1
+        return self.result
+
+
+class FusedMetric(Metrics):
+
+    def _get_sql_parts(self):
+        return ("s.date", Set([self.field]), Set(["scmlog s"]), Set([]))
+
+class Commits(FusedMetric):
+    id = "commits"
+    field = "count(distinct(s.id)) as commits"
+
+class Authors(FusedMetric):
+    id = "authors"
+    field = "count(distinct(s.author_id)) as authors"
+
+class Actions(FusedMetric):
+    id = "actions"
+    field = "count(a.id) as actions"
+
+class TestFusedMetrics(unittest.TestCase):
+
+    def test_group_by_missing_item(self):
+        # repo3 has no data: it is filled with 0 for each metric
+        db = FakeDB({"name": ["repo2", "repo1"], "commits": [5, 7],
+                     "authors": [2, 3], "actions": [10, 20]})
+        filters = MetricFilters("month", "'2014-01-01'", "'2015-01-01'",
+                                ["repository", None])
+        metrics = [Commits(db, filters), Authors(db, filters), Actions(db, filters)]
+        data = Metrics.get_fused_data(metrics, False)
+        self.assertEqual(db.queries, 1)
+
+        items = ["repo1", "repo2", "repo3"]
+        for (metric_id, values) in [("commits", [7, 5, 0]), ("authors", [3, 2, 0]),
+                                    ("actions", [20, 10, 0])]:
+            mvalue = fill_and_order_items(items, data[metric_id], "name")
+            self.assertEqual(mvalue, {"name": items, metric_id: values})
+        self.assertEqual(db.result["name"], ["repo2", "repo1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
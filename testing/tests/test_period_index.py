@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Unit tests for datahandlers/period_index.py"""
+
+import unittest
+
+from vizgrimoire.datahandlers.period_index import PeriodIndex
+
+class TestPeriodIndex(unittest.TestCase):
+
+    def test_weeks_year_boundary(self):
+        # 2014-12-29 (monday) is in the first ISO week of 2015,
+        # 2015-01-04 (sunday) the last day of it
+        index = PeriodIndex.get("week", "'2014-12-29'", "'2015-01-13'")
+        self.assertEqual(index.ids, [201501, 201502, 201503])
+        index = PeriodIndex.get("week", "'2015-01-04'", "'2015-01-05'")
+        self.assertEqual(index.ids, [201501])
+        self.assertEqual(index.unixtime, [u"1419811200"]) # 2014-12-29
+
+    def test_weeks_53(self):
+        # 2015 has 53 ISO weeks, 2016-01-03 is in the last one
+        index = PeriodIndex.get("week", "'2015-12-21'", "'2016-01-12'")
+        self.assertEqual(index.ids, [201552, 201553, 201601, 201602])
+        index = PeriodIndex.get("week", "'2016-01-03'", "'2016-01-04'")
+        self.assertEqual(index.ids, [201553])
+
+    def test_weeks_end_excluded(self):
+        # The end date is not included: no week starting on it
+        index = PeriodIndex.get("week", "'2015-01-05'", "'2015-01-12'")
+        self.assertEqual(index.ids, [201502])
+
+    def test_years(self):
+        index = PeriodIndex.get("year", "'2013-06-15'", "'2015-01-01'")
+        self.assertEqual(index.ids, [2013 * 12, 2014 * 12])
+        index = PeriodIndex.get("year", "'2013-06-15'", "'2015-01-02'")
+        self.assertEqual(index.ids, [2013 * 12, 2014 * 12, 2015 * 12])
+
+    def test_complete_weeks(self):
+        index = PeriodIndex.get("week", "'2015-12-21'", "'2016-01-12'")
+        ts = index.complete({"week": [201601, 201553, 201701], "commits": [3, 2, 9]})
+        self.assertEqual(ts["week"], [201552, 201553, 201601, 201602])
+        self.assertEqual(ts["commits"], [0, 2, 3, 0])
+        self.assertEqual(ts["id"], [0, 1, 2, 3])
+
+    def test_complete_items_years(self):
+        index = PeriodIndex.get("year", "'2013-01-01'", "'2015-01-01'")
+        data = {"name": ["a", "b", "a"], "year": [2014 * 12, 2013 * 12, 2013 * 12],
+                "commits": [1, 2, float("nan")]}
+        ts = index.complete_items(data, "name")
+        commits = dict(zip(ts["name"], ts["commits"]))
+        self.assertEqual(commits, {"a": [0, 1], "b": [2, 0]})
+        self.assertEqual(ts["year"], [2013 * 12, 2014 * 12])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#   Daniel Izquierdo <dizquierdo@bitergia.com>
+#
+
+"""Unit tests for datahandlers/quantile_sketch.py"""
+
+import math
+import random
+import unittest
+
+import numpy as np
+
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
+
+PERCENTILES = [0, 1, 10, 25, 50, 75, 90, 99, 100]
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def setUp(self):
+        # Skewed values, as times to close or to review
+        generator = random.Random(5)
+        self.values = [generator.expovariate(1 / 3600.0) for i in range(20000)]
+
+    def test_exact(self):
+        values = self.values[:1000]
+        sketch = QuantileSketch()
+        sketch.update(values)
+        for p in PERCENTILES:
+            self.assertAlmostEqual(sketch.percentile(p), np.percentile(values, p))
+        self.assertEqual(sketch.count, len(values))
+        self.assertAlmostEqual(sketch.mean(), np.mean(values))
+
+    def test_approximate(self):
+        sketch = QuantileSketch()
+        sketch.update(self.values)
+        self.assertTrue(len(sketch.means) < len(self.values) / 10)
+        self.assertEqual(sketch.percentile(0), min(self.values))
+        self.assertEqual(sketch.percentile(100), max(self.values))
+        for p in PERCENTILES:
+            # Error in rank below 0.5%
+            rank = np.searchsorted(np.sort(self.values), sketch.percentile(p))
+            self.assertTrue(abs(rank - p / 100.0 * len(self.values)) < 0.005 * len(self.values),
+                            "percentile %i" % p)
+        self.assertAlmostEqual(sketch.mean(), np.mean(self.values), places = 6)
+
+    def test_merge_exact(self):
+        sketches = []
+        for i in range(0, 900, 300):
+            sketch = QuantileSketch()
+            sketch.update(self.values[i:i+300])
+            sketches.append(sketch)
+        merged = QuantileSketch.merge_all(sketches)
+        for p in PERCENTILES:
+            self.assertAlmostEqual(merged.percentile(p), np.percentile(self.values[:900], p))
+
+    def test_merge_approximate(self):
+        sketches = []
+        for i in range(0, len(self.values), 5000):
+            sketch = QuantileSketch()
+            sketch.update(self.values[i:i+5000])
+            sketches.append(sketch)
+        merged = QuantileSketch.merge_all(sketches)
+        single = QuantileSketch()
+        single.update(self.values)
+        self.assertEqual(merged.count, single.count)
+        self.assertEqual((merged.min, merged.max), (single.min, single.max))
+        for p in PERCENTILES:
+            rank = np.searchsorted(np.sort(self.values), merged.percentile(p))
+            self.assertTrue(abs(rank - p / 100.0 * len(self.values)) < 0.01 * len(self.values),
+                            "percentile %i" % p)
+
+    def test_mode(self):
+        sketch = QuantileSketch(track_mode = True)
+        sketch.update([3, 1, 1, 3, 2])
+        self.assertEqual(sketch.mode(), (1.0, 2))
+        other = QuantileSketch(track_mode = True)
+        other.update([2, 2])
+        self.assertEqual(sketch.merge(other).mode(), (2.0, 3))
+        # Values without counts: the mode is unknown
+        sketch.merge(QuantileSketch().merge(other))
+        self.assertEqual(sketch.mode(), None)
+
+    def test_empty(self):
+        sketch = QuantileSketch()
+        self.assertTrue(math.isnan(sketch.median()))
+        self.assertTrue(math.isnan(sketch.mean()))
+        sketch.merge(QuantileSketch())
+        self.assertEqual(sketch.count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Unit tests for metrics/query_builder.py"""
+
+import shutil
+import tempfile
+import unittest
+
+from vizgrimoire.metrics.query_builder import DSQuery
+
+class TestProjectsClosure(unittest.TestCase):
+
+    def test_multilevel(self):
+        # 1 -> 2 -> 3 -> 4, 1 -> 5, 2 -> 4 (shorter path to 4)
+        children = [(1, 2), (2, 3), (3, 4), (1, 5), (2, 4)]
+        closure = DSQuery.get_projects_closure([1, 2, 3, 4, 5, 6], children)
+        self.assertEqual(closure[1], {1: 0, 2: 1, 3: 2, 4: 2, 5: 1})
+        self.assertEqual(closure[2], {2: 0, 3: 1, 4: 1})
+        self.assertEqual(closure[3], {3: 0, 4: 1})
+        self.assertEqual(closure[4], {4: 0})
+        # Projects without children
+        self.assertEqual(closure[6], {6: 0})
+
+    def test_cycles(self):
+        # 1 -> 2 -> 3 -> 1, and a project that is its own child
+        children = [(1, 2), (2, 3), (3, 1), (4, 4), (3, 5)]
+        closure = DSQuery.get_projects_closure([1, 2, 3, 4, 5], children)
+        self.assertEqual(closure[1], {1: 0, 2: 1, 3: 2, 5: 3})
+        self.assertEqual(closure[2], {2: 0, 3: 1, 1: 2, 5: 2})
+        self.assertEqual(closure[3], {3: 0, 1: 1, 2: 2, 5: 1})
+        self.assertEqual(closure[4], {4: 0})
+        self.assertEqual(closure[5], {5: 0})
+
+    def test_children_not_in_projects(self):
+        closure = DSQuery.get_projects_closure([1], [(7, 1)])
+        self.assertEqual(closure[7], {7: 0, 1: 1})
+
+    def test_get_rows(self):
+        self.assertEqual(DSQuery.get_rows({}, ["id"]), [])
+        self.assertEqual(DSQuery.get_rows({"id": 1, "name": "a"}, ["id", "name"]),
+                         [(1, "a")])
+        self.assertEqual(DSQuery.get_rows({"id": [1, 2], "name": ["a", "b"]}, ["name", "id"]),
+                         [("a", 1), ("b", 2)])
+
+
+class CacheQuery(DSQuery):
+    """ Query builder recording the executed queries, without a database """
+
+    def __init__(self, executed):
+        self.database = "scm"
+        self.identities_db = self.projects_db = None
+        self.host, self.port, self.user, self.group = ("localhost", 3306, "user", None)
+        self.executed = executed
+
+    def get_watermark(self):
+        return "watermark"
+
+    def _execute_query(self, sql):
+        self.executed.append(sql)
+        return {"id": len(self.executed)}
+
+class TestResultsCache(unittest.TestCase):
+
+    def setUp(self):
+        DSQuery.cache_states = {}
+        DSQuery.set_cache_dir(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(DSQuery.cache_dir)
+        DSQuery.set_cache_dir(None)
+        DSQuery.cache_states = {}
+
+    def test_variables_always_executed(self):
+        assign = "SELECT @maxdate:=max(date) from scmlog limit 1"
+        top = "SELECT id FROM scmlog WHERE DATEDIFF(@maxdate, date) < %i LIMIT 10"
+        executed = []
+        db = CacheQuery(executed)
+        db.ExecuteQuery(assign)
+        db.ExecuteQuery(top % 30)
+        self.assertEqual(executed, [assign, top % 30])
+
+        # A new process: the variable is set again before the query not cached
+        DSQuery.cache_states = {}
+        del executed[:]
+        db.ExecuteQuery(assign)
+        db.ExecuteQuery(top % 30)
+        db.ExecuteQuery(assign)
+        db.ExecuteQuery(top % 365)
+        self.assertEqual(executed, [assign, assign, top % 365])
+
+
+if __name__ == "__main__":
+    unittest.main()
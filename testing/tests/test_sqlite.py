@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Unit tests for GrimoireSQLite.py"""
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from vizgrimoire import GrimoireSQLite
+from vizgrimoire.GrimoireSQLite import translate, yearweek, timestampdiff, date_add, date_sub
+
+DUMP = """-- MySQL dump
+/*!40101 SET NAMES utf8 */;
+DROP TABLE IF EXISTS `scmlog`;
+CREATE TABLE `scmlog` (
+  `id` int(11) unsigned NOT NULL AUTO_INCREMENT,
+  `message` text COLLATE utf8_unicode_ci,
+  `type` enum('add','delete') DEFAULT NULL COMMENT 'kind of, ''action''',
+  `date` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `date` (`date`),
+  UNIQUE KEY `message` (`message`(100))
+) ENGINE=MyISAM DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
+LOCK TABLES `scmlog` WRITE;
+INSERT INTO `scmlog` VALUES (1,'it\\'s a \\"fix\\"\\nsecond line','add','2014-01-31 10:00:00'),
+(2,'semicolon; in text','delete','2014-02-01 00:00:00');
+UNLOCK TABLES;
+"""
+
+class TestSQLite(unittest.TestCase):
+
+    def test_translate(self):
+        self.assertEqual(translate("SELECT TIMESTAMPDIFF(DAY, a, b)"),
+                         "SELECT TIMESTAMPDIFF('DAY', a, b)")
+        self.assertEqual(translate("SELECT DATE_SUB(a, INTERVAL 7 DAY)"),
+                         "SELECT DATE_SUB(a, '7 DAY')")
+        self.assertEqual(translate("SELECT IF(a > 0, 1, 0)"),
+                         "SELECT IIF(a > 0, 1, 0)")
+
+    def test_divisions(self):
+        self.assertEqual(translate("SELECT COUNT(*)/3, 'a/b' FROM t /* a/b */"),
+                         "SELECT COUNT(*)*1.0/3, 'a/b' FROM t /* a/b */")
+        conn = GrimoireSQLite.sqlite_connect(":memory:")
+        sql = "SELECT TIMESTAMPDIFF(SECOND, '2014-01-01 00:00:00', " + \
+            "'2014-01-02 12:00:00')/86400, 7/2, COUNT(*)/3, 1/0 FROM (SELECT 1)"
+        self.assertEqual(conn.execute(translate(sql)).fetchall(), [(1.5, 3.5, 1 / 3.0, None)])
+        conn.close()
+
+    def test_translate_unions(self):
+        sql = "SELECT COUNT(*) FROM ((SELECT a, b FROM t LIMIT 2) union " + \
+            "(SELECT a, ')' FROM u)) t WHERE x IN (SELECT a FROM v)"
+        correct = "SELECT COUNT(*) FROM (SELECT * FROM (SELECT a, b FROM t LIMIT 2) union " + \
+            "SELECT * FROM (SELECT a, ')' FROM u)) t WHERE x IN (SELECT a FROM v)"
+        self.assertEqual(translate(sql), correct)
+
+    def test_translate_variables(self):
+        self.assertEqual(translate("SELECT @maxdate:=max(date) from irclog limit 1"),
+                         "SELECT SET_VARIABLE('maxdate', max(date)) from irclog limit 1")
+        self.assertEqual(translate("SELECT a FROM t WHERE DATEDIFF(@maxdate, date) < 7 " + \
+                                       "AND email = 'a@example.com'"),
+                         "SELECT a FROM t WHERE DATEDIFF(GET_VARIABLE('maxdate'), date) < 7 " + \
+                             "AND email = 'a@example.com'")
+
+    def test_yearweek(self):
+        # 2015-01-01 is thursday, 2014-12-28 sunday
+        self.assertEqual(yearweek(datetime(2015, 1, 1)), 201452)
+        self.assertEqual(yearweek(datetime(2015, 1, 4)), 201501)
+        self.assertEqual(yearweek(datetime(2015, 1, 1), 3), 201501)
+        self.assertEqual(yearweek(datetime(2014, 12, 29), 1), 201501)
+        self.assertEqual(yearweek(datetime(2016, 1, 3), 3), 201553)
+        self.assertRaises(ValueError, yearweek, datetime(2015, 1, 1), 4)
+
+    def test_timestampdiff(self):
+        self.assertEqual(timestampdiff("MONTH", "2014-01-31", "2014-02-28"), 0)
+        self.assertEqual(timestampdiff("MONTH", "2014-01-31", "2014-03-01"), 1)
+        self.assertEqual(timestampdiff("MONTH", "2014-03-01", "2014-01-31"), -1)
+        self.assertEqual(timestampdiff("YEAR", "2012-02-29", "2013-02-28"), 0)
+        self.assertEqual(timestampdiff("day", "2014-01-01 10:00:00", "2014-01-03 09:59:59"), 1)
+        self.assertEqual(timestampdiff("HOUR", "2014-01-01 10:00:00", "2014-01-01 08:30:00"), -1)
+        self.assertEqual(timestampdiff("DAY", None, "2014-01-01"), None)
+
+    def test_date_add(self):
+        self.assertEqual(date_add("2014-01-31", "1 MONTH"), "2014-02-28")
+        self.assertEqual(date_add("2014-12-31 10:00:00", "1 DAY"), "2015-01-01 10:00:00")
+        self.assertEqual(date_add("2014-01-01", "1 HOUR"), "2014-01-01 01:00:00")
+        self.assertEqual(date_add("2014-01-01", 2), "2014-01-03")
+        self.assertEqual(date_sub("2014-03-31", "1 QUARTER"), "2013-12-31")
+        self.assertEqual(date_add("wrong", "1 DAY"), None)
+
+    def test_load_mysql_dump(self):
+        sqlite_dir = tempfile.mkdtemp()
+        try:
+            db_file = GrimoireSQLite.get_db_file(sqlite_dir, "scm")
+            dump = [line + "\n" for line in DUMP.split("\n")]
+            GrimoireSQLite.load_mysql_dump(dump, db_file)
+            conn = sqlite3.connect(db_file)
+            rows = conn.execute("SELECT id, message, type, date FROM scmlog ORDER BY id").fetchall()
+            self.assertEqual(rows, [(1, u'it\'s a "fix"\nsecond line', u'add', u'2014-01-31 10:00:00'),
+                                    (2, u'semicolon; in text', u'delete', u'2014-02-01 00:00:00')])
+            indexes = [row[1] for row in conn.execute("PRAGMA index_list(scmlog)")]
+            self.assertTrue("scmlog_date" in indexes)
+            conn.close()
+
+            # MySQL queries in the loaded database
+            cursor = GrimoireSQLite.connect("scm", sqlite_dir).cursor()
+            cursor.execute("SELECT @maxdate:=MAX(date) FROM scmlog")
+            cursor.execute("SELECT id, YEARWEEK(date, 3), DATE_ADD(date, INTERVAL 1 MONTH) " + \
+                               "FROM scmlog WHERE DATEDIFF(@maxdate, date) < 1")
+            self.assertEqual(cursor.fetchall(), [(2, 201405, datetime(2014, 3, 1))])
+            for i in range(2):
+                cursor.execute("CREATE OR REPLACE VIEW messages AS " + \
+                                   "(SELECT message FROM scmlog WHERE id = 1) UNION " + \
+                                   "(SELECT message FROM scmlog WHERE id = %i)" % (i + 1))
+            cursor.execute("SELECT COUNT(*) FROM messages")
+            self.assertEqual(cursor.fetchall(), [(2,)])
+        finally:
+            shutil.rmtree(sqlite_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
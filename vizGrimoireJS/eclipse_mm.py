@@ -217,10 +217,7 @@ def its_report(dbcon, filters, sloc):
     #vizr.SetDBChannel(database=dbcon.database, user=dbcon.user, password=dbcon.password)
     #vizr.ReportTimeToCloseITS("bugzilla", "./")
     timeto = its.TimeToClose(dbcon, filters)
-    timeto_list = timeto.get_agg()
-    if not isinstance(timeto_list["timeto"], list):
-        timeto_list["timeto"] = [int(timeto_list["timeto"])]
-    dhesa = DHESA(timeto_list["timeto"])
+    dhesa = DHESA(timeto.get_sketch())
     its_fix_med_3m = dhesa.data["median"]
     its_fix_med_3m = its_fix_med_3m / 3600.0
     its_fix_med_3m = round(its_fix_med_3m / 24.0, 2)
@@ -311,13 +308,11 @@ def mls_report(dbcon, filters, sloc):
     #vizr.SetDBChannel(database=dbcon.database, user=dbcon.user, password=dbcon.password)
     #vizr.ReportTimeToAttendMLS("./")
     timeto = mls.TimeToFirstReply(dbcon, filters)
-    timeto_list = timeto.get_agg()
-    if not isinstance(timeto_list, list):
-        timeto_list = [int(timeto_list)]
+    timeto_sketch = timeto.get_sketch()
 
     mls_dev_resp_time_med_3m = "nan"
-    if len(timeto_list) > 0:
-        dhesa = DHESA(timeto_list)
+    if timeto_sketch.count > 0:
+        dhesa = DHESA(timeto_sketch)
         mls_dev_resp_time_med_3m = dhesa.data["median"]
         mls_dev_resp_time_med_3m = mls_dev_resp_time_med_3m / 3600.0
         mls_dev_resp_time_med_3m = round(mls_dev_resp_time_med_3m / 24.0, 2)
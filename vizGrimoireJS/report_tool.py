@@ -77,46 +77,58 @@ def create_reports_filters(period, startdate, enddate, destdir, npeople, identit
         Report.connect_ds(ds)
         logging.info("Creating filter reports for " + ds.get_name())
         for filter_ in Report.get_filters():
-            logging.info("-> " + filter_.get_name())
-            # Tested in all this filters the group by
-            supported_all = {
-                         "scm":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its_1":["people2"],
-                         "mls":["people2","company","country","repository","domain"],
-                         "scr":["people2","company","country","repository"],
-                         "mediawiki":["people2","company"],
-                         "irc":["people2"],
-                         "downloads":["people2"],
-                         "qaforums":["people2"],
-                         "releases":["people2"],
-                         "dockerhub":["people2"],
-                         "pullpo":["people2"],
-                         "eventizer":[]
-                         }
-            supported_on = {
-                         "scm":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its_1":["people2"],
-                         "mls":["people2","company","country","repository","domain"],
-                         "scr":["people2","company","country","repository"],
-                         "mediawiki":["people2","company"],
-                         "irc":["people2"],
-                         "downloads":["people2"],
-                         "qaforums":["people2"],
-                         "releases":["people2"],
-                         "dockerhub":["people2"],
-                         "pullpo":["people2"],
-                         "eventizer":[]
-                         }
-
-            if filter_.get_name() in supported_on[ds.get_name()]:
-            # if filter_.get_name() in ["people2","company+country","repository","company"]:
-                logging.info("---> Using new filter API")
-                ds.create_filter_report_all(filter_, period, startdate, enddate,
-                                            destdir, npeople, identities_db)
-            else:
-                ds.create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db)
+            create_report_filter(ds, filter_, period, startdate, enddate, destdir, npeople, identities_db)
+
+def create_report_filter(ds, filter_, period, startdate, enddate, destdir, npeople, identities_db):
+    logging.info("-> " + filter_.get_name())
+    # Tested in all this filters the group by
+    supported_all = {
+                 "scm":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its_1":["people2"],
+                 "mls":["people2","company","country","repository","domain"],
+                 "scr":["people2","company","country","repository"],
+                 "mediawiki":["people2","company"],
+                 "irc":["people2"],
+                 "downloads":["people2"],
+                 "qaforums":["people2"],
+                 "releases":["people2"],
+                 "dockerhub":["people2"],
+                 "pullpo":["people2"],
+                 "eventizer":[]
+                 }
+    supported_on = {
+                 "scm":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its_1":["people2"],
+                 "mls":["people2","company","country","repository","domain"],
+                 "scr":["people2","company","country","repository"],
+                 "mediawiki":["people2","company"],
+                 "irc":["people2"],
+                 "downloads":["people2"],
+                 "qaforums":["people2"],
+                 "releases":["people2"],
+                 "dockerhub":["people2"],
+                 "pullpo":["people2"],
+                 "eventizer":[]
+                 }
+
+    bundle = None
+    if opts.bundle:
+        # The list of items is still an individual file
+        bundle = JSONBundle(destdir, ds.get_name()+"-"+filter_.get_name_plural(),
+                            [filter_.get_filename(ds)])
+        bundle.open()
+    try:
+        if filter_.get_name() in supported_on[ds.get_name()]:
+        # if filter_.get_name() in ["people2","company+country","repository","company"]:
+            logging.info("---> Using new filter API")
+            ds.create_filter_report_all(filter_, period, startdate, enddate,
+                                        destdir, npeople, identities_db)
+        else:
+            ds.create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db)
+    finally:
+        if bundle is not None: bundle.close()
 
 def create_report_people(startdate, enddate, destdir, npeople, identities_db, people_ids=None):
     for ds in Report.get_data_sources():
@@ -229,22 +241,25 @@ def create_people_identifiers(startdate, enddate, destdir, npeople, identities_d
     # TODO: Identities db is the same than SCM
     Report.connect_ds(ds_scm)
 
-    for upeople_id in people_ids:
-        people_data[upeople_id] = People.GetPersonIdentifiers(identities_db, upeople_id)
+    people_data = People.GetPeopleIdentifiers(identities_db, people_ids)
 
     all_top_min_ds = get_top_people(startdate, enddate, identities_db)
 
     db = automator['generic']['db_cvsanaly']
     SetDBChannel (database=db, user=opts.dbuser, password=opts.dbpassword)
 
-    for upeople_id in all_top_min_ds:
-        people_data[upeople_id] = People.GetPersonIdentifiers(identities_db, upeople_id)
+    top_ids = [upeople_id for upeople_id in all_top_min_ds if upeople_id not in people_data]
+    people_data.update(People.GetPeopleIdentifiers(identities_db, top_ids))
 
     createJSON(people_data, destdir+"/people.json")
 
     return people_ids
 
 def create_reports_studies(period, startdate, enddate, destdir):
+    for ds in Report.get_data_sources():
+        create_report_studies(ds, period, startdate, enddate, destdir)
+
+def create_report_studies(ds, period, startdate, enddate, destdir):
     from vizgrimoire.metrics.metrics_filter import MetricFilters
 
     db_identities= Report.get_config()['generic']['db_identities']
@@ -255,22 +270,95 @@ def create_reports_studies(period, startdate, enddate, destdir):
 
     metric_filters = MetricFilters(period, startdate, enddate, [])
 
-    for ds in Report.get_data_sources():
-        ds_dbname = ds.get_db_name()
-        dbname = Report.get_config()['generic'][ds_dbname]
-        dsquery = ds.get_query_builder()
-        dbcon = dsquery(dbuser, dbpass, dbname, db_identities)
-        # logging.info(ds.get_name() + " studies active " + str(studies))
-        for study in studies:
-            logging.info("Creating report for " + study.id + " for " + ds.get_name())
-            try:
-                obj = study(dbcon, metric_filters)
-                obj.create_report(ds, destdir)
-            except TypeError:
-                import traceback
-                logging.info(study.id + " does no support standard API. Not used.")
-                traceback.print_exc(file=sys.stdout)
-                continue
+    ds_dbname = ds.get_db_name()
+    dbname = Report.get_config()['generic'][ds_dbname]
+    dsquery = ds.get_query_builder()
+    dbcon = dsquery(dbuser, dbpass, dbname, db_identities)
+    # logging.info(ds.get_name() + " studies active " + str(studies))
+    for study in studies:
+        logging.info("Creating report for " + study.id + " for " + ds.get_name())
+        try:
+            obj = study(dbcon, metric_filters)
+            obj.create_report(ds, destdir)
+        except TypeError:
+            import traceback
+            logging.info(study.id + " does no support standard API. Not used.")
+            traceback.print_exc(file=sys.stdout)
+            continue
+
+def get_report_tasks():
+    """ Independent reports as (kind, data source, filter) tasks """
+    tasks = []
+    ds_names = [ds.get_name() for ds in Report.get_data_sources()]
+    if not opts.study and not opts.no_filters and not opts.metric:
+        # Filters reports are the longest ones so they are scheduled first
+        for ds_name in ds_names:
+            for filter_ in Report.get_filters():
+                tasks.append(("filter", ds_name, filter_.get_name()))
+    if not opts.filter and not opts.study:
+        for ds_name in ds_names:
+            tasks.append(("evol", ds_name, None))
+            tasks.append(("agg", ds_name, None))
+            if not opts.metric: tasks.append(("top", ds_name, None))
+    if not opts.filter and not opts.metric and not opts.item:
+        for ds_name in ds_names:
+            tasks.append(("studies", ds_name, None))
+    return tasks
+
+def run_report_task(task):
+    """ Create the report for a task. Used in the worker processes
+
+    Returns the task and the queries profile of the task, if enabled.
+    """
+    from vizgrimoire.metrics.query_builder import DSQuery
+
+    if DSQuery.profile is not None:
+        # Queries of the parent process or of previous tasks are not returned
+        DSQuery.profile.pop_stats()
+    (kind, ds_name, filter_name) = task
+    ds = Report.get_data_source(ds_name)
+    logging.info("Creating " + kind + " report for " + ds_name)
+    try:
+        Report.connect_ds(ds)
+        if kind == "evol":
+            ds.create_evolutionary_report (period, startdate, enddate, opts.destdir, identities_db)
+        elif kind == "agg":
+            ds.create_agg_report (period, startdate, enddate, opts.destdir, identities_db)
+        elif kind == "top":
+            ds.create_top_report (startdate, enddate, opts.destdir, opts.npeople, identities_db)
+        elif kind == "filter":
+            create_report_filter(ds, Report.get_filter(filter_name), period, startdate,
+                                 enddate, opts.destdir, opts.npeople, identities_db)
+        elif kind == "studies":
+            create_report_studies(ds, period, startdate, enddate, opts.destdir)
+    except SystemExit, e:
+        # A worker exiting would block the pool
+        raise Exception(kind + " report for " + ds_name + " failed: " + str(e.code))
+    if DSQuery.profile is not None: return (task, DSQuery.profile.pop_stats())
+    return (task, None)
+
+def run_report_tasks(tasks, jobs):
+    """ Run the report tasks in a pool of jobs worker processes
+
+    Workers are forked from this process, so they share its Report
+    configuration, but each of them opens its own database connections.
+    Each task creates different JSON files, so the output is the same
+    than the one created running the tasks sequentially.
+    """
+    from multiprocessing import Pool
+    from vizgrimoire.metrics.query_builder import DSQuery
+
+    logging.info("Running " + str(len(tasks)) + " report tasks in " + str(jobs) + " processes")
+    pool = Pool(jobs)
+    try:
+        for (task, profile) in pool.imap_unordered(run_report_task, tasks):
+            logging.info("Report task done: " + str(task))
+            if profile is not None: DSQuery.profile.merge(profile)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    pool.join()
 
 def create_events(startdate, enddate, destdir):
     for ds in Report.get_data_sources():
@@ -279,6 +367,12 @@ def create_events(startdate, enddate, destdir):
         events = ds.get_events()
         createJSON(events, destdir+"/"+ds.get_name()+"-events.json")
 
+def write_query_profile(profile_file):
+    from vizgrimoire.metrics.query_builder import DSQuery
+
+    DSQuery.profile.write(profile_file)
+    logging.info("Queries profile written to " + profile_file)
+
 def set_data_source(ds_name):
     ds_ok = False
     dss_active = Report.get_data_sources()
@@ -340,14 +434,38 @@ def init_env():
 if __name__ == '__main__':
 
     init_env()
-    from vizgrimoire.GrimoireUtils import getPeriod, read_main_conf, createJSON
+    from vizgrimoire.GrimoireUtils import getPeriod, read_main_conf, createJSON, JSONBundle
     from vizgrimoire.report import Report
 
     logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
     logging.info("Starting Report analysis")
     opts = read_options()
 
-    Report.init(opts.config_file, opts.metrics_path)
+    if opts.query_cache:
+        from vizgrimoire.metrics.query_builder import DSQuery
+        DSQuery.set_cache_dir(opts.query_cache)
+
+    if opts.sqlite_dir:
+        from vizgrimoire.metrics.query_builder import DSQuery
+        DSQuery.set_sqlite_dir(opts.sqlite_dir)
+
+    if opts.profile_queries or opts.slow_query_time is not None:
+        import atexit
+        from vizgrimoire.metrics.query_builder import DSQuery
+        from vizgrimoire.metrics.query_profile import QueryProfile
+        DSQuery.set_profile(QueryProfile(opts.slow_query_time))
+        if opts.profile_queries:
+            # Written however the report ends (it exits in several places)
+            atexit.register(write_query_profile, opts.profile_queries)
+
+    # Only the metrics and studies needed are loaded
+    data_sources = metrics = studies = None
+    if opts.data_source: data_sources = [opts.data_source]
+    if opts.metric: metrics = [opts.metric]
+    if opts.study: studies = [opts.study]
+    elif opts.filter or opts.metric or opts.item:
+        studies = [] # studies reports not generated
+    Report.init(opts.config_file, opts.metrics_path, data_sources, metrics, studies)
 
     automator = read_main_conf(opts.config_file)
     if 'start_date' not in automator['r']:
@@ -389,6 +507,17 @@ if __name__ == '__main__':
         logging.info("Events generated OK")
         sys.exit(0)
 
+    if opts.jobs > 1:
+        run_report_tasks(get_report_tasks(), opts.jobs)
+        if not opts.filter and not opts.study and not opts.metric:
+            # People reports use all data sources
+            people_ids = create_people_identifiers(startdate, enddate, opts.destdir, opts.npeople, identities_db)
+            if (automator['r']['reports'].find('people')>-1):
+                create_report_people(startdate, enddate, opts.destdir, opts.npeople, identities_db, people_ids)
+            create_top_people_report(startdate, enddate, opts.destdir, identities_db)
+        logging.info("Report data source analysis OK")
+        sys.exit(0)
+
     if not opts.filter and not opts.study:
         logging.info("Creating global evolution metrics...")
         evol = create_evol_report(startdate, enddate, opts.destdir, identities_db)
@@ -212,10 +212,7 @@ def its_report(dbcon, filters, sloc):
     #vizr.SetDBChannel(database=dbcon.database, user=dbcon.user, password=dbcon.password)
     #vizr.ReportTimeToCloseITS("bugzilla", "./")
     timeto = its.TimeToClose(dbcon, filters)
-    timeto_list = timeto.get_agg()
-    if not isinstance(timeto_list["timeto"], list):
-        timeto_list["timeto"] = [int(timeto_list["timeto"])]
-    dhesa = DHESA(timeto_list["timeto"])
+    dhesa = DHESA(timeto.get_sketch())
     its_fix_med_1m = dhesa.data["median"]
     its_fix_med_1m = its_fix_med_1m / 3600.0
     its_fix_med_1m = round(its_fix_med_1m / 24.0, 2)
@@ -285,10 +282,7 @@ def mls_report(dbcon, filters, sloc):
     #vizr.SetDBChannel(database=dbcon.database, user=dbcon.user, password=dbcon.password)
     #vizr.ReportTimeToAttendMLS("./")
     timeto = mls.TimeToFirstReply(dbcon, filters)
-    timeto_list = timeto.get_agg()
-    if not isinstance(timeto_list, list):
-        timeto_list = [int(timeto_list)]
-    dhesa = DHESA(timeto_list)
+    dhesa = DHESA(timeto.get_sketch())
     mls_usr_resp_time_med_1m = dhesa.data["median"]
     mls_usr_resp_time_med_1m = mls_usr_resp_time_med_1m / 3600.0
     mls_usr_resp_time_med_1m = round(mls_usr_resp_time_med_1m / 24.0, 2)
@@ -117,6 +117,33 @@ def read_options():
                       action="store_true",
                       dest="events",
                       help="Generate events.")
+    parser.add_option("-j", "--jobs",
+                      action="store",
+                      type="int",
+                      dest="jobs",
+                      default=1,
+                      help="Number of processes used to create the reports")
+    parser.add_option("--query-cache",
+                      action="store",
+                      dest="query_cache",
+                      help="Directory used to cache the results of queries between executions")
+    parser.add_option("--sqlite-dir",
+                      action="store",
+                      dest="sqlite_dir",
+                      help="Directory with SQLite files, one per database, used instead of MySQL")
+    parser.add_option("--profile-queries",
+                      action="store",
+                      dest="profile_queries",
+                      help="File to write the profile of the executed queries (top statements by time and by count)")
+    parser.add_option("--slow-query-time",
+                      action="store",
+                      type="float",
+                      dest="slow_query_time",
+                      help="Log the queries slower than these seconds, and add their EXPLAIN to the profile")
+    parser.add_option("--bundle",
+                      action="store_true",
+                      dest="bundle",
+                      help="Write the filters items files in one bundle file per data source and filter.")
 
     (opts, args) = parser.parse_args()
 
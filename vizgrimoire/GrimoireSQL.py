@@ -22,6 +22,7 @@
 # SQL utilities
 
 import MySQLdb
+import MySQLdb.cursors
 import logging
 import re, sys
 from vizgrimoire.metrics.query_builder import DSQuery
@@ -29,8 +30,7 @@ from vizgrimoire.metrics.query_builder import DSQuery
 
 # global vars to be moved to specific classes
 cursor = None
-# one connection per database
-dbpool = {}
+# connections are shared with the query builders pool (DSQuery.get_db_conn)
 
 ##
 ## METAQUERIES
@@ -70,39 +70,23 @@ def BuildQuery (period, startdate, enddate, date_field, fields, tables, filters,
 def SetDBChannel (user=None, password=None, database=None,
                   host="127.0.0.1", port=3306, group=None):
     global cursor
-    global dbpool
-
-    db = None
-
-    if database in dbpool:
-        db = dbpool[database]
-    else:
-        if (group == None):
-            db = MySQLdb.connect(user=user, passwd=password,
-                                 db=database, host=host, port=port)
-        else:
-            db = MySQLdb.connect(read_default_group=group, db=database)
-        dbpool[database] = db
 
+    db = DSQuery.get_db_conn(user, password, database, host, port, group)
     cursor = db.cursor()
-    cursor.execute("SET NAMES 'utf8'")
 
 def ExecuteQuery (sql):
-    result = {}
-    cursor.execute(sql)
-    rows = cursor.rowcount
-    columns = cursor.description
-
-    if columns is None: return result
-
-    for column in columns:
-        result[column[0]] = []
-    if rows > 1:
-        for value in cursor.fetchall():
-            for (index,column) in enumerate(value):
-                result[columns[index][0]].append(column)
-    elif rows == 1:
-        value = cursor.fetchone()
-        for i in range (0, len(columns)):
-            result[columns[i][0]] = value[i]
-    return result 
+    def execute_query():
+        if not DSQuery.stream_results:
+            cursor.execute(sql)
+            return DSQuery.fetch_columns(cursor)
+
+        # Rows are streamed from the server instead of buffered all at once
+        ss_cursor = cursor.connection.cursor(MySQLdb.cursors.SSCursor)
+        try:
+            ss_cursor.execute(sql)
+            return DSQuery.fetch_columns(ss_cursor)
+        finally:
+            ss_cursor.close()
+
+    if DSQuery.profile is None: return execute_query()
+    return DSQuery.profile.execute(sql, execute_query, cursor.connection)
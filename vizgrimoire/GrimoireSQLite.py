@@ -0,0 +1,656 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#     Alvaro del Castillo <acs@bitergia.com>
+
+# SQLite execution of the MySQL queries
+
+# A directory with one SQLite file per MySQL database (database.db) is used
+# instead of a MySQL server. Other databases used in the queries
+# (identities, projects ...) are attached when they are referenced.
+# MySQL functions used in the queries (YEAR, YEARWEEK, TIMESTAMPDIFF,
+# DATE_FORMAT ...) are provided as SQLite functions, and some MySQL syntax
+# is rewritten before executing the queries:
+#  - divisions are real divisions, also for integers (SQLite truncates them)
+#  - parenthesized SELECTs in UNIONs
+#  - user variables (@var:=expr), kept per connection
+#  - CREATE OR REPLACE VIEW creates a temporary view for the connection
+#  - RENAME TABLE runs as ALTER TABLE statements in a transaction
+# Not supported: date arithmetic with INTERVAL out of DATE_ADD/DATE_SUB,
+# dates as numbers (date+0) and COUNT(DISTINCT) of several fields.
+# Divisions return floats, not decimals with 4 digits as in MySQL.
+
+import bisect
+import calendar
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import MySQLdb
+
+# MySQL error code for errors without a specific code
+UNKNOWN_ERROR = 1105
+
+DATETIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S.%f",
+                    "%Y-%m-%dT%H:%M:%S"]
+
+DATETIME_RE = re.compile("^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+DATE_RE = re.compile("^\d{4}-\d{2}-\d{2}$")
+
+##
+## MySQL functions
+##
+
+def to_datetime(value):
+    """ Date value as datetime, None (NULL in MySQL) if it is not a date """
+    if value is None or isinstance(value, datetime): return value
+    if isinstance(value, date): return datetime(value.year, value.month, value.day)
+    for date_format in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(str(value), date_format)
+        except ValueError:
+            pass
+    return None
+
+def format_datetime(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+def date_field(function):
+    """ Function of a date, NULL for NULL or wrong dates """
+    def date_function(value, *args):
+        value = to_datetime(value)
+        if value is None: return None
+        return function(value, *args)
+    return date_function
+
+def yearweek(value, mode = 0):
+    if mode in (1, 3):
+        # Weeks start on monday, week 1 has 4 or more days (ISO 8601)
+        (year, week, weekday) = value.isocalendar()
+        return year * 100 + week
+    if mode in (0, 2):
+        # Weeks start on sunday, week 1 has a sunday
+        sunday = value - timedelta(days = value.isoweekday() % 7)
+        return sunday.year * 100 + (sunday.timetuple().tm_yday - 1) / 7 + 1
+    raise ValueError("YEARWEEK mode not supported: " + str(mode))
+
+def unix_timestamp(value = None):
+    if value is None: return int(time.time())
+    value = to_datetime(value)
+    if value is None: return None
+    return calendar.timegm(value.timetuple())
+
+def from_unixtime(value):
+    if value is None: return None
+    return format_datetime(datetime.utcfromtimestamp(value))
+
+def months_between(start, end):
+    """ Complete months from start to end, as TIMESTAMPDIFF does """
+    months = (end.year - start.year) * 12 + end.month - start.month
+    if months > 0 and end.replace(year=2000, month=1) < start.replace(year=2000, month=1):
+        months -= 1
+    elif months < 0 and end.replace(year=2000, month=1) > start.replace(year=2000, month=1):
+        months += 1
+    return months
+
+def timestampdiff(unit, start, end):
+    (start, end) = (to_datetime(start), to_datetime(end))
+    if start is None or end is None: return None
+    unit = unit.upper()
+    if unit in ("MONTH", "QUARTER", "YEAR"):
+        months = months_between(start, end)
+        return int(months / {"MONTH": 1, "QUARTER": 3, "YEAR": 12}[unit])
+    diff = end - start
+    seconds = diff.days * 86400 + diff.seconds
+    seconds_unit = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600,
+                    "DAY": 86400, "WEEK": 7 * 86400}[unit]
+    return int(float(seconds) / seconds_unit)
+
+def datediff(end, start):
+    (start, end) = (to_datetime(start), to_datetime(end))
+    if start is None or end is None: return None
+    return (end.date() - start.date()).days
+
+def date_add(value, interval, sign = 1):
+    """ DATE_ADD for intervals as "number UNIT" strings (see translate) """
+    start = to_datetime(value)
+    if start is None or interval is None: return None
+    if isinstance(interval, (int, long)): (number, unit) = (interval, "DAY")
+    else:
+        (number, unit) = str(interval).split()
+        number = int(number)
+    number = sign * number
+    unit = unit.upper()
+    if unit in ("MONTH", "QUARTER", "YEAR"):
+        months = start.month - 1 + number * {"MONTH": 1, "QUARTER": 3, "YEAR": 12}[unit]
+        year = start.year + months / 12
+        month = months % 12 + 1
+        day = min(start.day, calendar.monthrange(year, month)[1])
+        result = start.replace(year = year, month = month, day = day)
+    else:
+        seconds = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600,
+                   "DAY": 86400, "WEEK": 7 * 86400}[unit]
+        result = start + timedelta(seconds = number * seconds)
+    if DATE_RE.match(str(value)) and unit not in ("SECOND", "MINUTE", "HOUR"):
+        return result.strftime("%Y-%m-%d")
+    return format_datetime(result)
+
+def date_sub(value, interval):
+    return date_add(value, interval, -1)
+
+# MySQL DATE_FORMAT specifiers
+DATE_FORMAT_SPECIFIERS = {
+    "a": lambda d: d.strftime("%a"), "b": lambda d: d.strftime("%b"),
+    "c": lambda d: str(d.month), "d": lambda d: "%02d" % d.day,
+    "e": lambda d: str(d.day), "f": lambda d: "%06d" % d.microsecond,
+    "H": lambda d: "%02d" % d.hour, "h": lambda d: d.strftime("%I"),
+    "I": lambda d: d.strftime("%I"), "i": lambda d: "%02d" % d.minute,
+    "j": lambda d: "%03d" % d.timetuple().tm_yday, "k": lambda d: str(d.hour),
+    "l": lambda d: str(int(d.strftime("%I"))), "M": lambda d: d.strftime("%B"),
+    "m": lambda d: "%02d" % d.month, "p": lambda d: d.strftime("%p"),
+    "S": lambda d: "%02d" % d.second, "s": lambda d: "%02d" % d.second,
+    "T": lambda d: d.strftime("%H:%M:%S"), "u": lambda d: d.strftime("%W"),
+    "U": lambda d: d.strftime("%U"), "v": lambda d: "%02d" % d.isocalendar()[1],
+    "W": lambda d: d.strftime("%A"), "w": lambda d: str((d.weekday() + 1) % 7),
+    "x": lambda d: str(d.isocalendar()[0]), "Y": lambda d: "%04d" % d.year,
+    "y": lambda d: "%02d" % (d.year % 100)
+}
+
+def date_format(value, date_format):
+    value = to_datetime(value)
+    if value is None or date_format is None: return None
+    return re.sub("%(.)",
+                  lambda m: DATE_FORMAT_SPECIFIERS.get(m.group(1), lambda d: m.group(1))(value),
+                  date_format)
+
+def concat(*args):
+    if None in args: return None
+    return "".join([str(arg) for arg in args])
+
+def greatest(*args):
+    if None in args: return None
+    return max(args)
+
+def least(*args):
+    if None in args: return None
+    return min(args)
+
+def interval(value, *limits):
+    """ Number of limits less than or equal to value, limits are sorted """
+    if value is None: return -1
+    return bisect.bisect_right(limits, value)
+
+def regexp(pattern, value):
+    if pattern is None or value is None: return None
+    return re.search(pattern, str(value), re.IGNORECASE) is not None
+
+def now():
+    return format_datetime(datetime.now())
+
+def curdate():
+    return date.today().strftime("%Y-%m-%d")
+
+# name, number of arguments (-1 for any), function
+FUNCTIONS = [
+    ("YEAR", 1, date_field(lambda d: d.year)),
+    ("MONTH", 1, date_field(lambda d: d.month)),
+    ("DAY", 1, date_field(lambda d: d.day)),
+    ("DAYOFMONTH", 1, date_field(lambda d: d.day)),
+    ("DAYOFYEAR", 1, date_field(lambda d: d.timetuple().tm_yday)),
+    ("DAYOFWEEK", 1, date_field(lambda d: d.isoweekday() % 7 + 1)),
+    ("WEEKDAY", 1, date_field(lambda d: d.weekday())),
+    ("HOUR", 1, date_field(lambda d: d.hour)),
+    ("QUARTER", 1, date_field(lambda d: (d.month - 1) / 3 + 1)),
+    ("YEARWEEK", 1, date_field(yearweek)),
+    ("YEARWEEK", 2, date_field(yearweek)),
+    ("UNIX_TIMESTAMP", 0, unix_timestamp),
+    ("UNIX_TIMESTAMP", 1, unix_timestamp),
+    ("FROM_UNIXTIME", 1, from_unixtime),
+    ("TIMESTAMPDIFF", 3, timestampdiff),
+    ("DATEDIFF", 2, datediff),
+    ("DATE_ADD", 2, date_add),
+    ("ADDDATE", 2, date_add),
+    ("DATE_SUB", 2, date_sub),
+    ("SUBDATE", 2, date_sub),
+    ("DATE_FORMAT", 2, date_format),
+    ("CONCAT", -1, concat),
+    ("GREATEST", -1, greatest),
+    ("LEAST", -1, least),
+    ("INTERVAL", -1, interval),
+    ("REGEXP", 2, regexp),
+    ("NOW", 0, now),
+    ("SYSDATE", 0, now),
+    ("CURDATE", 0, curdate),
+    ("CURRENT_DATE", 0, curdate)
+]
+
+INTERVAL_UNITS = "MICROSECOND|SECOND|MINUTE|HOUR|DAY|WEEK|MONTH|QUARTER|YEAR"
+
+SUBSELECT_RE = re.compile("\\(\s*SELECT\\b", re.IGNORECASE)
+UNION_BEFORE_RE = re.compile("\\bUNION(\s+ALL|\s+DISTINCT)?\s*$", re.IGNORECASE)
+UNION_AFTER_RE = re.compile("\s*UNION\\b", re.IGNORECASE)
+ASSIGN_RE = re.compile("@(\w+)\s*:=\s*")
+VARIABLE_RE = re.compile("@(\w+)")
+# Keywords ending the expression assigned to a user variable
+ASSIGN_END_RE = re.compile("\s+(AS|FROM|WHERE|GROUP|HAVING|ORDER|LIMIT)\\b", re.IGNORECASE)
+RENAME_TABLE_RE = re.compile("\s*RENAME\s+TABLE\s", re.IGNORECASE)
+RENAME_RE = re.compile("\s*`?([\w.]+)`?\s+TO\s+`?(?:\w+\.)?(\w+)`?\s*$", re.IGNORECASE)
+CREATE_VIEW_RE = re.compile("\s*CREATE\s+OR\s+REPLACE\s+VIEW\s+`?(\w+)`?", re.IGNORECASE)
+
+def literal_end(sql, pos):
+    """ Position after the string literal starting at pos """
+    quote = sql[pos]
+    pos += 1
+    while pos < len(sql):
+        if sql[pos] == "\\":
+            pos += 2
+        elif sql[pos] == quote:
+            if sql[pos + 1:pos + 2] != quote: return pos + 1
+            pos += 2
+        else:
+            pos += 1
+    return pos
+
+def closing_parenthesis(sql, pos):
+    """ Position of the parenthesis closing the one at pos, -1 if none """
+    depth = 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in "'\"":
+            pos = literal_end(sql, pos)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0: return pos
+        pos += 1
+    return -1
+
+def expression_end(sql, pos):
+    """ Position after the expression starting at pos
+
+    The expression ends in a comma or a closing parenthesis out of
+    parenthesis, in the clause keywords (ASSIGN_END_RE) or at the end.
+    """
+    depth = 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in "'\"":
+            pos = literal_end(sql, pos)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0: return pos
+            depth -= 1
+        elif depth == 0 and (char == "," or ASSIGN_END_RE.match(sql, pos)):
+            return pos
+        pos += 1
+    return pos
+
+def translate_unions(sql):
+    """ Parenthesized SELECTs in UNIONs as SELECT * FROM (SELECT ...)
+
+    SQLite does not accept parenthesis around the SELECTs of a UNION.
+    """
+    starts = []
+    pos = 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in "'\"":
+            pos = literal_end(sql, pos)
+            continue
+        if char == "(" and SUBSELECT_RE.match(sql, pos):
+            end = closing_parenthesis(sql, pos)
+            if UNION_BEFORE_RE.search(sql, 0, pos) or \
+                    (end > 0 and UNION_AFTER_RE.match(sql, end + 1)):
+                starts.append(pos)
+        pos += 1
+    for pos in reversed(starts):
+        sql = sql[:pos] + "SELECT * FROM " + sql[pos:]
+    return sql
+
+def translate_variables(sql):
+    """ MySQL user variables as calls to SET_VARIABLE and GET_VARIABLE """
+    if "@" not in sql: return sql
+    result = []
+    pos = 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in "'\"":
+            end = literal_end(sql, pos)
+            result.append(sql[pos:end])
+            pos = end
+            continue
+        assign = ASSIGN_RE.match(sql, pos)
+        if assign:
+            end = expression_end(sql, assign.end())
+            value = translate_variables(sql[assign.end():end])
+            result.append("SET_VARIABLE('%s', %s)" % (assign.group(1), value))
+            pos = end
+            continue
+        variable = VARIABLE_RE.match(sql, pos)
+        if variable and sql[pos - 1:pos] != "@":
+            result.append("GET_VARIABLE('%s')" % variable.group(1))
+            pos = variable.end()
+            continue
+        result.append(char)
+        pos += 1
+    return "".join(result)
+
+def translate_divisions(sql):
+    """ Divisions as real divisions, as in MySQL
+
+    SQLite divides integers as integers (COUNT(*)/3 is 0), so the dividend
+    of each / out of literals and comments is multiplied by 1.0.
+    """
+    if "/" not in sql: return sql
+    result = []
+    pos = 0
+    while pos < len(sql):
+        char = sql[pos]
+        if char in "'\"`":
+            end = literal_end(sql, pos)
+        elif sql.startswith("/*", pos):
+            end = sql.find("*/", pos + 2)
+            end = len(sql) if end < 0 else end + 2
+        elif char == "/":
+            result.append("*1.0/")
+            pos += 1
+            continue
+        else:
+            end = pos + 1
+        result.append(sql[pos:end])
+        pos = end
+    return "".join(result)
+
+def translate(sql):
+    """ Rewrite the MySQL syntax not supported by SQLite """
+    # Units are keywords in MySQL: strings for the SQLite functions
+    sql = re.sub("(?i)\\bTIMESTAMPDIFF\s*\(\s*(\w+)\s*,", "TIMESTAMPDIFF('\\1',", sql)
+    sql = re.sub("(?i)\\bINTERVAL\s+'?([-+]?\d+)'?\s+(" + INTERVAL_UNITS + ")\\b",
+                 "'\\1 \\2'", sql)
+    sql = re.sub("(?i)\\bIF\s*\(", "IIF(", sql)
+    sql = translate_unions(sql)
+    sql = translate_variables(sql)
+    sql = translate_divisions(sql)
+    return sql
+
+def register_functions(conn):
+    """ Add the MySQL functions to a SQLite connection """
+    for (name, args, function) in FUNCTIONS:
+        conn.create_function(name, args, function)
+    # User variables, for the connection
+    variables = {}
+    def set_variable(name, value):
+        variables[name] = value
+        return value
+    conn.create_function("SET_VARIABLE", 2, set_variable)
+    conn.create_function("GET_VARIABLE", 1, lambda name: variables.get(name))
+
+def sqlite_connect(db_file):
+    """ SQLite connection to db_file with the MySQL functions """
+    conn = sqlite3.connect(db_file, isolation_level = None,
+                           check_same_thread = False)
+    # Strings are returned as utf8 str, as MySQLdb does
+    conn.text_factory = str
+    register_functions(conn)
+    return conn
+
+def get_db_file(sqlite_dir, database):
+    return os.path.join(sqlite_dir, database + ".db")
+
+def convert_value(value):
+    """ Dates are stored as strings, and datetimes are returned as datetime
+
+    Strings with just a date are kept, as they are usually the result of
+    DATE_FORMAT, which MySQL returns as a string too.
+    """
+    if isinstance(value, str) and len(value) == 19 and DATETIME_RE.match(value):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return value
+
+def mysql_error(error):
+    """ MySQLdb exception for a SQLite error, so callers handle them as usual """
+    if isinstance(error, sqlite3.IntegrityError):
+        return MySQLdb.IntegrityError(UNKNOWN_ERROR, str(error))
+    if isinstance(error, sqlite3.OperationalError):
+        return MySQLdb.OperationalError(UNKNOWN_ERROR, str(error))
+    return MySQLdb.DatabaseError(UNKNOWN_ERROR, str(error))
+
+
+class Cursor(object):
+    """ MySQLdb cursor interface on a SQLite cursor """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.conn.cursor()
+        self.description = None
+
+    def execute(self, sql):
+        # Session settings (SET NAMES ...) have no meaning in SQLite
+        if re.match("\s*SET\s", sql, re.IGNORECASE):
+            self.description = None
+            return 0
+        if RENAME_TABLE_RE.match(sql):
+            return self.rename_tables(sql)
+        view = CREATE_VIEW_RE.match(sql)
+        if view:
+            # Views of tables in attached databases must be temporary,
+            # so they are created for the connection
+            sql = "CREATE TEMP VIEW " + view.group(1) + sql[view.end():]
+        sql = translate(sql)
+        self.connection.attach_databases(sql)
+        try:
+            if view:
+                self.cursor.execute("DROP VIEW IF EXISTS temp." + view.group(1))
+            self.cursor.execute(sql)
+        except sqlite3.Error, e:
+            raise mysql_error(e)
+        self.description = self.cursor.description
+        return self.cursor.rowcount
+
+    def rename_tables(self, sql):
+        """ RENAME TABLE as ALTER TABLE statements in a transaction
+
+        As in MySQL, other connections see all the tables renamed or none.
+        """
+        self.connection.attach_databases(sql)
+        renames = [RENAME_RE.match(rename) for rename
+                   in sql[RENAME_TABLE_RE.match(sql).end():].split(",")]
+        if None in renames:
+            raise MySQLdb.ProgrammingError(UNKNOWN_ERROR, "Wrong RENAME TABLE: " + sql)
+        try:
+            self.cursor.execute("BEGIN")
+            try:
+                for rename in renames:
+                    self.cursor.execute("ALTER TABLE %s RENAME TO %s" % rename.groups())
+            except sqlite3.Error:
+                self.cursor.execute("ROLLBACK")
+                raise
+            self.cursor.execute("COMMIT")
+        except sqlite3.Error, e:
+            raise mysql_error(e)
+        self.description = None
+        return 0
+
+    def fetchmany(self, size = 1):
+        return [tuple([convert_value(value) for value in row])
+                for row in self.cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [tuple([convert_value(value) for value in row])
+                for row in self.cursor.fetchall()]
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        if len(rows) == 0: return None
+        return rows[0]
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+
+class Connection(object):
+    """ MySQLdb connection interface on SQLite databases in a directory """
+
+    # Query plans are shown with EXPLAIN QUERY PLAN (EXPLAIN shows the bytecode)
+    explain_prefix = "EXPLAIN QUERY PLAN "
+
+    def __init__(self, database, sqlite_dir):
+        db_file = get_db_file(sqlite_dir, database)
+        if not os.path.isfile(db_file):
+            raise MySQLdb.OperationalError(1049, "Unknown database " + db_file)
+        self.database = database
+        self.sqlite_dir = sqlite_dir
+        self.conn = sqlite_connect(db_file)
+        self.attached = set()
+
+    def attach_databases(self, sql):
+        """ Attach the databases referenced as database.table in sql """
+        for name in set(re.findall("`?(\w+)`?\s*\.\s*`?\w", sql)):
+            if name in self.attached: continue
+            db_file = get_db_file(self.sqlite_dir, name)
+            if not os.path.isfile(db_file): continue
+            self.conn.execute("ATTACH DATABASE ? AS " + name, (db_file,))
+            self.attached.add(name)
+
+    def cursor(self, cursorclass = None):
+        # All the cursors stream the results
+        return Cursor(self)
+
+    def ping(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.conn.close()
+
+def connect(database, sqlite_dir):
+    """ Connection to database, in a SQLite file in sqlite_dir """
+    return Connection(database, sqlite_dir)
+
+##
+## MySQL dumps
+##
+
+MYSQL_ESCAPES = {"0": "", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a", "b": "\b"}
+
+def sqlite_literal(match):
+    """ SQLite string literal for a MySQL one """
+    def unescape(m):
+        if m.group(1) is None: return "'"
+        return MYSQL_ESCAPES.get(m.group(1), m.group(1))
+    value = re.sub(r"\\(.)|''", unescape, match.group(1), flags = re.DOTALL)
+    return "'" + value.replace("'", "''") + "'"
+
+def convert_insert(sql):
+    return re.sub(r"'((?:[^'\\]|\\.|'')*)'", sqlite_literal, sql, flags = re.DOTALL)
+
+def convert_create_table(sql):
+    """ SQLite CREATE TABLE and CREATE INDEX statements for a MySQL one """
+    table = re.match("\s*CREATE\s+TABLE\s+`?(\w+)`?", sql, re.IGNORECASE).group(1)
+    body = sql[sql.index("(") + 1:sql.rindex(")")]
+    definitions = []
+    indexes = []
+    for line in body.split("\n"):
+        line = line.strip().rstrip(",")
+        if line == "": continue
+        key = re.match("(UNIQUE\s+|FULLTEXT\s+|SPATIAL\s+)?(KEY|INDEX)\s+`?(\w+)`?\s*\((.*)\)",
+                       line, re.IGNORECASE)
+        if key is not None:
+            # Prefix lengths, as in `name`(100), are not supported
+            columns = re.sub("\(\d+\)", "", key.group(4))
+            kind = (key.group(1) or "").strip().upper()
+            if kind == "UNIQUE":
+                definitions.append("UNIQUE (" + columns + ")")
+            elif kind == "":
+                indexes.append("CREATE INDEX `%s_%s` ON `%s` (%s)" %
+                               (table, key.group(3), table, columns))
+            continue
+        if re.match("(CONSTRAINT|FOREIGN\s+KEY)\\b", line, re.IGNORECASE): continue
+        if re.match("PRIMARY\s+KEY", line, re.IGNORECASE):
+            definitions.append(re.sub("\(\d+\)", "", line))
+            continue
+        line = re.sub("(?i)\\b(enum|set)\s*\(.*?\)(?=\s|$)", "text", line)
+        line = re.sub("(?i)\s+(unsigned|zerofill|AUTO_INCREMENT)\\b", "", line)
+        line = re.sub("(?i)\s+(CHARACTER\s+SET|COLLATE)\s+\w+", "", line)
+        line = re.sub("(?i)\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", "", line)
+        line = re.sub("(?i)\s+COMMENT\s+'(?:[^'\\\\]|\\\\.|'')*'", "", line)
+        definitions.append(line)
+    create = "CREATE TABLE `%s` (\n  %s\n)" % (table, ",\n  ".join(definitions))
+    return [create] + indexes
+
+def convert_statement(sql):
+    """ SQLite statements for a MySQL dump statement """
+    if re.match("\s*INSERT\s", sql, re.IGNORECASE):
+        return [convert_insert(sql)]
+    # MySQL version conditional comments: /*!50001 ... */
+    sql = re.sub("/\*!\d+\s?", "", sql).replace("*/", "")
+    sql = sql.strip().rstrip(";").strip()
+    if re.match("(SET|LOCK|UNLOCK)\\b|ALTER\s+TABLE\s.*\s(DISABLE|ENABLE)\s+KEYS",
+                sql, re.IGNORECASE) or sql == "":
+        return []
+    if re.match("CREATE\s+TABLE\s", sql, re.IGNORECASE):
+        return convert_create_table(sql)
+    if re.match("CREATE\s.*\sVIEW\s", sql, re.IGNORECASE | re.DOTALL):
+        sql = re.sub("(?i)\s*(ALGORITHM\s*=\s*\w+|DEFINER\s*=\s*\S+|SQL\s+SECURITY\s+\w+)",
+                     "", sql)
+    return [translate(sql)]
+
+def load_mysql_dump(dump, db_file):
+    """ Create the SQLite database db_file with the MySQL dump lines in dump
+
+    Statements not supported by SQLite (i.e. views using MySQL syntax) are
+    logged and ignored.
+    """
+    if os.path.isfile(db_file): os.remove(db_file)
+    conn = sqlite_connect(db_file)
+    conn.execute("BEGIN")
+    statement = []
+    for line in dump:
+        if not statement and (line.startswith("--") or line.strip() == ""):
+            continue
+        statement.append(line)
+        if not line.rstrip().endswith(";"): continue
+        sql = unicode("".join(statement), "utf-8", "replace")
+        statement = []
+        for sqlite_sql in convert_statement(sql):
+            try:
+                conn.execute(sqlite_sql)
+            except sqlite3.Error, e:
+                if not re.match("\s*DROP\s", sqlite_sql, re.IGNORECASE):
+                    logging.warning("Statement not loaded in " + db_file + ": " +
+                                    str(e) + ": " + sqlite_sql[0:200].encode("utf-8"))
+    conn.execute("COMMIT")
+    conn.close()
@@ -33,11 +33,14 @@ from dateutil.relativedelta import relativedelta
 from dateutil import parser
 import logging
 import json
+from json.encoder import encode_basestring_ascii, FLOAT_REPR, INFINITY
 import math
+from decimal import Decimal
 import rpy2.rinterface as rinterface
 from rpy2.robjects.vectors import StrVector
 import os,sys
 from numpy import average, median
+from vizgrimoire.datahandlers.period_index import PeriodIndex, set_dates_locale
 
 def valRtoPython(val):
     if val is rinterface.NA_Character: val = None
@@ -140,17 +143,13 @@ def completePeriodIdsMonths(ts_data, start, end):
         timestamp = calendar.timegm(current.timetuple())
         new_ts_data['unixtime'].append(unicode(timestamp))
         new_ts_data['id'].append(i)
-        import locale
-        locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
+        set_dates_locale()
         new_ts_data['date'].append(datetime.strftime(current, "%b %Y"))
 
     return new_ts_data
 
 def date2Week(date):
-    # isocalendar: year weeknumber weekday
-    week   = str(date.isocalendar()[0])
-    week  += "%02d" % date.isocalendar()[1]
-    return week
+    return PeriodIndex.date2week(date)
 
 def completePeriodIdsWeeks(ts_data, start, end):
     data_vars = ts_data.keys()
@@ -192,6 +191,13 @@ def completePeriodIds(ts_data, period, startdate, enddate):
     if "id" in ts_data: return ts_data
 
     if len(ts_data.keys()) == 0: return ts_data
+
+    index = PeriodIndex.get(period, startdate, enddate)
+    if index is None: return cleanNaN(ts_data)
+    if "unixtime" not in ts_data and "date" not in ts_data:
+        return index.complete(ts_data)
+
+    # Time series with their own unixtime or date fields
     new_ts_data = ts_data
     startdate = startdate.replace("'", "")
     enddate = enddate.replace("'", "")
@@ -220,17 +226,11 @@ def genDates(period, startdate, enddate):
         the data structure.
     """
 
-    dates = createTimeSeries({})
-    dates.pop('id')
-    dates[period] = []
-
-    dates = completePeriodIds(dates, period, startdate, enddate)
-
-    # Remove zeros
-    dates['date'] = [d for d in dates['date'] if d != 0]
-    dates['unixtime'] = [d for d in dates['unixtime'] if d != 0]
+    index = PeriodIndex.get(period, startdate, enddate)
+    if index is None:
+        return {'unixtime': [], 'date': [], period: []}
 
-    return dates
+    return index.complete({period: []})
 
 
 # Convert a R data frame to a python dictionary
@@ -341,6 +341,159 @@ def convertCombinedFiltersName(data):
             break
     return data
 
+class JSONWriter(json.JSONEncoder):
+    """JSON encoder used to write the JSON files
+
+    In just one pass over the data Decimals are converted to floats, floats
+    are rounded to max_decimals, datetimes are converted to strings and NaN
+    values are written as "NA". Nested containers are converted following
+    the same rules than removeDecimals, roundDecimals and convertDatetime
+    so the JSON generated is the same than applying them to the data.
+    """
+
+    def __init__(self, max_decimals):
+        json.JSONEncoder.__init__(self, sort_keys=True)
+        self.max_decimals = max_decimals
+
+    def default(self, o):
+        if isinstance(o, Decimal): return float(o)
+        if isinstance(o, datetime): return str(o)
+        return json.JSONEncoder.default(self, o)
+
+    def encode(self, o):
+        return ''.join(self.iterencode(o))
+
+    def iterencode(self, o, _one_shot=False):
+        chunks = []
+        if isinstance(o, dict): self._encode_dict(o, chunks, True, True)
+        elif isinstance(o, list): self._encode_list(o, chunks, True, True)
+        else: self._encode_value(o, chunks, False, False, False)
+        return chunks
+
+    def _encode_str(self, o):
+        text = encode_basestring_ascii(o)
+        if 'NaN' in text: text = text.replace('NaN','"NA"')
+        return text
+
+    def _encode_float(self, o):
+        if o != o: return '"NA"'
+        elif o == INFINITY: return 'Infinity'
+        elif o == -INFINITY: return '-Infinity'
+        return FLOAT_REPR(o)
+
+    def _encode_value(self, value, chunks, convert, convert_dates, in_dict):
+        """ Encode value, converting it if the container is converted
+
+        convert: Decimals and floats are converted in the container
+        convert_dates: datetimes are converted in the container
+        in_dict: the container is a dict
+        """
+        if isinstance(value, basestring):
+            chunks.append(self._encode_str(value))
+        elif value is None:
+            chunks.append('null')
+        elif value is True:
+            chunks.append('true')
+        elif value is False:
+            chunks.append('false')
+        elif isinstance(value, (int, long)):
+            chunks.append(str(value))
+        elif isinstance(value, float):
+            if convert: value = round(value, self.max_decimals)
+            chunks.append(self._encode_float(value))
+        elif convert and isinstance(value, Decimal):
+            chunks.append(self._encode_float(round(float(value), self.max_decimals)))
+        elif convert_dates and isinstance(value, datetime):
+            chunks.append(self._encode_str(str(value)))
+        elif isinstance(value, list):
+            # Lists in lists are converted, but not their datetimes
+            self._encode_list(value, chunks, convert, convert_dates and in_dict)
+        elif isinstance(value, tuple):
+            self._encode_list(value, chunks, False, False)
+        elif isinstance(value, dict):
+            # Dicts in lists are not converted
+            self._encode_dict(value, chunks, convert and in_dict,
+                              convert_dates and in_dict)
+        else:
+            self._encode_value(self.default(value), chunks, False, False, False)
+
+    def _encode_list(self, lst, chunks, convert, convert_dates):
+        if not lst:
+            chunks.append('[]')
+            return
+        chunks.append('[')
+        first = True
+        for value in lst:
+            if first: first = False
+            else: chunks.append(self.item_separator)
+            self._encode_value(value, chunks, convert, convert_dates, False)
+        chunks.append(']')
+
+    def _encode_dict(self, dct, chunks, convert, convert_dates):
+        if not dct:
+            chunks.append('{}')
+            return
+        chunks.append('{')
+        first = True
+        for (key, value) in sorted(dct.items(), key=lambda kv: kv[0]):
+            if isinstance(key, basestring): pass
+            elif isinstance(key, float):
+                if key != key: key = 'NaN'
+                else: key = self._encode_float(key)
+            elif key is True: key = 'true'
+            elif key is False: key = 'false'
+            elif key is None: key = 'null'
+            elif isinstance(key, (int, long)): key = str(key)
+            else: raise TypeError("key " + repr(key) + " is not a string")
+            if first: first = False
+            else: chunks.append(self.item_separator)
+            chunks.append(self._encode_str(key))
+            chunks.append(self.key_separator)
+            self._encode_value(value, chunks, convert, convert_dates, True)
+        chunks.append('}')
+
+class JSONBundle(object):
+    """Many JSON files of a directory written as just one JSON lines file
+
+    While a bundle is active, createJSON adds the files for its directory
+    to the bundle, one JSON document per line, instead of creating them.
+    When closed, an index with the offset and length of each file in the
+    bundle is written as <name>-bundle-index.json.
+    """
+
+    active = None # bundle used by createJSON
+
+    def __init__(self, destdir, name, skip_files = []):
+        self.destdir = os.path.abspath(destdir)
+        self.name = name
+        self.skip_files = skip_files # files created as usual
+        self.filename = name + "-bundle.jsonl"
+        self.index = {}
+        self.offset = 0
+        self.fd = open(os.path.join(self.destdir, self.filename), 'w')
+
+    def accepts(self, filepath):
+        filepath = os.path.abspath(filepath)
+        if os.path.dirname(filepath) != self.destdir: return False
+        return os.path.basename(filepath) not in self.skip_files
+
+    def add(self, filepath, json_data):
+        self.fd.write(json_data + "\n")
+        # If a file is added twice the last one is used
+        self.index[os.path.basename(filepath)] = [self.offset, len(json_data)]
+        self.offset += len(json_data) + 1
+
+    def open(self):
+        JSONBundle.active = self
+
+    def close(self):
+        if JSONBundle.active is self: JSONBundle.active = None
+        self.fd.close()
+        index = {"bundle": self.filename, "files": self.index}
+        index_file = os.path.join(self.destdir, self.name + "-bundle-index.json")
+        createJSON(index, index_file)
+        logging.info(str(len(self.index)) + " files in bundle " + self.filename)
+
 # Until we use VizPy we will create JSON python files with _py
 def createJSON(data, filepath, check=False, skip_fields = []):
     check = False # for production mode
@@ -348,10 +501,15 @@ def createJSON(data, filepath, check=False, skip_fields = []):
     filepath_py = filepath_tokens[0]+"_py.json"
     filepath_r = filepath_tokens[0]+"_r.json"
 
-    checked_data = convertDatetime(roundDecimals(removeDecimals(data)))
-    checked_data = convertCombinedFiltersName(checked_data)
-    json_data = json.dumps(checked_data, sort_keys=True)
-    json_data = json_data.replace('NaN','"NA"')
+    from vizgrimoire.metrics.metrics import Metrics
+    # The data passed in is not modified
+    if isinstance(data, dict): data = dict(data)
+    checked_data = convertCombinedFiltersName(data)
+    json_data = JSONWriter(Metrics.max_decimals).encode(checked_data)
+    bundle = JSONBundle.active
+    if bundle is not None and bundle.accepts(filepath):
+        bundle.add(filepath, json_data)
+        return
     if check == False: #forget about R JSON checking
         jsonfile = open(filepath, 'w')
         jsonfile.write(json_data)
@@ -43,4 +43,55 @@ def GetPersonIdentifiers (identities_db, upeople_id):
             WHERE pro.uuid ='%s'
             """ % (identities_db, identities_db, upeople_id)
         res = ExecuteQuery(q)
-    return res
\ No newline at end of file
+    return res
+
+
+def GetPeopleIdentifiers (identities_db, upeople_ids, chunk_size = 1000):
+    """ Get people, company and country information for a list of people
+
+    Returns a dict with the same data returned by GetPersonIdentifiers for
+    each person. People are queried in chunks of chunk_size using IN lists.
+    """
+    upeople_ids = list(upeople_ids)
+    people = {}
+    for i in range(0, len(upeople_ids), chunk_size):
+        chunk = upeople_ids[i:i+chunk_size]
+        people_list = ",".join(["'%s'" % (upeople_id) for upeople_id in chunk])
+        q = """
+            SELECT pro.uuid, pro.name, pro.email, cou.name as country,
+                   org.name as affiliation
+            FROM %s.profiles pro
+            JOIN %s.enrollments enr ON enr.uuid= pro.uuid
+            JOIN %s.organizations org ON org.id = enr.organization_id
+            LEFT JOIN %s.countries cou ON cou.code = pro.country_code
+            WHERE pro.uuid IN (%s)
+            """ % (identities_db, identities_db, identities_db, identities_db,
+                   people_list)
+        try:
+            res = ExecuteQuery(q)
+        except:
+            # No organizations. Just people data and country data.
+            q = """
+                SELECT pro.uuid, pro.name, pro.email, cou.name as country
+                FROM %s.profiles pro
+                LEFT JOIN %s.countries cou ON cou.code = pro.country_code
+                WHERE pro.uuid IN (%s)
+                """ % (identities_db, identities_db, people_list)
+            res = ExecuteQuery(q)
+
+        # Split the rows per person
+        fields = res.keys()
+        for field in fields:
+            if not isinstance(res[field], list): res[field] = [res[field]]
+        rows = {}
+        for row in range(0, len(res['uuid'])):
+            rows.setdefault(res['uuid'][row], []).append(row)
+        for upeople_id in chunk:
+            person = {}
+            person_rows = rows.get(upeople_id, [])
+            for field in fields:
+                person[field] = [res[field][row] for row in person_rows]
+                # Just one row is returned as values, not lists
+                if len(person_rows) == 1: person[field] = person[field][0]
+            people[upeople_id] = person
+    return people
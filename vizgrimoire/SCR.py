@@ -185,21 +185,21 @@ class SCR(DataSource):
             if automator_metrics in automator['r']:
                 metrics_trends = automator['r'][automator_metrics].split(",")
 
-            for i in [7,30,365]:
-                for item in all_metrics:
-                    if item.id not in metrics_trends: continue
-                    mfilter_orig = item.filters
-                    item.filters = mfilter
-                    period_data = item.get_trends(enddate, i)
-                    item.filters = mfilter_orig
-
-                    data = dict(data.items() +  period_data.items())
-
-                    if type_analysis and type_analysis[1] is None:
-                        id_field = SCRQuery.get_group_field_alias(type_analysis[0])
+            for item in all_metrics:
+                if item.id not in metrics_trends: continue
+                mfilter_orig = item.filters
+                item.filters = mfilter
+                if type_analysis and type_analysis[1] is None:
+                    id_field = SCRQuery.get_group_field_alias(type_analysis[0])
+                    for i in [7,30,365]:
+                        period_data = item.get_trends(enddate, i)
                         period_data = fill_and_order_items(items, period_data, id_field)
-
+                        data = dict(data.items() +  period_data.items())
+                else:
+                    # All windows in one query if possible
+                    period_data = item.get_trends_windows(enddate, [7,30,365])
                     data = dict(data.items() +  period_data.items())
+                item.filters = mfilter_orig
 
 
         if filter_ is not None: studies_data = {}
@@ -23,6 +23,7 @@
 # Demography analysis. Age of developers in the project, age of
 # developers still with activity, and so on.
 
+from grimoirelib_alch.query.common import GrimoireDatabase
 from grimoirelib_alch.query.scm import DB as SCMDatabase
 from grimoirelib_alch.family.scm import (
     NomergesCondition as SCMNomergesCondition,
@@ -50,6 +51,7 @@ from grimoirelib_alch.family.duration_persons import (
     ActiveCondition
     )
 from vizgrimoire.analysis.analyses import Analyses
+from vizgrimoire.metrics.query_builder import DSQuery
 from vizgrimoire.SCM import SCM
 from vizgrimoire.ITS import ITS
 from vizgrimoire.MLS import MLS
@@ -151,10 +153,15 @@ class Ages(Analyses):
             logging.info("Error: no data source for study!")
             return
         # Prepare the SQLAlchemy database url
-        url = 'mysql://' + self.db.user + ':' + \
-            self.db.password + '@' + self.db.host + '/'
+        url = self.db.get_sqlalchemy_url()
         schema = self.db.database
         schema_id = self.db.identities_db
+        # Reflected schemas are stored with the cached query results, so
+        # that the database objects of later processes skip reflection
+        if DSQuery.cache_dir is not None and \
+                GrimoireDatabase.metadata_dir is None:
+            GrimoireDatabase.set_metadata_dir(
+                os.path.join(DSQuery.cache_dir, "_sqlalchemy"))
         # Get startdate, endate as datetime objects
         startdate = datetime.strptime(self.filters.startdate, "'%Y-%m-%d'")
         enddate = datetime.strptime(self.filters.enddate, "'%Y-%m-%d'")
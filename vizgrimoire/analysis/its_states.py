@@ -28,9 +28,11 @@
 #    Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import numpy as np
+
 from vizgrimoire.analysis.analyses import Analyses
 
-from vizgrimoire.GrimoireUtils import completePeriodIds
+from vizgrimoire.GrimoireUtils import completePeriodIds, checkListArray
 
 
 class TicketsStates(Analyses):
@@ -51,12 +53,17 @@ class TicketsStates(Analyses):
                ORDER BY udate""" % (backend_type, self.filters.startdate, self.filters.enddate)
         return q
 
-    def __get_sql_current__(self, state, evolutionary):
-        """This function returns the evolution or agg number of issues state"""
+    def __get_sql_current__(self, states, evolutionary):
+        """This function returns the evolution or agg number of issues of each state"""
 
-        fields = " count(distinct(id)) as `current_" + state + "` "
+        fields = []
+        for state in states:
+            condition = "status = '" + state.replace("'", "''") + "'"
+            fields.append(self.db.get_field_conditional("count(distinct(id))", condition) +
+                          " as `current_" + state + "` ")
+        fields = ", ".join(fields)
         tables = " issues i "
-        filters = " status = '" + state.replace("'", "''") + "' "
+        filters = ""
 
         q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
                                self.filters.enddate, " i.submitted_on ",
@@ -73,91 +80,77 @@ class TicketsStates(Analyses):
         return q
 
     def get_backlog(self, states, backend_type):
+        """Number of issues in each state at the end of each period
+
+        The issues log is sorted by issue and the state changes of each
+        issue are converted to +1/-1 deltas for its new and old states.
+        The counts of all the states in all the periods are the
+        cumulative sums of the deltas of each state by period.
+        """
         import datetime
         import time
 
-        def update_backlog_count(current_count, backlog_count):
-            for state, count in current_count.items():
-                backlog_count[state].append(count)
-
         # Dict to store the results
         data = {self.filters.period : [self.filters.startdate, self.filters.enddate]}
         data = completePeriodIds(data, self.filters.period,
                                  self.filters.startdate, self.filters.enddate)
 
-        tickets_states = {}
-        current_status = {}
-
-        # Initialize structures
-        for state in states:
-            current_status[state] = 0
-            data[state] = []
-
         # Request issues log
         query = self.__get_sql_issues_states__(backend_type)
         issues_log = self.db.ExecuteQuery(query)
+        checkListArray(issues_log)
 
-        periods = list(data['unixtime'][1:])
-
-        # Add a one period more to avoid problems with
-        # data from this period
+        # Changes are counted in a period until its end: the start of the
+        # next one. The last period gets all the remaining changes.
+        periods = [int(unixtime) for unixtime in data['unixtime'][1:]]
         last_date = int(time.mktime(datetime.datetime.strptime(
                         self.filters.enddate, "'%Y-%m-%d'").timetuple()))
         periods.append(last_date)
 
-        end_period = int(periods.pop(0))
-
-        for i in range(len(issues_log['issue_id'])):
-            issue_id = issues_log['issue_id'][i]
-            issue_state = issues_log['status'][i]
-            issue_date = int(issues_log['udate'][i])
-
-            # Fill periods without changes on issues states
-            while issue_date >= end_period:
-                end_period = int(periods.pop(0))
-                update_backlog_count(current_status, data)
-
-            if issue_id not in tickets_states:
-                # Add ticket to the status dict
-                tickets_states[issue_id] = issue_state
-            elif tickets_states[issue_id] != issue_state:
-                # Decrease the count of tickets with the old state
-                # only for predefined states
-                old_state = tickets_states[issue_id]
-                if old_state in states:
-                    current_status[old_state] -= 1
-
-                # Set new status
-                tickets_states[issue_id] = issue_state
-            else:
-                continue # Ignore equal states
-
-            # Increase the count of tickets with issue_state
-            # only for predefined states
-            if issue_state in states:
-                current_status[issue_state] += 1
+        state_pos = dict((state, pos) for (pos, state) in enumerate(states))
+        # Not predefined states are not counted, all of them are the same one
+        other_state = len(states)
+
+        log_size = len(issues_log.get('issue_id', []))
+        issues = np.array(issues_log.get('issue_id', []))
+        dates = np.array([int(date) for date in issues_log.get('udate', [])], dtype=np.int64)
+        codes = np.array([state_pos.get(state, other_state)
+                          for state in issues_log.get('status', [])], dtype=np.int64)
+
+        # Changes of each issue, in the order of the log
+        order = np.lexsort((np.arange(log_size), issues))
+        issues, dates, codes = issues[order], dates[order], codes[order]
+
+        first = np.ones(log_size, dtype=bool)
+        first[1:] = issues[1:] != issues[:-1]
+        old_codes = np.empty(log_size, dtype=np.int64)
+        old_codes[1:] = codes[:-1]
+        old_codes[first] = other_state
+        # Equal states are ignored
+        changed = first | (codes != old_codes)
+
+        date_periods = np.searchsorted(np.array(periods[:-1], dtype=np.int64),
+                                       dates, side='right')
+        deltas = np.zeros((len(states) + 1, len(periods)), dtype=np.int64)
+        np.add.at(deltas, (codes[changed], date_periods[changed]), 1)
+        np.add.at(deltas, (old_codes[changed], date_periods[changed]), -1)
+        # Increase the count of the new states and decrease the count of
+        # the old ones, only for predefined states
+        counts = np.cumsum(deltas[:len(states)], axis=1)
 
-        # End of the loop. Add the last period values to the backlog count
-        update_backlog_count(current_status, data)
-
-        # Fill remaining periods without changes on issues states
-        while periods:
-            periods.pop(0)
-            for state in states:
-                data[state].append(data[state][-1])
+        for state in states:
+            data[state] = counts[state_pos[state]].tolist()
 
         return data
 
 
     def get_current_states(self, states):
-        current_states = {}
+        if len(states) == 0: return {}
 
-        for state in states:
-            query = self.__get_sql_current__(state, True)
-            data = self.db.ExecuteQuery(query)
-            data = completePeriodIds(data, self.filters.period,
-                                     self.filters.startdate, self.filters.enddate)
-            current_states = dict(current_states.items() + data.items())
+        query = self.__get_sql_current__(states, True)
+        data = self.db.ExecuteQuery(query)
+        current_states = completePeriodIds(data, self.filters.period,
+                                           self.filters.startdate, self.filters.enddate)
 
         return current_states
 
@@ -25,25 +25,179 @@
 import vizgrimoire.GrimoireUtils
 import vizgrimoire.GrimoireSQL
 from vizgrimoire.GrimoireSQL import ExecuteQuery
+from sets import Set
+
+def quote_message_id(message_id):
+    # message ids are used as SQL strings
+    return "'" + message_id.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+class ThreadsIndex(object):
+    """Index of the reply trees of a set of messages
+
+    It is built from the message_ID, is_response_of and optionally the
+    first_date and sender columns of the messages, as returned by
+    ExecuteQuery, and provides the parent, the replies, the root and the
+    depth of each message and the messages of each thread. All of them
+    are computed in linear time in the number of messages.
+    """
+
+    def __init__(self, messages):
+        self.messages = [] # message ids in the order they were added
+        self.order = {} # position of each message in self.messages
+        self.parent = {} # is_response_of of each message
+        self.children = {} # replies to each message, in order
+        self.date = {} # first_date of each message
+        self.senders = {} # Set of people sending each message
+        self._roots = {} # (root, depth) of the messages already walked
+        self.add_messages(messages)
+
+    def add_messages(self, messages):
+        """ Add the messages not in the index, returning their ids """
+        to_list = lambda x: [x] if type(x) not in (list, dict) else x
+        message_ids = to_list(messages.get("message_ID", []))
+        responses_of = to_list(messages.get("is_response_of", []))
+        dates = senders = None
+        if "first_date" in messages: dates = to_list(messages["first_date"])
+        if "sender" in messages: senders = to_list(messages["sender"])
+
+        new_messages = []
+        for i in range(0, len(message_ids)):
+            message_id = message_ids[i]
+            if message_id not in self.parent:
+                new_messages.append(message_id)
+                self.order[message_id] = len(self.messages)
+                self.messages.append(message_id)
+                self.parent[message_id] = responses_of[i]
+                if responses_of[i] is not None:
+                    self.children.setdefault(responses_of[i], []).append(message_id)
+                if dates is not None: self.date[message_id] = dates[i]
+            if senders is not None and senders[i] is not None:
+                self.senders.setdefault(message_id, Set([])).add(senders[i])
+        # new messages could be the ancestors of the ones already walked
+        if len(new_messages) > 0: self._roots = {}
+        return new_messages
+
+    @staticmethod
+    def get_sql(startdate, enddate, senders = False):
+        """ SQL for the messages sent between two dates """
+        if not senders:
+            return """
+                select distinct message_ID, is_response_of, first_date
+                from messages
+                where first_date >= %s and first_date < %s
+                """ % (startdate, enddate)
+        return """
+                select m.message_ID, m.is_response_of, m.first_date,
+                       pup.uuid as sender
+                from messages m
+                left join messages_people mp
+                  on m.message_ID = mp.message_id and mp.type_of_recipient = 'From'
+                left join people_uidentities pup
+                  on mp.email_address = pup.people_id
+                where m.first_date >= %s and m.first_date < %s
+                """ % (startdate, enddate)
+
+    def add_ancestors(self, execute_query, chunk_size = 1000):
+        """Add the ancestors of the messages that are not in the index
+
+        Parents are loaded level by level, with one IN list query per
+        chunk of message ids.
+        """
+        requested = Set([])
+        new_messages = self.messages
+        while len(new_messages) > 0:
+            missing = []
+            for message_id in new_messages:
+                parent = self.parent[message_id]
+                if parent is None or parent in self.parent or parent in requested:
+                    continue
+                requested.add(parent)
+                missing.append(parent)
+            new_messages = []
+            for i in range(0, len(missing), chunk_size):
+                ids = ",".join([quote_message_id(message_id)
+                                for message_id in missing[i:i+chunk_size]])
+                query = """
+                        select distinct message_ID, is_response_of
+                        from messages
+                        where message_ID IN (%s)
+                        """ % (ids)
+                new_messages += self.add_messages(execute_query(query))
+
+    def _walk(self, message_id):
+        # Returns (root, depth) of a message, remembering the ones of all
+        # the messages in the path to the root
+        path = []
+        in_path = Set([])
+        current = message_id
+        while current not in self._roots:
+            path.append(current)
+            in_path.add(current)
+            parent = self.parent.get(current)
+            if parent is None or parent not in self.parent or parent in in_path:
+                # the oldest ancestor in the index (or a loop of replies)
+                self._roots[current] = (current, 0)
+                path.pop()
+                break
+            current = parent
+        (root, depth) = self._roots[current]
+        for message in reversed(path):
+            depth += 1
+            self._roots[message] = (root, depth)
+        return self._roots[message_id]
+
+    def root(self, message_id):
+        """ Root of the thread of a message: its oldest ancestor in the index """
+        return self._walk(message_id)[0]
+
+    def depth(self, message_id):
+        """ Number of replies between a message and its root """
+        return self._walk(message_id)[1]
+
+    def thread(self, message_id):
+        """ Messages of a thread, the root first and then its replies depth first """
+        messages = []
+        visited = Set([])
+        pending = [message_id]
+        while len(pending) > 0:
+            message = pending.pop()
+            if message in visited: continue
+            visited.add(message)
+            messages.append(message)
+            pending.extend(reversed(self.children.get(message, [])))
+        return messages
+
+    def threads(self):
+        """ Dictionary with the messages of each thread, keys are root messages """
+        threads = {}
+        for message_id in self.messages:
+            if self.parent[message_id] is None:
+                threads[message_id] = self.thread(message_id)
+        return threads
+
+    def thread_size(self, message_id):
+        """ Number of messages in the thread of a message """
+        return len(self.thread(self.root(message_id)))
+
 
 class Email(object):
     """This class contains the main attributes of an email
     """
 
-    def __init__(self, message_id, i_db):
+    def __init__(self, message_id, i_db, results = None):
         self.message_id = message_id
         self.i_db = i_db # Identities database
         self.subject = None # Email subject
         self.body = None # Email body
         self.date = None # Email sending date
         self.url = None # Domain of the archive
-        self._buildEmail() # Constructor
-
-    def _buildEmail(self):
-        # This method retrieves items of information of a given
-        # email, specified by its email id.
+        if results is None:
+            results = self._buildEmail() # Constructor
+        self._setEmail(results)
 
-        query = """
+    @staticmethod
+    def _get_sql(i_db, message_ids):
+        return """
                 select distinct m.message_ID,
                        m.subject,
                        m.message_body,
@@ -56,20 +210,27 @@ class Email(object):
                      people_uidentities pup,
                      %s.uidentities u,
                      %s.profiles pro
-                where m.message_ID = '%s' and
+                where m.message_ID IN (%s) and
                       m.message_ID = mp.message_id and
                       mp.type_of_recipient = 'From' and
                       mp.email_address = pup.people_id and
                       pup.uuid = u.uuid and
                       pup.uuid = pro.uuid
-                limit 1
-                """  % (self.i_db, self.i_db, self.message_id)
+                """  % (i_db, i_db, ",".join([quote_message_id(message_id)
+                                              for message_id in message_ids]))
+
+    def _buildEmail(self):
+        # This method retrieves items of information of a given
+        # email, specified by its email id.
+
+        query = Email._get_sql(self.i_db, [self.message_id]) + " limit 1"
         # WARNING: There may appear in some cases repeated emails.
         # This may be because the same email was sent to different
         # mailing lists. Forcing the query to 1 row, allows to
         # avoid this issue till we understand why this behaviour
-        results = ExecuteQuery(query)
+        return ExecuteQuery(query)
 
+    def _setEmail(self, results):
         self.subject = results["subject"]
         self.body = results["message_body"]
         self.date = results["first_date"]
@@ -77,6 +238,28 @@ class Email(object):
         self.initiator_id = results["initiator_id"]
         self.url = results["url"]
 
+    @staticmethod
+    def getEmails(message_ids, i_db):
+        # Returns the list of Email for the given message ids, retrieved
+        # all of them in the same query.
+        if len(message_ids) == 0: return []
+        results = ExecuteQuery(Email._get_sql(i_db, message_ids))
+        to_list = lambda x: [x] if type(x) not in (list, dict) else x
+        found = {}
+        ids = to_list(results.get("message_ID", []))
+        for i in range(0, len(ids)):
+            # Only the first row, as in _buildEmail
+            if ids[i] in found: continue
+            found[ids[i]] = dict([(key, to_list(results[key])[i]) for key in results])
+
+        emails = []
+        for message_id in message_ids:
+            if message_id in found:
+                emails.append(Email(message_id, i_db, found[message_id]))
+            else:
+                emails.append(Email(message_id, i_db))
+        return emails
+
 
 class Threads(object):
     """This class contains the analysis of the mailing list from the point
@@ -90,6 +273,7 @@ class Threads(object):
         self.i_db = i_db # identities database
         self.list_message_id = [] # list of messages id
         self.list_is_response_of = [] #list of 'father' messages
+        self.index = None # ThreadsIndex of the messages
         self.threads = {} # General structure, keys = root message_id,
                           # values = list of messages in that thread
         self.crowded = None # the thread with most people participating
@@ -98,58 +282,21 @@ class Threads(object):
 
         self._init_threads()
 
-    def _build_threads (self, message_id):
-        # Constructor of threads.
-
-        sons = []
-        messages = []
-        if message_id not in self.list_is_response_of:
-            # this a leaf of the tree!
-            return []
-
-        else:
-            cont = 0
-            for msg in self.list_is_response_of:
-                #Retrieving all of the sons of a given msg
-                if msg == message_id:
-                    sons.append(self.list_message_id[cont])
-                cont = cont + 1
-            for msg in sons:
-                messages.extend([msg])
-                messages.extend(self._build_threads(msg))
-
-
-        return messages
-
     def _init_threads(self):
         # Returns dictionary of message_id threads. Each key contains a list
-        # of emails associated to that thread (not ordered).
-
-        # Retrieving all of the messages.
-        query = """
-                select DISTINCT message_ID, is_response_of
-                from messages
-                where first_date >= %s and first_date < %s
-                """ % (self.initdate, self.enddate)
-        list_messages = ExecuteQuery(query)
-
-        to_list = lambda x: [x] if type(x) not in (list, dict) else x
-        self.list_message_id = to_list(list_messages["message_ID"])
-        self.list_is_response_of = to_list(list_messages["is_response_of"])
+        # of emails associated to that thread (root message first).
 
-        messages = {}
-        for message_id in self.list_message_id:
-            # Looking for messages in the thread
-            index = self.list_message_id.index(message_id)
+        # Retrieving all of the messages and their senders.
+        query = ThreadsIndex.get_sql(self.initdate, self.enddate, True)
+        self.index = ThreadsIndex(ExecuteQuery(query))
 
-            # Only analyzing those whose is_response_of is None,
-            # those are the message 'root' of each thread.
-            if self.list_is_response_of[index] is None:
-                messages[message_id] = self._build_threads(message_id)
-                # Adding the root message to the list in first place
-                messages[message_id].insert(0, message_id)
+        self.list_message_id = self.index.messages
+        self.list_is_response_of = [self.index.parent[message_id]
+                                    for message_id in self.list_message_id]
 
-        self.threads = messages
+        # Only those whose is_response_of is None are
+        # the message 'root' of each thread.
+        self.threads = self.index.threads()
 
     def crowdedThread (self):
         # Returns the most crowded thread.
@@ -176,30 +323,16 @@ class Threads(object):
             # So, not using sets, and manual order of the lists is done
             people = set([])
             for message in thread:
-                query = """
-                        select distinct pup.uuid as upeople_id
-                        from messages m,
-                             messages_people mp,
-                             people_uidentities pup
-                        where m.message_ID = '%s' and
-                              m.message_ID = mp.message_id and
-                              mp.type_of_recipient = 'From' and
-                              mp.email_address = pup.people_id
-                        """ % (message)
-                result = ExecuteQuery(query)
-                upeople_id = result["upeople_id"]
-                people.add(upeople_id)
-            top_threads.append((message, len(people)))
+                people.update(self.index.senders.get(message, []))
+            # the root message is the first of the list
+            top_threads.append((thread[0], len(people)))
 
         sorted_threads = sorted(top_threads, key=lambda thread: thread[1], reverse = True)
+        sorted_threads = sorted_threads[:numTop]
 
-        top_threads_emails = []
-        for top in sorted_threads[:numTop]:
-            # Create a list of emails
-            message_id = top[0]
-            email = Email(message_id, self.i_db)
-            top_threads_emails.append((email, top[1]))
-        return top_threads_emails
+        # Create a list of emails
+        emails = Email.getEmails([top[0] for top in sorted_threads], self.i_db)
+        return zip(emails, [top[1] for top in sorted_threads])
 
     def longestThread (self):
         # Returns the longest thread
@@ -237,10 +370,8 @@ class Threads(object):
             # (the rest of them are not ordered)
             top_root_msgs.append(thread[0])
 
-        for message_id in top_root_msgs:
-            # Create a list of emails
-            email = Email(message_id, self.i_db)
-            top_threads_emails.append(email)
+        # Create a list of emails
+        top_threads_emails = Email.getEmails(top_root_msgs, self.i_db)
 
         return top_threads_emails
 
@@ -24,6 +24,9 @@
 
 """ People and Companies evolution per quarters """
 
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
 from vizgrimoire.analysis.analyses import Analyses
 from vizgrimoire.GrimoireUtils import completePeriodIds, medianAndAvgByPeriod, get_median, get_avg
 from vizgrimoire.metrics.query_builder import DSQuery
@@ -42,40 +45,40 @@ class TimesTickets(Analyses):
                   'avg_' + alias : data['avg']}
         return result
 
-    def GetViewFirstCommentPerIssueQueryITS(self):
-        """Returns those issues without changes, only comments made
-           but others than the reporter."""
+    def GetFirstCommentPerIssueQueryITS(self):
+        """Returns the first comment of each issue made by others
+           than the reporter."""
 
-        q = "CREATE OR REPLACE VIEW first_comment_per_issue AS " +\
-            "SELECT c.issue_id issue_id, MIN(c.submitted_on) date " +\
+        q = "SELECT c.issue_id issue_id, MIN(c.submitted_on) date " +\
             "FROM comments c, issues i " +\
             "WHERE c.submitted_by <> i.submitted_by " +\
             "AND c.issue_id = i.id " +\
             "GROUP BY c.issue_id"
         return q
 
-    # shared with top issues study
-    def GetViewFirstActionPerIssueQueryITS(self):
+    def GetFirstActionPerIssueQueryITS(self):
         """Returns the first action of each issue.
            Actions means changes or comments that were made by others than
            the reporter."""
 
-        q = "CREATE OR REPLACE VIEW first_action_per_issue AS " +\
-            "SELECT issue_id, MIN(date) date " +\
-            "FROM first_change_and_comment_issues " +\
+        q = "SELECT issue_id, MIN(date) date " +\
+            "FROM (" +\
+            "  SELECT c.issue_id issue_id, MIN(c.changed_on) date " +\
+            "  FROM changes c, issues i " +\
+            "  WHERE changed_by <> submitted_by AND i.id = c.issue_id " +\
+            "  GROUP BY c.issue_id " +\
+            "  UNION " +\
+            "  SELECT c.issue_id issue_id, MIN(c.submitted_on) date " +\
+            "  FROM comments c, issues i " +\
+            "  WHERE c.submitted_by <> i.submitted_by AND c.issue_id = i.id " +\
+            "  GROUP BY c.issue_id" +\
+            ") first_change_and_comment " +\
             "GROUP BY issue_id"
         return q
 
-    def CreateViews(self):
-        q = self.GetViewFirstCommentPerIssueQueryITS()
-        self.db.ExecuteViewQuery(q)
-        q = self.GetViewFirstActionPerIssueQueryITS()
-        self.db.ExecuteViewQuery(q)
-
-
     def GetTimeToFirstAction (self, period, startdate, enddate, condition, alias=None) :
         q = """SELECT submitted_on date, TIMESTAMPDIFF(SECOND, submitted_on, fa.date)/(24*3600) AS %(alias)s
-               FROM first_action_per_issue fa, issues i
+               FROM (%(first_action)s) fa, issues i
                WHERE i.id = fa.issue_id
                AND submitted_on >= %(startdate)s AND submitted_on < %(enddate)s """
 
@@ -85,6 +88,7 @@ class TimesTickets(Analyses):
         q += """ ORDER BY date """
 
         params = {'alias' : alias or 'time_to_action',
+                  'first_action' : self.GetFirstActionPerIssueQueryITS(),
                   'startdate' : startdate,
                   'enddate' : enddate}
         query = q % params
@@ -94,7 +98,7 @@ class TimesTickets(Analyses):
 
     def GetTimeToFirstComment (self, period, startdate, enddate, condition, alias=None) :
         q = """SELECT submitted_on date, TIMESTAMPDIFF(SECOND, submitted_on, fc.date)/(24*3600) AS %(alias)s
-               FROM first_comment_per_issue fc, issues i
+               FROM (%(first_comment)s) fc, issues i
                WHERE i.id = fc.issue_id
                AND submitted_on >= %(startdate)s AND submitted_on < %(enddate)s """
 
@@ -104,6 +108,7 @@ class TimesTickets(Analyses):
         q += """ ORDER BY date """
 
         params = {'alias' : alias or 'time_to_comment',
+                  'first_comment' : self.GetFirstCommentPerIssueQueryITS(),
                   'startdate' : startdate,
                   'enddate' : enddate}
         query = q % params
@@ -133,77 +138,51 @@ class TimesTickets(Analyses):
         data = self.db.ExecuteQuery(query)
         return (data)
 
-    def GetIssuesOpenedAtQuery (self, startdate, enddate, closed_condition, ext_condition=None):
-        q = """SELECT issue_id
-               FROM issues_log_bugzilla log,
-                 (SELECT MAX(id) id
-                  FROM issues_log_bugzilla
-                  WHERE date >= %(startdate)s AND date < %(enddate)s
-                  GROUP BY issue_id) g
-               WHERE log.id = g.id  AND NOT """
-        q += closed_condition
-
+    def GetIssuesLogQuery (self, startdate, enddate, closed_condition, ext_condition=None, result_type=None):
+        """Returns the issues log between two dates, with the submission
+           date of each issue and, for 'action' and 'comment' result types,
+           the date of its first action or comment."""
+        selected = "1"
         if ext_condition:
-            q += ext_condition
-
-        q += """ ORDER BY issue_id """
-
-        params = {'startdate' : startdate,
-                  'enddate' : enddate}
-        query = q % params
-        return query
-
-    def GetIssuesWithoutFirstActionAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id AND i.id NOT IN
-                (SELECT issue_id
-                 FROM first_action_per_issue
-                 WHERE date >= %(startdate)s AND date < %(enddate)s)"""
-
-        params = {'alias' : alias or 'time_opened',
-                  'startdate' : startdate,
-                  'enddate' : enddate}
-        query = q % params
-
-        data = self.db.ExecuteQuery(query)
-        return (data)
+            selected += " " + ext_condition
+
+        q = """SELECT log.issue_id issue_id, log.id id, log.date date,
+                      log.closed closed, log.selected selected,
+                      i.submitted_on submitted_on, %(first_date)s first_date
+               FROM (SELECT issue_id, id, date,
+                            (%(closed_condition)s) closed, (%(selected)s) selected
+                     FROM issues_log_bugzilla
+                     WHERE date >= %(startdate)s AND date < %(enddate)s) log
+               JOIN issues i ON i.id = log.issue_id """
+
+        first_date = "NULL"
+        if result_type in ('action', 'comment'):
+            if result_type == 'action':
+                first_query = self.GetFirstActionPerIssueQueryITS()
+            else:
+                first_query = self.GetFirstCommentPerIssueQueryITS()
+            q += """ LEFT JOIN (""" + first_query + """) fr ON fr.issue_id = log.issue_id """
+            first_date = "fr.date"
 
-    def GetIssuesWithoutFirstCommentAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id AND i.id NOT IN
-                (SELECT issue_id
-                 FROM first_comment_per_issue
-                 WHERE date >= %(startdate)s AND date < %(enddate)s)"""
+        q += """ ORDER BY log.date, log.id """
 
-        params = {'alias' : alias or 'time_opened',
+        params = {'first_date' : first_date,
+                  'closed_condition' : closed_condition,
+                  'selected' : selected,
                   'startdate' : startdate,
                   'enddate' : enddate}
         query = q % params
+        return query
 
-        data = self.db.ExecuteQuery(query)
-        return (data)
-
-
-    def GetIssuesOpenedAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id"""
-
-        params = {'alias' : alias or 'time_opened',
-                  'enddate' : enddate}
-        query = q % params
-
-        data = self.db.ExecuteQuery(query)
-        return (data)
-
+    @staticmethod
+    def getTimeOpened(submitted_on, enddate):
+        # Days from submitted_on to enddate, as
+        # TIMESTAMPDIFF(SECOND, submitted_on, enddate)/(24*3600)
+        diff = enddate - submitted_on
+        seconds = diff.days * 24 * 3600 + diff.seconds
+        if seconds < 0 and diff.microseconds > 0: seconds += 1
+        days = Decimal(seconds) / Decimal(24 * 3600)
+        return days.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
 
     def ticketsTimeToResponse(self, period, startdate, enddate, identities_db, backend):
         time_to_response_priority = self.ticketsTimeToResponseByField(period, startdate, enddate,
@@ -316,27 +295,61 @@ class TimesTickets(Analyses):
         current_period = dates[0]  # The first month there aren't remaining issues opened
 
         startdate = self.filters.startdate
-        enddate = self.filters.enddate
-
 
+        # Convert dates to readable format (YY-MM-DD)
+        enddates = []
         for dt in dates[1:]:
-            # Convert dates to readable format (YY-MM-DD)
             year = dt / 12
             month = dt % 12
             if month == 0:
                 year = year - 1
                 month = 12
-            enddate = "'" + str(year) + "-" + str(month) + "-1'"
-
-            if result_type == 'action':
-                open_issues = self.GetIssuesWithoutFirstActionAt(period, startdate, enddate, closed_condition,
-                                                                      field_condition, alias)[alias]
-            elif result_type == 'comment':
-                open_issues = self.GetIssuesWithoutFirstCommentAt(period, startdate, enddate, closed_condition,
-                                                                       field_condition, alias)[alias]
-            else:
-                open_issues = self.GetIssuesOpenedAt(period, startdate, enddate, closed_condition,
-                                                          field_condition, alias)[alias]
+            enddates.append(datetime(year, month, 1))
+        enddate = "'" + enddates[-1].strftime("%Y-%m-%d") + "'"
+        start = datetime.strptime(startdate, "'%Y-%m-%d'")
+
+        # All the log is retrieved once and then swept up to each enddate
+        query = self.GetIssuesLogQuery(startdate, enddate, closed_condition,
+                                       field_condition, result_type)
+        issues_log = self.db.ExecuteQuery(query)
+        for key in issues_log:
+            if not isinstance(issues_log[key], list): issues_log[key] = [issues_log[key]]
+
+        last_log = {} # id of the last log entry of each issue
+        opened = set([]) # issues with a last log entry that is not closed
+        submitted = {}
+        # Issues are not counted after their first action or comment
+        first_dates = []
+        for i in range(len(issues_log.get('issue_id', []))):
+            submitted[issues_log['issue_id'][i]] = issues_log['submitted_on'][i]
+            first_date = issues_log['first_date'][i]
+            if first_date is not None and first_date >= start:
+                first_dates.append((first_date, issues_log['issue_id'][i]))
+        first_dates = sorted(set(first_dates))
+        answered = set([])
+
+        log_pos = 0
+        first_pos = 0
+        for (dt, enddate) in zip(dates[1:], enddates):
+            while log_pos < len(issues_log.get('issue_id', [])) and \
+                  issues_log['date'][log_pos] < enddate:
+                issue_id = issues_log['issue_id'][log_pos]
+                log_id = issues_log['id'][log_pos]
+                if issue_id not in last_log or last_log[issue_id] < log_id:
+                    last_log[issue_id] = log_id
+                    # NULL conditions are false, as in SQL
+                    if issues_log['closed'][log_pos] == 0 and issues_log['selected'][log_pos]:
+                        opened.add(issue_id)
+                    else:
+                        opened.discard(issue_id)
+                log_pos += 1
+            while first_pos < len(first_dates) and first_dates[first_pos][0] < enddate:
+                answered.add(first_dates[first_pos][1])
+                first_pos += 1
+
+            open_issues = [self.getTimeOpened(submitted[issue_id], enddate)
+                           for issue_id in sorted(opened - answered)]
+            if len(open_issues) == 1: open_issues = open_issues[0]
 
             m = get_median(open_issues)
             avg = get_avg(open_issues)
@@ -374,7 +387,6 @@ class TimesTickets(Analyses):
         from vizgrimoire.ITS import ITS
         backend = ITS._get_backend()
 
-        self.CreateViews()
         time_to_response = self.ticketsTimeToResponse(period, startdate, enddate, idb, backend)
         time_from_opened = self.ticketsTimeOpened(period, startdate, enddate, idb, backend)
         return dict(time_to_response.items() + time_from_opened.items())
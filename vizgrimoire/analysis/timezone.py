@@ -114,8 +114,7 @@ class Timezone(Analyses):
             return
 
         # Prepare the SQLAlchemy database url
-        url = 'mysql://' + self.db.user + ':' + \
-            self.db.password + '@' + self.db.host + '/'
+        url = self.db.get_sqlalchemy_url()
         schema = self.db.database
         schema_id = self.db.identities_db
 
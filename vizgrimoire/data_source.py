@@ -310,6 +310,28 @@ class DataSource(object):
                 metrics = item
         return metrics
 
+    @staticmethod
+    def get_metrics_sorted(metrics, ds):
+        """ Metrics in topological order of their depends_on metrics
+
+        The metrics needed by the ones in metrics are included, so their
+        results can be computed only once and shared.
+        """
+        sorted_metrics = []
+        visiting = []
+        def visit(item):
+            if item in sorted_metrics: return
+            if item in visiting:
+                raise Exception("Circular dependency in metric " + item.id)
+            visiting.append(item)
+            for dep_id in item.depends_on:
+                dep = DataSource.get_metrics(dep_id, ds)
+                if dep is not None: visit(dep)
+            visiting.pop()
+            sorted_metrics.append(item)
+        for item in metrics: visit(item)
+        return sorted_metrics
+
     @staticmethod
     def get_studies_data(ds, period, startdate, enddate, evol):
         """ Get data from studies to be included in agg and evol global JSONs  """
@@ -404,15 +426,44 @@ class DataSource(object):
             for r in metrics_reports:
                 if r in reports_on: metrics_on += [r]
 
-        for item in all_metrics:
+        metrics_items = [item for item in all_metrics if item.id in metrics_on]
+        # Metrics needed by others computed before them, and only once
+        metrics_items = DataSource.get_metrics_sorted(metrics_items, DS)
+
+        # Metrics sharing the same query shape computed in one query
+        fused_data = {}
+        if DS.get_metrics_fused_on():
+            fused_data = DS.get_metrics_fused_data(metrics_items, mfilter, evol)
+
+        # Results shared with dependent metrics: id -> (filters, data)
+        computed = {}
+
+        for item in metrics_items:
             # print item
-            if item.id not in metrics_on: continue
             mfilter_orig = item.filters
             mfilter.global_filter = mfilter_orig.global_filter
             mfilter.set_closed_condition(mfilter_orig.closed_condition)
             item.filters = mfilter
-            if evol: mvalue = item.get_ts()
-            else:    mvalue = item.get_agg()
+            conditions = (mfilter.global_filter, mfilter.closed_condition)
+            item.dependencies = dict([(dep_id, computed[dep_id][1])
+                                      for dep_id in item.depends_on
+                                      if dep_id in computed and
+                                         computed[dep_id][0] == conditions])
+            try:
+                if item.id in fused_data: mvalue = fused_data[item.id]
+                elif evol: mvalue = item.get_ts()
+                else:    mvalue = item.get_agg()
+            finally:
+                del item.dependencies
+
+            # GROUP BY data is modified when filled, and not shared
+            if not (type_analysis and type_analysis[1] is None):
+                computed[item.id] = (conditions, mvalue)
+
+            if item.id not in metrics_on:
+                # Only needed by other metrics
+                item.filters = mfilter_orig
+                continue
 
             if type_analysis and type_analysis[1] is None and mvalue:
                 logging.info(item.id)
@@ -452,22 +503,51 @@ class DataSource(object):
             if automator_metrics in automator['r']:
                 metrics_trends = automator['r'][automator_metrics].split(",")
 
-            for i in [7,30,365]:
-                for item in all_metrics:
-                    if item.id not in metrics_trends: continue
-                    mfilter_orig = item.filters
-                    item.filters = mfilter
-                    period_data = item.get_trends(enddate, i)
-                    item.filters = mfilter_orig
-
-                    if type_analysis and type_analysis[1] is None:
-                        group_field = dsquery.get_group_field_alias(type_analysis[0])
+            for item in all_metrics:
+                if item.id not in metrics_trends: continue
+                mfilter_orig = item.filters
+                item.filters = mfilter
+                if type_analysis and type_analysis[1] is None:
+                    group_field = dsquery.get_group_field_alias(type_analysis[0])
+                    for i in [7,30,365]:
+                        period_data = item.get_trends(enddate, i)
                         period_data = fill_and_order_items(items, period_data, group_field)
-
+                        data = dict(data.items() + period_data.items())
+                else:
+                    # All windows in one query if possible
+                    period_data = item.get_trends_windows(enddate, [7,30,365])
                     data = dict(data.items() + period_data.items())
+                item.filters = mfilter_orig
 
         return data
 
+    @classmethod
+    def get_metrics_fused_on(DS):
+        """ Fused metrics queries: Only used if activated in automator conf. """
+        from vizgrimoire.report import Report
+        automator_fused = DS.get_name()+"_metrics_fused"
+        if automator_fused not in Report.get_config()['r']: return False
+        return Report.get_config()['r'][automator_fused].lower() == "true"
+
+    @staticmethod
+    def get_metrics_fused_data(metrics, mfilter, evol):
+        """ Get the data for all metrics that can be computed in fused queries """
+        from vizgrimoire.metrics.metrics import Metrics
+
+        metrics_filters_orig = [item.filters for item in metrics]
+        for item in metrics:
+            item_filter = mfilter.copy()
+            item_filter.global_filter = item.filters.global_filter
+            item_filter.set_closed_condition(item.filters.closed_condition)
+            item.filters = item_filter
+        try:
+            data = Metrics.get_fused_data(metrics, evol)
+        finally:
+            for i in range(0, len(metrics)):
+                metrics[i].filters = metrics_filters_orig[i]
+        logging.info("Fused metrics: " + ",".join(data.keys()))
+        return data
+
     @staticmethod
     def get_metrics_core_agg():
         """ Aggregation metrics core """
@@ -506,7 +586,10 @@ class DataSource(object):
         from vizgrimoire.SCR import SCR
         from vizgrimoire.MLS import MLS
         from vizgrimoire.filter import Filter
+        from vizgrimoire.GrimoireUtils import convertCombinedFiltersName
 
+        # Combined filters items in "filter" field
+        convertCombinedFiltersName(data)
         if cls == ITS or cls == SCR:
             if 'url' in data.keys():
                 data['name'] = data.pop('url')
@@ -27,6 +27,8 @@
 import numpy as np
 from scipy import stats
 
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
+
 
 class DataHandler(object):
     """Root class for the hierarchy of data handler
@@ -64,6 +66,10 @@ class DHESA(DataHandler):
     Analysis performed: min value, max value, mean value, median value, std value,
                         mode value, first quartile, third quartile, 
 
+    The dataset can also be a QuantileSketch, built incrementally from the
+    rows of a query and merged with others. Then the median and quartiles
+    are estimated and the mode is only available if it was tracked.
+
     """
     
     def __init__(self, dataset, filters = None):
@@ -72,7 +78,7 @@ class DHESA(DataHandler):
         Parameters
         ----------
 
-        dataset: list of elements
+        dataset: list of elements or QuantileSketch
         filters: MetricFilters object
 
         """
@@ -80,6 +86,9 @@ class DHESA(DataHandler):
         self.filters = filters
         self.data = {}
 
+        if isinstance(dataset, QuantileSketch):
+            self._init_sketch(dataset)
+            return
         if not isinstance(dataset, list):
             raise Exception("__init__ dataset should be a list")
         if len(dataset) == 0:
@@ -99,6 +108,25 @@ class DHESA(DataHandler):
             self.data["percentile25"] = np.percentile(dataset, 25)
             self.data["percentile75"] = np.percentile(dataset, 75)
 
+    def _init_sketch(self, sketch):
+        if sketch.count == 0:
+            for key in ["median", "mean", "mode", "min", "max",
+                        "percentile25", "percentile75"]:
+                self.data[key] = 0
+            return
+
+        self.data["median"] = sketch.median()
+        self.data["mean"] = sketch.mean()
+        self.data["mode"] = None
+        mode = sketch.mode()
+        if mode is not None:
+            # same (mode, count) arrays as stats.mode
+            self.data["mode"] = (np.array([mode[0]]), np.array([mode[1]]))
+        self.data["min"] = sketch.min
+        self.data["max"] = sketch.max
+        self.data["percentile25"] = sketch.percentile(25)
+        self.data["percentile75"] = sketch.percentile(75)
+
 
 if __name__ == '__main__':
     data = DHESA([1,2,3,4])
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" Completion of time series with all the periods between two dates """
+
+import calendar
+import locale
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+
+def set_dates_locale():
+    """ Use english names for months in dates. Done only once per process """
+    if set_dates_locale.done: return
+    locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
+    set_dates_locale.done = True
+set_dates_locale.done = False
+
+def clean_nan(value):
+    """ NaN values are converted to 0 """
+    if isinstance(value, float) and math.isnan(value): return 0
+    return value
+
+
+class PeriodIndex(object):
+    """All the periods (weeks, months or years) between two dates
+
+    The period ids (the values returned by the SQL queries for the period
+    column) and the unixtime and date labels are computed once per
+    (period, startdate, enddate), and shared by all the time series
+    completed for them.
+    """
+
+    periods = ['week', 'month', 'year']
+    cache = {}
+
+    def __init__(self, period, start, end):
+        self.period = period
+        self.ids = []
+        self.unixtime = []
+        self.date = []
+
+        if period == "week":
+            # Start of the week
+            current = start - relativedelta(days=start.isocalendar()[2]-1)
+            while (current <= end):
+                self._add(int(PeriodIndex.date2week(current)), current)
+                current = current + relativedelta(weeks=1)
+        elif period == "month":
+            set_dates_locale()
+            start_month = start.year*12 + start.month
+            months = end.year*12 + end.month - start_month
+            # All data is from the complete month
+            start = start - timedelta(days=(start.day-1))
+            for i in range(0, months+1):
+                self._add(start_month+i, start + relativedelta(months=i))
+        elif period == "year":
+            start_year = start.year * 12
+            for i in range(0, end.year - start.year + 1):
+                self._add(start_year+(i*12), start + relativedelta(years=i))
+
+        self.position = dict((id, pos) for (pos, id) in enumerate(self.ids))
+
+    def _add(self, id, current):
+        self.ids.append(id)
+        timestamp = calendar.timegm(current.timetuple())
+        self.unixtime.append(unicode(timestamp))
+        self.date.append(datetime.strftime(current, "%b %Y"))
+
+    @staticmethod
+    def date2week(date):
+        # isocalendar: year weeknumber weekday
+        week   = str(date.isocalendar()[0])
+        week  += "%02d" % date.isocalendar()[1]
+        return week
+
+    @staticmethod
+    def get(period, startdate, enddate):
+        """ Return the index for the period, None if the period is not supported """
+        if period not in PeriodIndex.periods: return None
+        key = (period, startdate, enddate)
+        if key not in PeriodIndex.cache:
+            start = datetime.strptime(startdate.replace("'", ""), "%Y-%m-%d")
+            end = datetime.strptime(enddate.replace("'", ""), "%Y-%m-%d")
+            # In order to use the same approach in the whole GrimoireLib, the last day
+            # specified when retrieving datasets is always ignored. What means that
+            # GrimoireLib is using date >= startdate and date < enddate.
+            # For this reason, a day is substracted from the end date
+            end = end - timedelta(days=1)
+            PeriodIndex.cache[key] = PeriodIndex(period, start, end)
+        return PeriodIndex.cache[key]
+
+    def _get_positions(self, periods):
+        """ Return (row, position) for the rows with a period in the index
+
+        Rows are returned in reverse order so when scattering them the
+        first row for a period is the one kept.
+        """
+        positions = []
+        for row in range(len(periods)-1, -1, -1):
+            pos = self.position.get(periods[row])
+            if pos is not None: positions.append((row, pos))
+        return positions
+
+    def complete(self, ts_data):
+        """ Return a time series with all the periods, 0 for the missing ones """
+        for key in ts_data:
+            if not isinstance(ts_data[key], list): ts_data[key] = [ts_data[key]]
+
+        positions = self._get_positions(ts_data[self.period])
+
+        new_ts_data = {}
+        new_ts_data['unixtime'] = list(self.unixtime)
+        new_ts_data['date'] = list(self.date)
+        new_ts_data['id'] = range(len(self.ids))
+        for key in ts_data:
+            if key == self.period: column = list(self.ids)
+            else: column = [0] * len(self.ids)
+            values = ts_data[key]
+            for (row, pos) in positions:
+                column[pos] = clean_nan(values[row])
+            new_ts_data[key] = column
+        return new_ts_data
+
+    def complete_items(self, data, id_field):
+        """Return a time series per item for data grouped by item and period
+
+        data contains one row per (item, period) with the item in id_field.
+        For each metric a list with the completed time series of each
+        item is returned, filled in just one scatter of all the rows.
+        """
+        for key in data:
+            if not isinstance(data[key], list): data[key] = [data[key]]
+        if id_field not in data:
+            raise Exception(id_field + " not in " + str(data))
+
+        items = list(set(data[id_field]))
+        metrics = [key for key in data if key not in [id_field, self.period]]
+
+        ts = {}
+        ts[id_field] = items
+        for metric in metrics: ts[metric] = []
+        if len(items) == 0 or len(metrics) == 0: return ts
+
+        item_pos = dict((item, pos) for (pos, item) in enumerate(items))
+        rows, items_pos, periods_pos = [], [], []
+        for (row, pos) in self._get_positions(data[self.period]):
+            rows.append(row)
+            items_pos.append(item_pos[data[id_field][row]])
+            periods_pos.append(pos)
+
+        for metric in metrics:
+            values = np.empty(len(rows), dtype=object)
+            values[:] = [clean_nan(data[metric][row]) for row in rows]
+            metric_ts = np.zeros((len(items), len(self.ids)), dtype=object)
+            metric_ts[items_pos, periods_pos] = values
+            ts[metric] = metric_ts.tolist()
+
+        ts[self.period] = list(self.ids)
+        ts['unixtime'] = list(self.unixtime)
+        ts['date'] = list(self.date)
+        ts['id'] = range(len(self.ids))
+        return ts
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+#
+# Authors:
+#   Daniel Izquierdo <dizquierdo@bitergia.com>
+#
+
+""" Mergeable quantile sketch for the statistics of big datasets """
+
+import math
+from bisect import bisect_right
+
+
+class QuantileSketch(object):
+    """Merging t-digest of a stream of values
+
+    Values are added one by one, or with other sketches, and the sketch
+    keeps a bounded number of centroids (mean, weight) from which the
+    quantiles are estimated. Count, sum, min and max are exact. Up to
+    exact_size values all of them are kept, and the quantiles are the
+    same ones numpy.percentile returns.
+
+    The mode can not be estimated from the centroids: with track_mode
+    the exact count of each value is kept, using memory for each
+    different value.
+
+    >>> sketch = QuantileSketch()
+    >>> sketch.update([1, 2, 3, 4])
+    >>> sketch.median(), sketch.percentile(25), sketch.mean()
+    (2.5, 1.75, 2.5)
+    """
+
+    def __init__(self, compression = 200, track_mode = False):
+        self.compression = compression
+        self.exact_size = 5 * compression
+        self.means = [] # centroids sorted by mean
+        self.weights = []
+        self.buffer = [] # (value, weight) not merged in the centroids yet
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.values_count = None
+        if track_mode: self.values_count = {}
+
+    def add(self, value, weight = 1):
+        value = float(value)
+        self.buffer.append((value, weight))
+        self.count += weight
+        self.sum += value * weight
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+        if self.values_count is not None:
+            self.values_count[value] = self.values_count.get(value, 0) + weight
+        if len(self.buffer) >= self.exact_size: self._compress()
+
+    def update(self, values):
+        for value in values: self.add(value)
+
+    def merge(self, sketch):
+        """ Add all the values of other sketch to this one """
+        if sketch.count == 0: return self
+        self.buffer.extend(zip(sketch.means, sketch.weights))
+        self.buffer.extend(sketch.buffer)
+        self.count += sketch.count
+        self.sum += sketch.sum
+        if self.min is None or sketch.min < self.min: self.min = sketch.min
+        if self.max is None or sketch.max > self.max: self.max = sketch.max
+        if self.values_count is not None:
+            if sketch.values_count is None:
+                # The mode can not be known anymore
+                self.values_count = None
+            else:
+                for (value, count) in sketch.values_count.items():
+                    self.values_count[value] = self.values_count.get(value, 0) + count
+        if len(self.buffer) >= self.exact_size: self._compress()
+        return self
+
+    @staticmethod
+    def merge_all(sketches, compression = 200, track_mode = False):
+        """ Return a new sketch with the values of all sketches """
+        merged = QuantileSketch(compression, track_mode)
+        for sketch in sketches: merged.merge(sketch)
+        return merged
+
+    def _k(self, q):
+        # k1 scale function: small centroids near the tails
+        q = min(max(q, 0.0), 1.0)
+        return self.compression * math.asin(2 * q - 1) / (2 * math.pi)
+
+    def _compress(self):
+        if len(self.buffer) == 0: return
+        points = sorted(zip(self.means, self.weights) + self.buffer)
+        self.buffer = []
+
+        if self.count <= self.exact_size:
+            self.means = [point[0] for point in points]
+            self.weights = [point[1] for point in points]
+            return
+
+        total = float(self.count)
+        means, weights = [], []
+        weight_before = 0.0
+        (mean, weight) = points[0]
+        k_limit = self._k(0) + 1
+        for (point_mean, point_weight) in points[1:]:
+            if self._k((weight_before + weight + point_weight) / total) <= k_limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                weight_before += weight
+                k_limit = self._k(weight_before / total) + 1
+                (mean, weight) = (point_mean, point_weight)
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q):
+        """ Value with a fraction q (0 to 1) of the values below it """
+        if self.count == 0: return float('nan')
+        self._compress()
+
+        # Rank of the center of each centroid, with the min and max in
+        # the first and last ranks, interpolated as numpy.percentile does
+        ranks = [0.0]
+        values = [self.min]
+        weight_before = 0.0
+        for (mean, weight) in zip(self.means, self.weights):
+            ranks.append(weight_before + (weight - 1) / 2.0)
+            values.append(mean)
+            weight_before += weight
+        ranks.append(self.count - 1.0)
+        values.append(self.max)
+
+        rank = q * (self.count - 1)
+        pos = bisect_right(ranks, rank)
+        if pos >= len(ranks): return self.max
+        if pos == 0: return self.min
+        (rank_before, rank_after) = (ranks[pos-1], ranks[pos])
+        (value_before, value_after) = (values[pos-1], values[pos])
+        if rank_after == rank_before: return value_before
+        return value_before + (value_after - value_before) * \
+               (rank - rank_before) / (rank_after - rank_before)
+
+    def percentile(self, p):
+        return self.quantile(p / 100.0)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def mean(self):
+        if self.count == 0: return float('nan')
+        return self.sum / self.count
+
+    def mode(self):
+        """ (value, count) of the most frequent value, None if not tracked """
+        if self.values_count is None or self.count == 0: return None
+        # the smallest value among the most frequent ones, as scipy does
+        return min(self.values_count.items(), key = lambda item: (-item[1], item[0]))
@@ -29,6 +29,7 @@ import MySQLdb
 from sets import Set
 
 from vizgrimoire.GrimoireUtils import checkListArray
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
 from vizgrimoire.metrics.metrics import Metrics, to_list
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.metrics.query_builder import ITSQuery
@@ -272,7 +273,7 @@ class TimeToClose(Metrics):
 
     """
 
-    def get_agg(self):
+    def _get_timeto_sql(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -298,7 +299,15 @@ class TimeToClose(Metrics):
         query = query + " from " + self.db._get_tables_query(tables)
         query = query + " where " + self.db._get_filters_query(filters)
 
-        return self.db.ExecuteQuery(query)
+        return query
+
+    def get_agg(self):
+        return self.db.ExecuteQuery(self._get_timeto_sql())
+
+    def get_sketch(self):
+        """ QuantileSketch of the times to close, without fetching all of them """
+        sketches = self.db.ExecuteQuerySketches(self._get_timeto_sql(), "timeto")
+        return sketches.get((), QuantileSketch())
 
 
 #closers
@@ -402,20 +411,18 @@ class BMIIndex(Metrics):
     name = "Backlog Management Index"
     desc = "Number of tickets closed out of the opened ones in a given period"
     data_source = ITS
+    depends_on = ["closed", "opened"]
 
     def get_agg(self):
         data = {}
 
-        closed_tickets = Closed(self.db, self.filters)
-        opened_tickets = Opened(self.db, self.filters)
-
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # GROUP BY not supported
             logging.info("agg BMI metric does NOT support GROUP BY queries")
             return data
 
-        closed = closed_tickets.get_agg()
-        opened = opened_tickets.get_agg()
+        closed = self._get_dependency(Closed, False)
+        opened = self._get_dependency(Opened, False)
 
         if int(opened["opened"]) <= 0:
             # a value is needed when there's a division by 0
@@ -428,11 +435,8 @@ class BMIIndex(Metrics):
     def get_ts(self):
         data = {}
 
-        closed_tickets = Closed(self.db, self.filters)
-        opened_tickets = Opened(self.db, self.filters)
-
-        closed = closed_tickets.get_ts()
-        opened = opened_tickets.get_ts()
+        closed = self._get_dependency(Closed, True)
+        opened = self._get_dependency(Opened, True)
 
         if len(opened["opened"]) == 0:
             return data
@@ -442,16 +446,14 @@ class BMIIndex(Metrics):
             logging.info("evol BMI metric does NOT support GROUP BY queries")
             return data
 
-
+        # Both time series have the same complete periods
         evol_bmi = []
-        for i in closed["closed"]:
-
-            index = closed["closed"].index(i)
-            if opened["opened"][index] == 0:
+        for (closed_value, opened_value) in zip(closed["closed"], opened["opened"]):
+            if opened_value == 0:
                 #div by 0
-                evol_bmi.append(i * 100) # some "neutral" value, although this should be infinite
+                evol_bmi.append(closed_value * 100) # some "neutral" value, although this should be infinite
             else:
-                evol_bmi.append((float(i) / float(opened['opened'][index])) * 100.0)
+                evol_bmi.append((float(closed_value) / float(opened_value)) * 100.0)
 
         data["bmitickets"] = evol_bmi
 
@@ -181,45 +181,28 @@ class StoriesPending(Metrics):
     name = "Pending stories"
     desc = "Number of pending stories"
     data_source = ITS
-
-    def _get_metrics_for_pending(self):
-
-        # We need to fix the same filter for all metrics
-        metrics_for_pendig = {}
-
-        metric = StoriesOpened(self.db, self.filters)
-        metric.filters = self.filters
-        metrics_for_pendig['stories_opened'] = metric
-
-        metric = StoriesClosed(self.db, self.filters)
-        metric.filters = self.filters
-        metrics_for_pendig['stories_closed'] = metric
-
-        return metrics_for_pendig
+    depends_on = ["stories_opened", "stories_closed"]
 
     def get_agg(self):
-        metrics = self._get_metrics_for_pending()
-        opened = metrics['stories_opened'].get_agg()
-        closed = metrics['stories_closed'].get_agg()
-
         # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_agg_all()
         else:
+            opened = self._get_dependency(StoriesOpened, False)
+            closed = self._get_dependency(StoriesClosed, False)
             pending = opened['stories_opened']-closed['stories_closed']
             pending = {"stories_pending":pending}
         return pending
 
     def get_ts(self):
-        metrics = self._get_metrics_for_pending()
-        opened = metrics["stories_opened"].get_ts()
-        closed = metrics["stories_closed"].get_ts()
-        evol = dict(opened.items() + closed.items())
         pending = {"stories_pending":[]}
             # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_ts_all()
         else:
+            opened = self._get_dependency(StoriesOpened, True)
+            closed = self._get_dependency(StoriesClosed, True)
+            evol = dict(opened.items() + closed.items())
             for i in range(0, len(evol['stories_opened'])):
                 pending_val = evol["stories_opened"][i] - evol["stories_closed"][i]
                 pending["stories_pending"].append(pending_val)
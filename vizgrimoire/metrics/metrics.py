@@ -23,11 +23,15 @@
 ##   Alvaro del Castillo <acs@bitergia.com>
 
 
+import copy
 import logging
+import re
 
 from functools import wraps
+from sets import Set
 
 from vizgrimoire.GrimoireUtils import completePeriodIds, GetDates, GetPercentageDiff, check_array_values
+from vizgrimoire.datahandlers.period_index import PeriodIndex
 from vizgrimoire.metrics.query_builder import DSQuery
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 
@@ -67,6 +71,10 @@ class Metrics(object):
     domains_limit = 30
     max_decimals = 2
     min_item_per_tag = 20
+    # ids of the metrics whose results are used to compute this one
+    depends_on = []
+    # results of depends_on metrics, by id, set by DataSource.get_metrics_data
+    dependencies = {}
 
     def __init__(self, dbcon = None, filters = None):
         """db connection and filter to be used"""
@@ -94,6 +102,19 @@ class Metrics(object):
         """ Returns the family of the instance """
         return Metrics.data_source
 
+    def _get_dependency(self, metric_class, evolutionary):
+        """ Returns the data of a metric in depends_on with the same filters
+
+        The data already computed by DataSource.get_metrics_data is used if
+        available. It must not be modified, as other metrics can use it.
+        """
+        data = self.dependencies.get(metric_class.id)
+        if data is None:
+            metric = metric_class(self.db, self.filters)
+            if evolutionary: data = metric.get_ts()
+            else: data = metric.get_agg()
+        return data
+
     def _get_sql(self, evolutionary):
         """Private method that returns a valid SQL query
 
@@ -114,6 +135,24 @@ class Metrics(object):
 
         """
 
+        date_field, fields, tables, filters = self._get_sql_parts()
+        return self.db.BuildQuery(self.filters.period, self.filters.startdate,
+                                  self.filters.enddate, date_field, fields,
+                                  tables, filters, evolutionary,
+                                  self.filters.type_analysis)
+
+    def _get_sql_parts(self):
+        """Private method that returns the parts of the SQL query
+
+        Metrics built on a plain SELECT over a set of tables return
+        a tuple (date_field, fields, tables, filters), where fields,
+        tables and filters are Sets. The default _get_sql builds the
+        query from these parts, and metrics sharing the same date field,
+        tables and filters can be computed together in one fused query
+        (see get_fused_data).
+
+        """
+
         raise NotImplementedError
 
     def _get_sql_filter_all (self, evolutionary):
@@ -193,8 +232,16 @@ class Metrics(object):
 
         query = self._get_sql(True)
         ts = self.db.ExecuteQuery(query)
+        return self._complete_ts(ts)
+
+    def _complete_ts(self, ts):
+        """Completes the periods of the data returned by the evolutionary query"""
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             id_field = self.db.get_group_field_alias(self.filters.type_analysis[0])
+            index = PeriodIndex.get(self.filters.period,
+                                    self.filters.startdate, self.filters.enddate)
+            if index is not None:
+                return index.complete_items(ts, id_field)
             ts = Metrics._convert_group_to_ts(ts, id_field)
             ts = Metrics._complete_period_ids_items(ts, id_field, self.filters.period,
                                                     self.filters.startdate, self.filters.enddate)
@@ -208,6 +255,106 @@ class Metrics(object):
         q = self._get_sql(False)
         return self.db.ExecuteQuery(q)
 
+    def _get_fused_key(self, evolutionary):
+        """Returns the key shared by metrics that can be computed in the same query
+
+        Only metrics using the default _get_sql, get_ts and get_agg methods
+        can be fused, given that the query parts must fully describe how
+        the data is obtained. None is returned for the rest of metrics.
+        """
+        cls = type(self)
+        if cls._get_sql.im_func is not Metrics._get_sql.im_func: return None
+        if evolutionary and cls.get_ts.im_func is not Metrics.get_ts.im_func:
+            return None
+        if not evolutionary and cls.get_agg.im_func is not Metrics.get_agg.im_func:
+            return None
+        try:
+            date_field, fields, tables, filters = self._get_sql_parts()
+        except NotImplementedError:
+            return None
+        for field in fields:
+            if DSQuery.get_field_alias(field) is None: return None
+
+        return (self.db.database, date_field.strip(),
+                frozenset(tables), frozenset(filters),
+                self.filters.period, self.filters.startdate,
+                self.filters.enddate, str(self.filters.type_analysis))
+
+    @staticmethod
+    def get_fused_data(metrics, evolutionary):
+        """Computes several metrics fusing the queries with the same shape
+
+        Metrics whose queries share the same FROM and WHERE clauses are
+        computed with a single query returning the columns of all of
+        them. The result is split back so each metric gets the same data
+        that its get_ts or get_agg method would return.
+
+        Returns a dict with the data for each fused metric, by metric id.
+        Metrics which could not be fused with others are not included
+        and should be computed as usual.
+        """
+        groups = {}
+        keys = [] # keep the order of the metrics
+        for metric in metrics:
+            key = metric._get_fused_key(evolutionary)
+            if key is None: continue
+            if key not in groups:
+                groups[key] = []
+                keys.append(key)
+            groups[key].append(metric)
+
+        data = {}
+        for key in keys:
+            if len(groups[key]) < 2: continue
+            data.update(Metrics._get_fused_group_data(groups[key], evolutionary))
+        return data
+
+    @staticmethod
+    def _get_fused_group_data(metrics, evolutionary):
+        """ Computes all metrics in a group sharing the same query shape """
+        first = metrics[0]
+        date_field, fields, tables, filters = first._get_sql_parts()
+
+        metrics_columns = {}
+        all_columns = []
+        for metric in metrics:
+            mfields = metric._get_sql_parts()[1]
+            columns = [DSQuery.get_field_alias(field) for field in mfields]
+            metrics_columns[metric.id] = columns
+            all_columns += columns
+            fields.union_update(mfields)
+
+        if len(fields) != len(set(all_columns)):
+            # Same column name with different expressions, can not be fused
+            logging.warning("Metrics " + ",".join(metrics_columns.keys()) +
+                            " can not be fused")
+            return {}
+
+        query = first.db.BuildQuery(first.filters.period, first.filters.startdate,
+                                    first.filters.enddate, date_field, fields,
+                                    tables, filters, evolutionary,
+                                    first.filters.type_analysis)
+        result = first.db.ExecuteQuery(query)
+
+        # Columns not computed by the metrics: periods and grouping fields
+        shared = [column for column in result if column not in all_columns]
+
+        data = {}
+        for metric in metrics:
+            mvalue = {}
+            for column in shared + metrics_columns[metric.id]:
+                if column not in result: continue
+                # Each metric gets its own lists, as they are filled in place
+                # (i.e. the items of GROUP BY results, see fill_items)
+                if isinstance(result[column], list):
+                    mvalue[column] = list(result[column])
+                else:
+                    mvalue[column] = result[column]
+            if evolutionary:
+                mvalue = metric._complete_ts(mvalue)
+            data[metric.id] = mvalue
+        return data
+
 
     def get_trends(self, date, days):
         """ Returns the trend metrics between now and now-days values """
@@ -245,6 +392,81 @@ class Metrics(object):
         self.filters = filters
         return (data)
 
+    def get_trends_windows(self, date, windows):
+        """ Returns the trend metrics for several days windows
+
+        When the metric query can be described with _get_sql_parts, all the
+        windows are computed in just one query using conditional aggregation.
+        Otherwise get_trends is used for each window.
+        """
+        query = self._get_trends_windows_sql(date, windows)
+        if query is None:
+            data = {}
+            for days in windows:
+                data = dict(data.items() + self.get_trends(date, days).items())
+            return data
+
+        values = self.db.ExecuteQuery(query)
+        data = {}
+        for days in windows:
+            last = values['last_'+str(days)]
+            if last is not None: last = int(last)
+            else: last = 0
+            prev = values['prev_'+str(days)]
+            if prev is not None: prev = int(prev)
+            else: prev = 0
+            data['diff_net'+self.id+'_'+str(days)] = last - prev
+            data['percentage_'+self.id+'_'+str(days)] = GetPercentageDiff(prev, last)
+            data[self.id+'_'+str(days)] = last
+        return data
+
+    def _get_trends_windows_sql(self, date, windows):
+        """ Returns the query with the last and prev values for all windows
+
+        None is returned if the metric trends can not be computed this way.
+        """
+        cls = type(self)
+        if cls.get_trends.im_func is not Metrics.get_trends.im_func: return None
+        if cls._get_sql.im_func is not Metrics._get_sql.im_func: return None
+        if cls.get_agg.im_func is not Metrics.get_agg.im_func: return None
+        if self.filters.type_analysis and self.filters.type_analysis[1] is None:
+            return None
+
+        windows_dates = dict((days, GetDates(date, days)) for days in windows)
+        enddate = windows_dates[windows[0]][0]
+        startdate = min([dates[2] for dates in windows_dates.values()])
+
+        # The same filters used in get_trends, in a copy of the metric so
+        # the filters of this one are not changed
+        trends = copy.copy(self)
+        trends.filters = MetricFilters(self.filters.period, startdate, enddate,
+                                       self.filters.type_analysis)
+        trends.filters.global_filter = self.filters.global_filter
+        trends.filters.closed_condition = self.filters.closed_condition
+        try:
+            date_field, fields, tables, filters = trends._get_sql_parts()
+        except NotImplementedError:
+            return None
+        if len(fields) != 1: return None
+        field = list(fields)[0]
+        if DSQuery.get_field_alias(field) != self.id: return None
+        field = re.sub("\\s+as\\s+\\w+\\s*$", "", field, flags=re.IGNORECASE)
+
+        date_field = date_field.strip()
+        windows_fields = Set([])
+        for days in windows:
+            dates = windows_dates[days]
+            for (name, start, end) in [("last", dates[1], dates[0]),
+                                       ("prev", dates[2], dates[1])]:
+                condition = date_field+">="+start+" AND "+date_field+"<"+end
+                window_field = DSQuery.get_field_conditional(field, condition)
+                if window_field is None: return None
+                windows_fields.add(window_field + " AS " + name + "_" + str(days))
+
+        return self.db.BuildQuery(self.filters.period, startdate, enddate,
+                                  date_field, windows_fields, tables, filters,
+                                  False, self.filters.type_analysis)
+
     def _get_trends_all_items(self, date, days):
         """ Returns the trend metrics between now and now-days values """
         from vizgrimoire.GrimoireUtils import check_array_values
@@ -35,6 +35,8 @@ from vizgrimoire.metrics.metrics import Metrics
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 
 from vizgrimoire.MLS import MLS
+from vizgrimoire.analysis.threads import ThreadsIndex
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
 
 from sets import Set
 
@@ -286,7 +288,7 @@ class TimeToFirstReply(Metrics):
     desc = "Time to first reply in a new thread"
     data_source = MLS
 
-    def get_agg(self):
+    def _get_timeto_sql(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -318,10 +320,18 @@ class TimeToFirstReply(Metrics):
 
         query = fields_str + tables_str + filters_str
 
-        timeframes = self.db.ExecuteQuery(query)
+        return query
+
+    def get_agg(self):
+        timeframes = self.db.ExecuteQuery(self._get_timeto_sql())
 
         return timeframes["diffdate"]
 
+    def get_sketch(self):
+        """ QuantileSketch of the times to first reply, without fetching all of them """
+        sketches = self.db.ExecuteQuerySketches(self._get_timeto_sql(), "diffdate")
+        return sketches.get((), QuantileSketch())
+
 
 class SendersInit(Metrics):
     """ People initiating threads """
@@ -449,21 +459,6 @@ class ActiveThreads(Metrics):
     data_source = MLS
 
 
-    def _root_message(self, message_id):
-        """ _root_message returns the root of a given message
-        """
-
-        message_id = message_id.replace("'", "\\'")
-        query = """select distinct is_response_of
-                   from messages
-                   where message_ID = '%s'""" % (message_id)
-        father = self.db.ExecuteQuery(query)
-        if father["is_response_of"] is not None and len(father["is_response_of"])>0:
-            self._root_message(father["is_response_of"])
-
-        return father["is_response_of"]
-
-
     def get_agg(self):
 
         fields = Set([])
@@ -471,7 +466,7 @@ class ActiveThreads(Metrics):
         filters = Set([])
 
         # List of all messages sent to the mailing list
-        fields.add("distinct m.message_ID as message_id")
+        fields.add("distinct m.message_ID as message_ID, m.is_response_of as is_response_of")
 
         tables.add("messages m")
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
@@ -481,15 +476,17 @@ class ActiveThreads(Metrics):
         query = self.db.BuildQuery(self.filters.period, self.filters.startdate,
                                    self.filters.enddate, " m.first_date ", fields,
                                    tables, filters, False, self.filters.type_analysis)
-        messages = self.db.ExecuteQuery(query)
+        index = ThreadsIndex(self.db.ExecuteQuery(query))
+        messages = list(index.messages)
+        # the roots of the threads could have been sent before the period
+        index.add_ancestors(self.db.ExecuteQuery)
 
         # for each of the messages sent between two dates
         # and the specific applied filters, the root message of each
         # of them is calculated.
         root_messages = Set([])
-        for message_id in messages["message_id"]:
-            root_message = self._root_message(message_id)
-            root_messages.add(root_message)
+        for message_id in messages:
+            root_messages.add(index.root(message_id))
 
         return len(root_messages)
 
@@ -664,24 +661,15 @@ class UnansweredPosts(Metrics):
     desc = "Unanswered posts in mailing lists"""
     data_source = MLS
 
-    def __get_date_from_month(self, monthid):
-        # month format: year*12+month
-        year = (monthid-1) / 12
-        month = monthid - year*12
-        day = 1
-        current = str(year) + "-" + str(month) + "-" + str(day)
-        return (current)
-
-    def __get_messages(self, from_date, to_date):
+    def __get_messages(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
 
         fields.add("m.message_ID as message_ID")
         fields.add("m.is_response_of as is_response_of")
+        fields.add("m.first_date as first_date")
         tables.add("messages m")
-        filters.add("m.first_date >= '" + str(from_date) + "' ") 
-        filters.add("m.first_date < '" + str(to_date) + "' ")
         filters.add("m.first_date >= " + str(self.filters.startdate))
         filters.add("m.first_date < " + str(self.filters.enddate))
 
@@ -697,13 +685,7 @@ class UnansweredPosts(Metrics):
 
         query = select_str + from_str + where_str
 
-        results = self.db.ExecuteQuery(query)
-
-        if isinstance(results['message_ID'], list):
-            return [(results['message_ID'][i], results['is_response_of'][i])\
-                    for i in range(len(results['message_ID']))]
-        else:
-            return [(results['message_ID'], results['is_response_of'])]
+        return ThreadsIndex(self.db.ExecuteQuery(query))
 
     def get_agg(self):
         return {}
@@ -733,26 +715,28 @@ class UnansweredPosts(Metrics):
         num_unanswered = {'month' : [],
                           'unanswered_posts' : []}
 
+        # A post is answered when a reply to it is sent after it
+        # in the same month
+        index = self.__get_messages()
+        month_of = lambda message_id: index.date[message_id].year * 12 + \
+                                      index.date[message_id].month
+        unanswered = {}
+        for message_id in index.messages:
+            if index.parent[message_id] is not None: continue
+            month = month_of(message_id)
+            answered = False
+            for reply in index.children.get(message_id, []):
+                if index.order[reply] > index.order[message_id] and \
+                   month_of(reply) == month:
+                    answered = True
+                    break
+            if not answered:
+                unanswered[month] = unanswered.get(month, 0) + 1
+
         for i in range(0, months):
-            unanswered = []
             current_month = start_month + i
-            from_date = self.__get_date_from_month(current_month)
-            to_date = self.__get_date_from_month(current_month + 1)
-            messages = self.__get_messages(from_date, to_date)
-
-            for message in messages:
-                message_id = message[0]
-                response_of = message[1]
-
-                if response_of is None:
-                    unanswered.append(message_id)
-                    continue
-
-                if response_of in unanswered:
-                    unanswered.remove(response_of)
-
             num_unanswered['month'].append(current_month)
-            num_unanswered['unanswered_posts'].append(len(unanswered))
+            num_unanswered['unanswered_posts'].append(unanswered.get(current_month, 0))
 
         return completePeriodIds(num_unanswered, self.filters.period,
                                  self.filters.startdate, self.filters.enddate)
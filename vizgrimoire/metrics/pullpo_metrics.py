@@ -152,47 +152,33 @@ class BMIPullpo(Metrics):
     name = "BMI Pullpo"
     desc = "Efficiency reviewing: (merged+abandoned reviews)/(submitted reviews)"
     data_source = Pullpo
+    depends_on = ["abandoned", "merged", "submitted"]
 
     def get_ts(self):
-        abandoned_reviews = Abandoned(self.db, self.filters)
-        merged_reviews = Merged(self.db, self.filters)
-        submitted_reviews = Submitted(self.db, self.filters)
-
-        abandoned = abandoned_reviews.get_ts()
-        abandoned = completePeriodIds(abandoned, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
-        # casting the type of the variable in order to use numpy
-        # faster way to deal with datasets...
-        abandoned_array = numpy.array(abandoned["abandoned"])
+        abandoned = self._get_dependency(Abandoned, True)
+        merged = self._get_dependency(Merged, True)
+        submitted = self._get_dependency(Submitted, True)
 
-        merged = merged_reviews.get_ts()
-        merged = completePeriodIds(merged, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
+        # The time series have the same complete periods. Casting the type
+        # of the variable in order to use numpy: faster way to deal with datasets
+        abandoned_array = numpy.array(abandoned["abandoned"])
         merged_array = numpy.array(merged["merged"])
-
-        submitted = submitted_reviews.get_ts()
-        submitted = completePeriodIds(submitted, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
         submitted_array = numpy.array(submitted["submitted"])
 
         bmi_array = (abandoned_array.astype(float) + merged_array.astype(float)) / submitted_array.astype(float)
 
-        bmi = abandoned
-        bmi.pop("abandoned")
+        bmi = dict([(key, value) for (key, value) in abandoned.items()
+                    if key != "abandoned"])
         bmi["bmiscr"] = list(bmi_array)
 
         return bmi
 
     def get_agg(self):
-        abandoned_reviews = Abandoned(self.db, self.filters)
-        merged_reviews = Merged(self.db, self.filters)
-        submitted_reviews = Submitted(self.db, self.filters)
-
-        abandoned = abandoned_reviews.get_agg()
+        abandoned = self._get_dependency(Abandoned, False)
         abandoned_data = abandoned["abandoned"]
-        merged = merged_reviews.get_agg()
+        merged = self._get_dependency(Merged, False)
         merged_data = merged["merged"]
-        submitted = submitted_reviews.get_agg()
+        submitted = self._get_dependency(Submitted, False)
         submitted_data = submitted["submitted"]
 
         if submitted_data == 0:
@@ -211,6 +197,7 @@ class Pending(Metrics):
     name = "Pending reviews"
     desc = "Number of pending review processes"
     data_source = Pullpo
+    depends_on = ["submitted", "merged", "abandoned"]
 
     def _get_metrics_for_pending(self):
         # We need to fix the same filter for all metrics
@@ -297,30 +284,27 @@ class Pending(Metrics):
         return pending
 
     def get_agg(self):
-        metrics = self._get_metrics_for_pending()
-        submitted = metrics['submitted'].get_agg()
-        merged = metrics['merged'].get_agg()
-        abandoned = metrics['abandoned'].get_agg()
-
         # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_agg_all()
         else:
+            submitted = self._get_dependency(Submitted, False)
+            merged = self._get_dependency(Merged, False)
+            abandoned = self._get_dependency(Abandoned, False)
             pending = submitted['submitted']-merged['merged']-abandoned['abandoned']
             pending = {"pending":pending}
         return pending
 
     def get_ts(self):
-        metrics = self._get_metrics_for_pending()
-        submitted = metrics["submitted"].get_ts()
-        merged = metrics["merged"].get_ts()
-        abandoned = metrics["abandoned"].get_ts()
-        evol = dict(submitted.items() + merged.items() + abandoned.items())
         pending = {"pending":[]}
             # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_ts_all()
         else:
+            submitted = self._get_dependency(Submitted, True)
+            merged = self._get_dependency(Merged, True)
+            abandoned = self._get_dependency(Abandoned, True)
+            evol = dict(submitted.items() + merged.items() + abandoned.items())
             for i in range(0, len(evol['submitted'])):
                 pending_val = evol["submitted"][i] - evol["merged"][i] - evol["abandoned"][i]
                 pending["pending"].append(pending_val)
@@ -21,8 +21,12 @@
 ##   Daniel Izquierdo-Cortazar <dizquierdo@bitergia.com>
 ##   Alvaro del Castillo <acs@bitergia.com>
 
+import cPickle as pickle
+import hashlib
 import logging
 import MySQLdb
+import os
+import MySQLdb.cursors
 import re
 import sys
 from sets import Set
@@ -32,11 +36,49 @@ import time
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.GrimoireUtils import genDates
 from vizgrimoire.datahandlers.data_handler import DHESA
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
 
 class DSQuery(object):
     """ Generic methods to control access to db """
 
-    db_conn_pool = {} # one connection per database
+    db_conn_pool = {} # one connection per (host, port, user, database, group)
+    db_conn_pid = None # process owning the pooled connections
+    db_conn_inherited = [] # connections of the parent process after a fork
+    db_schema_ready = set() # (query builder, connection) already prepared
+
+    # On disk cache for query results, disabled if None
+    cache_dir = None
+    cache_watermarks = {} # (query builder, connection): data watermark
+    cache_states = {} # connection: hash of statements changing its state
+    # Tables whose changes invalidate the cached results of a data source.
+    # Results are not cached for query builders without them.
+    watermark_tables = []
+    # (table, date column) whose last date is also part of the watermark
+    watermark_dates = []
+    # Identities and projects tables, checksummed for the watermark
+    watermark_identities_tables = ["uidentities", "identities", "enrollments",
+                                   "profiles", "organizations", "countries"]
+    watermark_projects_tables = ["projects", "project_repositories", "project_children"]
+    cache_checksums = {} # (host, port, database): checksum of its watermark tables
+
+    # MySQL errors for connections closed by the server or lost
+    CONN_LOST_ERRORS = (2006, 2013) # server has gone away, lost connection
+
+    # Results are streamed from the server (SSCursor) in chunks of rows
+    stream_results = True
+    fetch_chunk_size = 5000
+
+    # Directory with SQLite databases used instead of the MySQL server
+    # (see GrimoireSQLite), disabled if None
+    sqlite_dir = None
+
+    # Profile of the executed queries (see QueryProfile), disabled if None
+    profile = None
+
+    # Projects hierarchy read once per process, by projects database
+    projects_hierarchy = {}
+    projects_closure_on = {} # project_closure table updated and usable
+    projects_repositories = {} # (projects database, project, data source): repositories
 
     def __init__(self, user, password, database,
                  identities_db = None, projects_db = None,
@@ -49,17 +91,72 @@ class DSQuery(object):
         self.host = host
         self.port = port
         self.group = group
-        if database in DSQuery.db_conn_pool:
-            db = DSQuery.db_conn_pool[database]
-        else:
-            db = self.__SetDBChannel__(user, password, database, host, port, group)
-            DSQuery.db_conn_pool[database] = db
+
+        self._connect()
+        self.prepare_schema()
+
+    def _get_conn_key(self):
+        return (self.host, self.port, self.user, self.database, self.group)
+
+    def _connect(self):
+        """ Get a cursor from the process wide connection pool """
+        db = DSQuery.get_db_conn(self.user, self.password, self.database,
+                                 self.host, self.port, self.group)
         self.cursor = db.cursor()
-        self.cursor.execute("SET NAMES 'utf8'")
+        self.cursor_pid = os.getpid()
 
-        db = self.__SetDBChannel__(user, password, database, host, port, group)
+    @staticmethod
+    def get_db_conn(user, password, database, host="127.0.0.1", port=3306,
+                    group=None):
+        """ Return the pooled connection for a database, checking it is alive
+
+        Connections are shared by all query builders in the process and
+        created only the first time a (host, port, user, database, group)
+        is used. A connection closed by the server is detected with a ping
+        and replaced by a new one.
 
+        Connections are not shared between processes: a forked process
+        (i.e. a report worker) creates its own ones.
+        """
+        if DSQuery.db_conn_pid != os.getpid():
+            # Parent connections are kept referenced but never used or
+            # closed, so the parent sessions are not affected
+            DSQuery.db_conn_inherited += DSQuery.db_conn_pool.values()
+            DSQuery.db_conn_pool = {}
+            DSQuery.db_conn_pid = os.getpid()
+
+        key = (host, port, user, database, group)
+        db = DSQuery.db_conn_pool.get(key)
+
+        if db is not None:
+            try:
+                db.ping()
+            except MySQLdb.OperationalError:
+                logging.info("Connection to " + database + " lost. Reconnecting.")
+                db = None
+
+        if db is None:
+            db = DSQuery.__SetDBChannel__(user, password, database, host, port, group)
+            db.cursor().execute("SET NAMES 'utf8'")
+            DSQuery.db_conn_pool[key] = db
+        return db
+
+    @staticmethod
+    def close_db_conns():
+        """ Close all pooled connections """
+        for db in DSQuery.db_conn_pool.values():
+            try:
+                db.close()
+            except MySQLdb.Error:
+                pass
+        DSQuery.db_conn_pool = {}
+
+    def prepare_schema(self):
+        """ Create the indexes for the data source once per database and process """
+        key = (type(self), self._get_conn_key())
+        if key in DSQuery.db_schema_ready: return
         self.create_indexes()
+        DSQuery.db_schema_ready.add(key)
 
     def create_indexes(self):
         """ Basic indexes used in each data source """
@@ -212,9 +309,25 @@ class DSQuery(object):
                                   startdate, enddate, all_items)
         return(q)
 
-    def __SetDBChannel__ (self, user=None, password=None, database=None,
+    @staticmethod
+    def set_sqlite_dir(sqlite_dir):
+        """ Run the queries in the SQLite databases in sqlite_dir (None for MySQL) """
+        DSQuery.close_db_conns()
+        DSQuery.sqlite_dir = sqlite_dir
+
+    def get_sqlalchemy_url(self):
+        """ SQLAlchemy url for the databases used by the query builder """
+        if DSQuery.sqlite_dir is not None:
+            return 'sqlite:///' + DSQuery.sqlite_dir
+        return 'mysql://' + self.user + ':' + self.password + '@' + self.host + '/'
+
+    @staticmethod
+    def __SetDBChannel__ (user=None, password=None, database=None,
                       host="127.0.0.1", port=3306, group=None):
-        if (group == None):
+        if DSQuery.sqlite_dir is not None:
+            from vizgrimoire import GrimoireSQLite
+            db = GrimoireSQLite.connect(database, DSQuery.sqlite_dir)
+        elif (group == None):
             db = MySQLdb.connect(user=user, passwd=password,
                                  db=database, host=host, port=port)
         else:
@@ -231,30 +344,430 @@ class DSQuery(object):
         #fd.write(sql)
         #fd.close()
 
+        cache_file = self._get_cache_file(sql)
+        if cache_file is not None:
+            result = DSQuery._read_cache_file(cache_file)
+            if result is not None: return result
 
+        result = self._execute_query(sql)
 
+        if cache_file is not None:
+            DSQuery._write_cache_file(cache_file, result)
+        return result
+
+    def _execute_query(self, sql):
         # print sql
-        result = {}
-        self.cursor.execute(sql)
-        rows = self.cursor.rowcount
-        columns = self.cursor.description
+        def execute_query():
+            if not DSQuery.stream_results:
+                self._execute(sql)
+                return DSQuery.fetch_columns(self.cursor)
+
+            cursor = self._execute(sql, MySQLdb.cursors.SSCursor)
+            try:
+                return DSQuery.fetch_columns(cursor)
+            finally:
+                cursor.close()
+
+        return self._profiled(sql, execute_query)
+
+    def ExecuteQuerySketches (self, sql, value_field, key_fields = []):
+        """ Read the values of value_field in a QuantileSketch per key
+
+        The rows are streamed and each value is added to the sketch of the
+        tuple with the values of key_fields in its row, so the values are
+        never held in memory. NULL values are ignored.
+        """
+        if sql is None: return {}
+
+        # Sketches are cached as the results of the query
+        cache_sql = sql + "\n-- sketches of %s by %s" % (value_field, ",".join(key_fields))
+        cache_file = self._get_cache_file(cache_sql)
+        if cache_file is not None:
+            result = DSQuery._read_cache_file(cache_file)
+            if result is not None: return result
+
+        def execute_query():
+            cursorclass = None
+            if DSQuery.stream_results: cursorclass = MySQLdb.cursors.SSCursor
+            cursor = self._execute(sql, cursorclass)
+            try:
+                columns = [column[0] for column in cursor.description]
+                value_pos = columns.index(value_field)
+                keys_pos = [columns.index(field) for field in key_fields]
+
+                sketches = {}
+                chunk = cursor.fetchmany(DSQuery.fetch_chunk_size)
+                while chunk:
+                    for row in chunk:
+                        if row[value_pos] is None: continue
+                        key = tuple([row[pos] for pos in keys_pos])
+                        if key not in sketches: sketches[key] = QuantileSketch()
+                        sketches[key].add(row[value_pos])
+                    chunk = cursor.fetchmany(DSQuery.fetch_chunk_size)
+            finally:
+                if cursorclass is not None: cursor.close()
+            return sketches
+
+        sketches = self._profiled(sql, execute_query)
+
+        if cache_file is not None:
+            DSQuery._write_cache_file(cache_file, sketches)
+        return sketches
+
+    @staticmethod
+    def fetch_columns(cursor, chunk_size = None):
+        """ Read the rows of an executed query as a dict of columns
 
+        Rows are read in chunks so the result set is never held twice in
+        memory, which allows to use unbuffered server side cursors. With
+        just one row the values are returned as scalars, not as lists.
+        """
+        result = {}
+        columns = cursor.description
         if columns is None: return result
 
-        for column in columns:
-            result[column[0]] = []
-        if rows > 1:
-            for value in self.cursor.fetchall():
-                for (index,column) in enumerate(value):
-                    result[columns[index][0]].append(column)
-        elif rows == 1:
-            value = self.cursor.fetchone()
-            for i in range (0, len(columns)):
-                result[columns[i][0]] = value[i]
+        if chunk_size is None: chunk_size = DSQuery.fetch_chunk_size
+        values = [[] for column in columns]
+        rows = 0
+        chunk = cursor.fetchmany(chunk_size)
+        while chunk:
+            rows += len(chunk)
+            # transpose the chunk and append it column by column
+            for (index, column_values) in enumerate(zip(*chunk)):
+                values[index].extend(column_values)
+            chunk = cursor.fetchmany(chunk_size)
+
+        for (index, column) in enumerate(columns):
+            if rows == 1: result[column[0]] = values[index][0]
+            else: result[column[0]] = values[index]
         return result
 
+    def _execute(self, sql, cursorclass = None):
+        """ Execute sql reconnecting once if the connection was lost
+
+        With a cursorclass a new cursor of that class is used for the query,
+        and returned, instead of the query builder one.
+        """
+        if self.cursor_pid != os.getpid():
+            # Query builder created before forking this process
+            self._connect()
+
+        def execute():
+            if cursorclass is None: cursor = self.cursor
+            else: cursor = self.cursor.connection.cursor(cursorclass)
+            cursor.execute(sql)
+            return cursor
+
+        try:
+            return execute()
+        except MySQLdb.OperationalError, e:
+            if e.args[0] not in DSQuery.CONN_LOST_ERRORS: raise
+            # The pool replaces the connection if it is not alive
+            self._connect()
+            return execute()
+
+    def _profiled(self, sql, run):
+        """ Return run(), which executes sql, recorded in the profile if enabled """
+        if DSQuery.profile is None: return run()
+        return DSQuery.profile.execute(sql, run, self.cursor.connection)
+
+    @staticmethod
+    def set_profile(profile):
+        """ Record the executed queries in profile (a QueryProfile), None to disable """
+        DSQuery.profile = profile
+
     def ExecuteViewQuery(self, sql):
-        self.cursor.execute(sql)
+        self._update_cache_state(sql)
+        self._profiled(sql, lambda: self._execute(sql))
+
+    @staticmethod
+    def set_cache_dir(cache_dir):
+        """ Enable the on disk cache of query results in cache_dir """
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        DSQuery.cache_dir = cache_dir
+
+    def get_watermark_query(self):
+        """ Query whose results change when the data used by the queries change
+
+        It includes the number of rows and the last date in the data source
+        main tables, and the last update time of the data source, identities
+        and projects databases (not available for all storage engines).
+        """
+        if not self.watermark_tables: return None
+        fields = []
+        for (name, database) in [("update_time", self.database),
+                                 ("identities_update_time", self.identities_db),
+                                 ("projects_update_time", self.projects_db)]:
+            if database is None: continue
+            fields.append("(SELECT MAX(UPDATE_TIME) FROM information_schema.TABLES " + \
+                          "WHERE TABLE_SCHEMA = '%s') AS %s" % (database, name))
+        for table in self.watermark_tables:
+            fields.append("(SELECT COUNT(*) FROM %s) AS %s" % (table, table))
+        for (table, column) in self.watermark_dates:
+            fields.append("(SELECT MAX(%s) FROM %s) AS %s_%s" % (column, table, table, column))
+        return "SELECT " + ", ".join(fields)
+
+    def _get_checksums(self, database, tables):
+        """ CHECKSUM TABLE of the tables of a database, once per process
+
+        Rows updated in place, as profiles or enrollments in the identities
+        database, change the checksum but not the number of rows. None if
+        some checksum is not available.
+        """
+        key = (self.host, self.port, database)
+        if key not in DSQuery.cache_checksums:
+            q = "CHECKSUM TABLE " + ", ".join([database + "." + table for table in tables])
+            rows = DSQuery.get_rows(self._execute_query(q), ["Table", "Checksum"])
+            checksums = str(sorted(rows))
+            if len(rows) != len(tables) or None in [row[1] for row in rows]:
+                checksums = None
+            DSQuery.cache_checksums[key] = checksums
+        return DSQuery.cache_checksums[key]
+
+    def get_watermark(self):
+        """ Return the data watermark, computed once per process
+
+        None, and results are not cached, if it can not be computed.
+        """
+        key = (type(self), self._get_conn_key())
+        if key not in DSQuery.cache_watermarks:
+            watermark = None
+            q = self.get_watermark_query()
+            if q is not None:
+                try:
+                    values = self._execute_query(q)
+                    if values.get("update_time") is None:
+                        logging.warning("No update time for " + self.database + \
+                                        ". Rows updated in place are not detected " + \
+                                        "by the results cache, only new rows.")
+                    watermark = [sorted(values.items())]
+                    for (database, tables) in [(self.identities_db, self.watermark_identities_tables),
+                                               (self.projects_db, self.watermark_projects_tables)]:
+                        if database is None: continue
+                        checksums = self._get_checksums(database, tables)
+                        if checksums is None:
+                            logging.warning("Can not checksum " + database + " tables. " + \
+                                            "Results of " + self.database + " not cached.")
+                            watermark = None
+                            break
+                        watermark.append(checksums)
+                    if watermark is not None: watermark = str(watermark)
+                except MySQLdb.Error, e:
+                    logging.warning("Can not get data watermark for " +
+                                    self.database + ". Results not cached: " + str(e))
+            DSQuery.cache_watermarks[key] = watermark
+        return DSQuery.cache_watermarks[key]
+
+    def _update_cache_state(self, sql):
+        """ Statements creating views, tables ... change the results of queries """
+        if DSQuery.cache_dir is None: return
+        key = self._get_conn_key()
+        state = DSQuery.cache_states.get(key, "")
+        DSQuery.cache_states[key] = hashlib.sha1(state + " ".join(sql.split())).hexdigest()
+
+    def _get_cache_file(self, sql):
+        """ Return the file with the cached results for sql, None if not cached """
+        if DSQuery.cache_dir is None: return None
+
+        sql_norm = " ".join(sql.split())
+        # Statements setting user variables (SELECT @var:=...) are always
+        # executed, as the queries using the variables may not be cached
+        if re.match("\(?\s*select\\b", sql_norm, re.IGNORECASE) is None or \
+                re.search("@\w+\s*:=", sql_norm) is not None:
+            self._update_cache_state(sql_norm)
+            return None
+        # Results depending on the current time can not be reused
+        if re.search("\\b(now|curdate|current_date|current_timestamp|sysdate|rand)\\b",
+                     sql_norm, re.IGNORECASE) is not None:
+            return None
+        watermark = self.get_watermark()
+        if watermark is None: return None
+
+        key = "\n".join([str(self.identities_db), str(self.projects_db), watermark,
+                         DSQuery.cache_states.get(self._get_conn_key(), ""), sql_norm])
+        key = hashlib.sha1(key).hexdigest()
+        return os.path.join(DSQuery.cache_dir, self.database, key[0:2], key + ".pickle")
+
+    @staticmethod
+    def _read_cache_file(cache_file):
+        if not os.path.isfile(cache_file): return None
+        try:
+            f = open(cache_file, "rb")
+            try:
+                return pickle.load(f)
+            finally:
+                f.close()
+        except Exception, e:
+            logging.warning("Wrong cache file " + cache_file + ": " + str(e))
+            return None
+
+    @staticmethod
+    def _write_cache_file(cache_file, result):
+        # Written in a temporal file first so workers never read partial files
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                if not os.path.isdir(cache_dir): raise
+        tmp_file = cache_file + "." + str(os.getpid())
+        f = open(tmp_file, "wb")
+        try:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmp_file, cache_file)
+
+    def _get_projects_key(self):
+        return (self.host, self.port, self.projects_db)
+
+    @staticmethod
+    def get_rows(result, fields):
+        """ List of tuples with the values of fields in each row of a result """
+        if not result: return []
+        columns = [result[field] for field in fields]
+        if not isinstance(columns[0], list): return [tuple(columns)]
+        return zip(*columns)
+
+    @staticmethod
+    def get_projects_closure(project_ids, children):
+        """ Closure of the projects hierarchy from (project, subproject) pairs
+
+        Returns a dict with the descendants of each project, as a dict with
+        their depth (shortest path). Each project is its own descendant with
+        depth 0. Cycles in the hierarchy are ignored.
+        """
+        subprojects = {}
+        for (project_id, subproject_id) in children:
+            subprojects.setdefault(project_id, []).append(subproject_id)
+
+        closure = {}
+        for project_id in Set(project_ids).union(subprojects.keys()):
+            descendants = {project_id: 0}
+            level = [project_id]
+            depth = 0
+            while level:
+                depth += 1
+                next_level = []
+                for parent_id in level:
+                    for subproject_id in subprojects.get(parent_id, []):
+                        if subproject_id in descendants: continue
+                        descendants[subproject_id] = depth
+                        next_level.append(subproject_id)
+                level = next_level
+            closure[project_id] = descendants
+        return closure
+
+    def get_projects_hierarchy(self):
+        """ Projects hierarchy, read from the projects database once per process
+
+        Returns a dict with "ids" (project_id of each project id), "closure"
+        (see get_projects_closure), "repositories" (repositories of each
+        (project_id, data source)) and "children_on" (project_children has
+        contents).
+        """
+        key = self._get_projects_key()
+        if key not in DSQuery.projects_hierarchy:
+            q = "SELECT id, project_id FROM %s.projects" % (self.projects_db)
+            projects = DSQuery.get_rows(self.ExecuteQuery(q), ["id", "project_id"])
+            q = "SELECT project_id, subproject_id FROM %s.project_children" % (self.projects_db)
+            children = DSQuery.get_rows(self.ExecuteQuery(q), ["project_id", "subproject_id"])
+            q = "SELECT project_id, data_source, repository_name " + \
+                "FROM %s.project_repositories" % (self.projects_db)
+            repos = DSQuery.get_rows(self.ExecuteQuery(q),
+                                     ["project_id", "data_source", "repository_name"])
+
+            repositories = {}
+            for (project_id, data_source, repository_name) in repos:
+                repositories.setdefault((project_id, data_source), []).append(repository_name)
+            DSQuery.projects_hierarchy[key] = {
+                "ids": dict(projects),
+                "closure": DSQuery.get_projects_closure([row[1] for row in projects], children),
+                "repositories": repositories,
+                "children_on": len(children) > 0
+            }
+        return DSQuery.projects_hierarchy[key]
+
+    def get_projects_closure_on(self):
+        """ Check the project_closure table has the closure of the hierarchy
+
+        The table (ancestor_id, descendant_id, depth) is created in the
+        projects database, or replaced if the hierarchy has changed, once
+        per process. Returns False if it can not be written.
+        """
+        key = self._get_projects_key()
+        if key not in DSQuery.projects_closure_on:
+            closure = self.get_projects_hierarchy()["closure"]
+            rows = Set([(ancestor_id, descendant_id, depth)
+                        for ancestor_id in closure
+                        for (descendant_id, depth) in closure[ancestor_id].items()])
+            table = self.projects_db + ".project_closure"
+            fields = ["ancestor_id", "descendant_id", "depth"]
+            try:
+                q = "SELECT " + ", ".join(fields) + " FROM " + table
+                current = Set(DSQuery.get_rows(self._execute_query(q), fields))
+            except MySQLdb.Error:
+                current = None
+            closure_on = True
+            if current != rows:
+                try:
+                    self._write_projects_closure(table, sorted(rows))
+                    logging.info("Projects closure written in " + table)
+                except MySQLdb.Error, e:
+                    logging.warning("Can not write " + table + ". Projects " + \
+                                    "closure not used: " + str(e))
+                    closure_on = False
+            DSQuery.projects_closure_on[key] = closure_on
+        return DSQuery.projects_closure_on[key]
+
+    def _write_projects_closure(self, table, rows):
+        """ Write the closure rows in table
+
+        Other processes (report workers or other reports) may be reading
+        the table, so the rows are written in a new table which replaces
+        the old one with an atomic RENAME.
+        """
+        def execute(sql):
+            self._profiled(sql, lambda: self._execute(sql))
+
+        new_table = table + "_new_" + str(os.getpid())
+        old_table = table + "_old_" + str(os.getpid())
+        execute("DROP TABLE IF EXISTS " + new_table)
+        execute("CREATE TABLE " + new_table + " (ancestor_id INT NOT NULL, " + \
+                "descendant_id INT NOT NULL, depth INT NOT NULL, " + \
+                "PRIMARY KEY (ancestor_id, descendant_id))")
+        for i in range(0, len(rows), 500):
+            values = ["(%i, %i, %i)" % row for row in rows[i:i+500]]
+            execute("INSERT INTO " + new_table + " VALUES " + ", ".join(values))
+        self.cursor.connection.commit()
+        try:
+            execute("RENAME TABLE " + table + " TO " + old_table + ", " + \
+                    new_table + " TO " + table)
+            execute("DROP TABLE " + old_table)
+        except MySQLdb.Error:
+            # No table yet
+            try:
+                execute("RENAME TABLE " + new_table + " TO " + table)
+            except MySQLdb.Error:
+                # Created meanwhile by other process, with the same rows
+                execute("DROP TABLE " + new_table)
+
+    def get_project_repositories(self, project, ds_name):
+        """ Repositories of a data source in a project and all its subprojects
+
+        The list is computed once per process for each project.
+        """
+        key = self._get_projects_key() + (project, ds_name)
+        if key not in DSQuery.projects_repositories:
+            hierarchy = self.get_projects_hierarchy()
+            repos = Set([])
+            project_id = hierarchy["ids"].get(project)
+            if project_id is not None:
+                for descendant_id in hierarchy["closure"][project_id]:
+                    repos.update(hierarchy["repositories"].get((descendant_id, ds_name), []))
+            DSQuery.projects_repositories[key] = sorted(repos)
+        return DSQuery.projects_repositories[key]
 
     def get_subprojects(self, project):
         """ Return all subprojects ids for a project in a string join by comma """
@@ -265,25 +778,80 @@ class DSQuery(object):
             #       or in the final query builder
             project = project.replace("'", "")
 
-        q = "SELECT project_id from %s.projects WHERE id='%s'" % (self.projects_db, project)
-        project_id = self.ExecuteQuery(q)['project_id']
-
-        q = """
-            SELECT subproject_id from %s.project_children pc where pc.project_id = '%s'
-        """ % (self.projects_db, project_id)
+        hierarchy = self.get_projects_hierarchy()
+        project_id = hierarchy["ids"].get(project)
+        if project_id is None: return "NULL"
 
-        subprojects = self.ExecuteQuery(q)
+        descendants = hierarchy["closure"][project_id]
+        subprojects = sorted([descendant_id for descendant_id in descendants
+                              if descendant_id != project_id],
+                             key = lambda descendant_id: (descendants[descendant_id], descendant_id))
+        return ','.join(str(x) for x in subprojects + [project_id])
 
-        if not isinstance(subprojects['subproject_id'], list):
-            subprojects['subproject_id'] = [subprojects['subproject_id']]
 
-        project_with_children = subprojects['subproject_id'] + [project_id]
-        project_with_children_str = ','.join(str(x) for x in project_with_children)
+    @staticmethod
+    def get_field_alias (field):
+        """ Return the alias of a field in a SELECT clause, None if no alias
+
+        >>> DSQuery.get_field_alias("count(distinct(s.rev)) as commits")
+        'commits'
+        >>> DSQuery.get_field_alias("count(distinct(s.repository_id)) AS repositories")
+        'repositories'
+        >>> DSQuery.get_field_alias("count(distinct(pup.uuid))") is None
+        True
+        """
+        alias = re.search("\s+as\s+(\w+)\s*$", field, re.IGNORECASE)
+        if alias is None: return None
+        return alias.group(1)
 
-        if (project_with_children_str == "[]"): project_with_children_str = "NULL"
+    @staticmethod
+    def get_field_conditional (field, condition):
+        """ Return field with its aggregations limited to the rows matching condition
 
-        return  project_with_children_str
+        None is returned if an aggregation can not be limited.
 
+        >>> DSQuery.get_field_conditional("count(distinct(s.rev))", "s.id > 1")
+        'count(distinct(CASE WHEN s.id > 1 THEN s.rev END))'
+        >>> DSQuery.get_field_conditional("sum(cl.added)/count(*)", "s.id > 1")
+        'sum(CASE WHEN s.id > 1 THEN cl.added END)/count(CASE WHEN s.id > 1 THEN 1 END)'
+        >>> DSQuery.get_field_conditional("count(distinct a.id, a.file_id)", "s.id > 1") is None
+        True
+        """
+        aggregation = re.compile("\\b(count|sum|min|max|avg)\\s*\\(", re.IGNORECASE)
+
+        def get_args_end(text, start):
+            # Position after the parenthesis closing the one before start
+            depth = 1
+            for pos in range(start, len(text)):
+                if text[pos] == '(': depth += 1
+                elif text[pos] == ')': depth -= 1
+                elif text[pos] == ',' and depth == 1: return None
+                if depth == 0: return pos + 1
+            return None
+
+        result = ""
+        pos = 0
+        match = aggregation.search(field, pos)
+        while match is not None:
+            args_end = get_args_end(field, match.end())
+            if args_end is None: return None
+            arg = field[match.end():args_end-1].strip()
+            if aggregation.search(arg) is not None: return None
+            distinct = re.match("distinct\\b\\s*(.*)$", arg, re.IGNORECASE | re.DOTALL)
+            if distinct is not None:
+                arg = distinct.group(1).strip()
+                if arg.startswith("(") and get_args_end(arg, 1) == len(arg):
+                    arg = arg[1:-1].strip()
+                elif get_args_end(arg + ")", 0) is None: return None
+            if arg == "*": arg = "1"
+            arg = "CASE WHEN " + condition + " THEN " + arg + " END"
+            if distinct is not None:
+                arg = field[match.end():args_end-1].strip()[0:8] + "(" + arg + ")"
+            result += field[pos:match.end()] + arg + ")"
+            pos = args_end
+            match = aggregation.search(field, pos)
+        result += field[pos:]
+        return result
 
     @classmethod
     def get_group_field_alias (ds_query, filter_type):
@@ -352,20 +920,14 @@ class DSQuery(object):
         return filter_bots
 
     def get_projects_children_on (self):
-        global project_children_on
-        if 'project_children_on' not in globals():
-            # Detect if project_children has contents. If not, don't use it
-            q = "SELECT COUNT(*) as total FROM %s.project_children" % (self.projects_db)
-            res = self.ExecuteQuery(q)
-            if res['total'] == 0:
-                project_children_on = False
-            else:
-                project_children_on = True
-        return project_children_on
+        """ project_children has contents. If not, don't use it """
+        return self.get_projects_hierarchy()["children_on"]
 
-    def GetSQLProjectsFrom (self, project = None):
-        project_children_on = self.get_projects_children_on()
+    @staticmethod
+    def _quote(value):
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
 
+    def GetSQLProjectsFrom (self, project = None):
         tables = Set([])
         # TODO: ds_name should be obtained from DataSource
         if type(self) == SCMQuery:
@@ -387,22 +949,39 @@ class DSQuery(object):
         else:
             raise("Project filter not supported by data source: ", self)
 
-        pc_table = pc_filters = ''
-        if project_children_on:
-            pc_table = ", " + self.projects_db+".project_children pc"
-            pc_filters = "(p.project_id = pc.project_id and pc.subproject_id = pr.project_id) or"
-
-        q_proj_repo = """
-            SELECT distinct p.id as name, pr.repository_name
-            FROM  %s.projects p, %s.project_repositories pr %s
-            WHERE (%s p.project_id = pr.project_id) and
-                 pr.data_source='%s'
-            """ % (self.projects_db, self.projects_db, pc_table, pc_filters, ds_name)
         if project is not None:
             if (project[0] == "'" and project[-1] == "'"):
                 project = project[1:-1]
-            q_proj_repo += " AND p.id = '"+project+"'"
-        table_q_proj_repo = "(" + q_proj_repo +") prj"
+            # Repositories of the project and its subprojects, computed once
+            repos = self.get_project_repositories(project, ds_name)
+            name = DSQuery._quote(project)
+            if not repos:
+                rows = ["SELECT %s AS name, NULL AS repository_name" % (name)]
+            else:
+                rows = ["SELECT %s AS name, %s AS repository_name" % (name, DSQuery._quote(repos[0]))]
+                rows += ["SELECT %s, %s" % (name, DSQuery._quote(repo)) for repo in repos[1:]]
+            table_q_proj_repo = "(" + " UNION ALL ".join(rows) + ") prj"
+        elif self.get_projects_closure_on():
+            q_proj_repo = """
+                SELECT distinct p.id as name, pr.repository_name
+                FROM  %s.projects p, %s.project_closure pc, %s.project_repositories pr
+                WHERE p.project_id = pc.ancestor_id and pc.descendant_id = pr.project_id and
+                     pr.data_source='%s'
+                """ % (self.projects_db, self.projects_db, self.projects_db, ds_name)
+            table_q_proj_repo = "(" + q_proj_repo +") prj"
+        else:
+            pc_table = pc_filters = ''
+            if self.get_projects_children_on():
+                pc_table = ", " + self.projects_db+".project_children pc"
+                pc_filters = "(p.project_id = pc.project_id and pc.subproject_id = pr.project_id) or"
+
+            q_proj_repo = """
+                SELECT distinct p.id as name, pr.repository_name
+                FROM  %s.projects p, %s.project_repositories pr %s
+                WHERE (%s p.project_id = pr.project_id) and
+                     pr.data_source='%s'
+                """ % (self.projects_db, self.projects_db, pc_table, pc_filters, ds_name)
+            table_q_proj_repo = "(" + q_proj_repo +") prj"
 
         tables.add(table_q_proj_repo)
 
@@ -438,6 +1017,9 @@ class DSQuery(object):
 class SCMQuery(DSQuery):
     """ Specific query builders for source code management system data source """
 
+    watermark_tables = ["scmlog", "actions", "commits_lines", "people_uidentities"]
+    watermark_dates = [("scmlog", "date")]
+
     def GetSQLRepositoriesFrom (self):
         """ Tables needed for repository studies
 
@@ -953,6 +1535,11 @@ class SCMQuery(DSQuery):
 
 class ITSQuery(DSQuery):
     """ Specific query builders for issue tracking system data source """
+
+    watermark_tables = ["issues", "changes", "comments", "people_uidentities"]
+    watermark_dates = [("issues", "submitted_on"), ("changes", "changed_on"),
+                       ("comments", "submitted_on")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         tables = Set([])
@@ -1303,6 +1890,10 @@ class ITSQuery(DSQuery):
 
 class MLSQuery(DSQuery):
     """ Specific query builders for mailing lists data source """
+
+    watermark_tables = ["messages", "messages_people", "people_uidentities"]
+    watermark_dates = [("messages", "first_date")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         #return (" messages m ")
@@ -1601,6 +2192,10 @@ class MLSQuery(DSQuery):
 class SCRQuery(DSQuery):
     """ Specific query builders for source code review source"""
 
+    watermark_tables = ["issues", "changes", "comments", "people_uidentities"]
+    watermark_dates = [("issues", "submitted_on"), ("changes", "changed_on"),
+                       ("comments", "submitted_on")]
+
     def GetSQLRepositoriesFrom (self):
         #tables necessaries for repositories
         tables = Set([])
@@ -2263,6 +2858,48 @@ class SCRQuery(DSQuery):
 
         return sql_reviews_closed
 
+    def get_sql_reviews_closed_dates (self, startdate, enddate):
+        # closed date of all merged and abandoned reviews submitted in the period
+
+        sql_closed_dates = """
+            SELECT i.id as issue_id, MIN(ie.mod_date) as closed_on
+            FROM issues i, issues_ext_gerrit ie
+            WHERE submitted_on >= %s AND submitted_on < %s AND i.id = ie.issue_id
+            AND (status='MERGED' OR status='ABANDONED')
+            GROUP BY i.id
+        """ % (startdate, enddate)
+
+        return sql_closed_dates
+
+    def get_sql_reviews_patchsets (self, startdate, enddate):
+        # patchsets changes of all reviews submitted in the period, sorted by date
+
+        sql_patchsets = """
+            SELECT ch.issue_id as issue_id, ch.changed_on as changed_on,
+                   CAST(ch.old_value as UNSIGNED) as patchset
+            FROM issues i, changes ch
+            WHERE i.submitted_on >= %s AND i.submitted_on < %s AND ch.issue_id = i.id
+            AND ch.old_value<>'' and ch.old_value<>'None'
+            ORDER BY ch.changed_on
+        """ % (startdate, enddate)
+
+        return sql_patchsets
+
+    def get_sql_reviews_rejected_patchsets (self, startdate, enddate):
+        # patchsets with a negative review (-1 or -2) of all reviews submitted in the period
+
+        sql_rejected = """
+            SELECT DISTINCT ch.issue_id as issue_id,
+                   CAST(ch.old_value as UNSIGNED) as patchset
+            FROM issues i, changes ch
+            WHERE i.submitted_on >= %s AND i.submitted_on < %s AND ch.issue_id = i.id
+            AND (    (field = 'Code-Review' AND (new_value = -1 or new_value = -2))
+                 OR  (field = 'Verified' AND (new_value = -1 or new_value = -2))
+            )
+        """ % (startdate, enddate)
+
+        return sql_rejected
+
     def GetPeopleQuerySubmissions (self, developer_id, period, startdate, enddate, evol):
         fields = "COUNT(i.id) AS submissions"
         tables = self._get_tables_query(self.GetTablesOwnUniqueIds('issues'))
@@ -2395,10 +3032,8 @@ class SCRQuery(DSQuery):
                  host="127.0.0.1", port=3306, group=None):
         super(SCRQuery, self).__init__(user, password, database, identities_db, projects_db,
                                        host, port, group)
-        # _filter_submitter_id as a static global var to avoid SQL re-execute
-        people_userid = 'l10n-bot'
-        q = "SELECT id FROM people WHERE user_id = '%s'" % (people_userid)
-        self._filter_submitter_id = self.ExecuteQuery(q)['id']
+        # Submitter filtering (i.e. people with user_id 'l10n-bot') is not
+        # used in general, so the submitter id is not queried anymore
         self._filter_submitter_id = None # don't filter in general
 
     # To be used for issues table
@@ -2417,6 +3052,9 @@ class SCRQuery(DSQuery):
 
 class IRCQuery(DSQuery):
 
+    watermark_tables = ["irclog", "people_uidentities"]
+    watermark_dates = [("irclog", "date")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         fields = Set([])
@@ -2619,6 +3257,9 @@ class IRCQuery(DSQuery):
 
 class MediawikiQuery(DSQuery):
 
+    watermark_tables = ["wiki_pages_revs", "people_uidentities"]
+    watermark_dates = [("wiki_pages_revs", "date")]
+
     def GetSQLPeople2Where(self, name = None):
         # filters necessary to organizations analysis
         filters = Set([])
@@ -2678,6 +3319,9 @@ class MediawikiQuery(DSQuery):
 class QAForumsQuery(DSQuery):
     """ Specific query builders for question and answer platforms """
 
+    watermark_tables = ["questions", "answers", "people_uidentities"]
+    watermark_dates = [("questions", "added_at"), ("answers", "submitted_on")]
+
     def create_indexes(self):
         try:
             q = "create index q_id_a_idx on answers (question_identifier)"
@@ -2984,6 +3628,9 @@ class ReleasesDSQuery(DSQuery):
 
 class PullpoQuery(DSQuery):
 
+    watermark_tables = ["pull_requests", "people_uidentities"]
+    watermark_dates = [("pull_requests", "created_at"), ("pull_requests", "updated_at")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         fields = Set([])
@@ -3139,9 +3786,12 @@ class PullpoQuery(DSQuery):
                             filters, evolutionary, type_analysis)
         return q
 
-    def GetTimeToSQL(self, metric_filters, closed_field, metric_name):
+    def GetTimeToSQL(self, metric_filters, closed_field, metric_name, periods = []):
         """ This function returns the query to count "time to" a specific state
             from the moment where the pull request was uploaded to GitHub
+
+            With periods, a list of datetimes, the position of the period
+            of closed_field between them is returned as period.
         """
 
         fields = Set([])
@@ -3149,6 +3799,10 @@ class PullpoQuery(DSQuery):
         filters = Set([])
 
         fields.add("TIMESTAMPDIFF(SECOND, created_at, "+ closed_field  +") as " + metric_name)
+        if len(periods) > 0:
+            # INTERVAL compares integers: dates as YYYYMMDDhhmmss numbers
+            limits = ", ".join([period.strftime('%Y%m%d%H%M%S') for period in periods])
+            fields.add("INTERVAL(" + closed_field + "+0, " + limits + ") as period")
 
         tables.add("pull_requests pr")
         tables.union_update(self.GetSQLReportFrom(metric_filters.type_analysis))
@@ -3160,30 +3814,23 @@ class PullpoQuery(DSQuery):
                                 tables, filters, False)
         return query
 
-    def GetTimeToAgg(self, metric_filters, actionto):
-        """ This function provides final aggregated data based on actionto value
-        """
-
+    @staticmethod
+    def _get_timeto_fields(actionto):
+        # closed_field, metric_name and value for actionto
         if actionto == "closed":
-            closed_field = "closed_at"
-            metric_name = "closedtime"
-            value = "close"
+            return ("closed_at", "closedtime", "close")
         elif actionto == "merged":
-            closed_field = "merged_at"
-            metric_name = "mergedtime"
-            value = "merge"
+            return ("merged_at", "mergedtime", "merge")
         else:
             raise Exception("'actionto' not supported")
 
-        #Building the query
-        timeto_sql = self.GetTimeToSQL(metric_filters, closed_field, metric_name)
-        data = self.ExecuteQuery(timeto_sql)
-
+    @staticmethod
+    def _get_timeto_agg(sketch, value):
         #Calculating specific statistical values
         median = 0.0
         mean = 0.0
-        if isinstance(data[metric_name], list):
-            stats_data = DHESA(data[metric_name])
+        if sketch is not None:
+            stats_data = DHESA(sketch)
             to_days = 3600*24
             median = round(stats_data.data["median"] / to_days, 2)
             mean = round(stats_data.data["mean"] / to_days, 2)
@@ -3194,6 +3841,18 @@ class PullpoQuery(DSQuery):
 
         return agg_data
 
+    def GetTimeToAgg(self, metric_filters, actionto):
+        """ This function provides final aggregated data based on actionto value
+        """
+
+        (closed_field, metric_name, value) = self._get_timeto_fields(actionto)
+
+        #Building the query
+        timeto_sql = self.GetTimeToSQL(metric_filters, closed_field, metric_name)
+        sketch = self.ExecuteQuerySketches(timeto_sql, metric_name).get(())
+
+        return self._get_timeto_agg(sketch, value)
+
 
     def GetTimeToTimeSeriesData(self, metric_filters, actionto):
         """ This function provides final time serie about a final 'actionto' value
@@ -3201,13 +3860,14 @@ class PullpoQuery(DSQuery):
             Pull Requests typically are either merged or closed. This function simply
             allows to avoid repeating the same code for the classes TimeToMerge and
             TimeToClose
+
+            All the periods are read in the same query, with the position of
+            the period of each pull request, and a sketch per period is built.
         """
         #TODO: this function is not exactly a query builder. This should be moved to
         #      some other place to deal with data handler generators.
 
-        fields = Set([])
-        tables = Set([])
-        filters = Set([])
+        (closed_field, metric_name, value) = self._get_timeto_fields(actionto)
 
         data = genDates(metric_filters.period,
                         metric_filters.startdate,
@@ -3219,15 +3879,25 @@ class PullpoQuery(DSQuery):
 
         periods = list(data['unixtime'])
         periods.append(last_date)
+        periods = [datetime.datetime.fromtimestamp(int(p)) for p in periods]
+        if len(periods) < 2: return data
+
+        mfilters = metric_filters.copy()
+        mfilters.startdate = "'" + periods[0].strftime('%Y-%m-%d %H:%M:%S') + "'"
+        mfilters.enddate = "'" + periods[-1].strftime('%Y-%m-%d %H:%M:%S') + "'"
+
+        # Start of each period but the first one
+        limits = periods[1:-1]
+        timeto_sql = self.GetTimeToSQL(mfilters, closed_field, metric_name, limits)
+        if len(limits) > 0:
+            sketches = self.ExecuteQuerySketches(timeto_sql, metric_name, ['period'])
+        else:
+            # Just one period
+            sketches = dict([((0,), sketch) for sketch in
+                             self.ExecuteQuerySketches(timeto_sql, metric_name).values()])
 
-        startdate = "'" + datetime.datetime.fromtimestamp(int(periods[0])).strftime('%Y-%m-%d %H:%M:%S') + "'"
-        for p in periods[1:]:
-            enddate = "'" + datetime.datetime.fromtimestamp(int(p)).strftime('%Y-%m-%d %H:%M:%S') + "'"
-            mfilters = metric_filters.copy()
-            mfilters.startdate = startdate
-            mfilters.enddate = enddate
-
-            data_agg = self.GetTimeToAgg(mfilters, actionto)
+        for pos in range(0, len(periods) - 1):
+            data_agg = self._get_timeto_agg(sketches.get((pos,)), value)
             for metric in data_agg.keys():
                 #data_agg contains a list of metrics between two dates
                 #This inserts in the final data structure those values
@@ -3236,8 +3906,6 @@ class PullpoQuery(DSQuery):
                     data[metric] = []
                 data[metric].append(data_agg[metric])
 
-            startdate = enddate
-
         return data
 
 
@@ -0,0 +1,191 @@
+## Copyright (C) 2015 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+##
+
+""" Profile of the queries executed by the reports """
+
+import logging
+import re
+import sys
+import time
+
+from vizgrimoire.datahandlers.quantile_sketch import QuantileSketch
+
+# Modules executing the queries, not the origin of them
+QUERY_MODULES = ["vizgrimoire.metrics.query_builder", "vizgrimoire.GrimoireSQL",
+                 "vizgrimoire.metrics.query_profile"]
+
+
+def normalize_sql(sql):
+    """ Statement with the literals replaced, to group the executions """
+    sql = re.sub(r"'(?:[^'\\]|\\.|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "N", sql)
+    return " ".join(sql.split())
+
+def count_rows(result):
+    """ Rows in a query result as a dict of columns (or of sketches) """
+    if not isinstance(result, dict) or len(result) == 0: return 0
+    value = result.values()[0]
+    if isinstance(value, QuantileSketch):
+        # QuantileSketch per key (ExecuteQuerySketches)
+        return sum([sketch.count for sketch in result.values()])
+    if isinstance(value, list): return len(value)
+    return 1
+
+def get_origin(frame):
+    """ Metric, study or data source method which executes a query
+
+    Returns (origin, filter), with origin as module.Class.method and the
+    name of the filter of the metric or study, if any.
+    """
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module not in QUERY_MODULES:
+            obj = frame.f_locals.get("self", frame.f_locals.get("cls"))
+            if obj is not None:
+                if not isinstance(obj, type): obj_class = type(obj)
+                else: obj_class = obj
+                origin = "%s.%s.%s" % (obj_class.__module__.split(".")[-1],
+                                       obj_class.__name__, frame.f_code.co_name)
+                filter_ = None
+                filters = getattr(obj, "filters", None)
+                type_analysis = getattr(filters, "type_analysis", None)
+                if type_analysis: filter_ = type_analysis[0]
+                return (origin, filter_)
+            if module != "__main__" or frame.f_back is None:
+                return ("%s.%s" % (module.split(".")[-1], frame.f_code.co_name), None)
+        frame = frame.f_back
+    return (None, None)
+
+
+class QueryProfile(object):
+    """ Time, rows and origin of the executed statements
+
+    Executions are grouped by statement, with the literals removed, so the
+    same query for different items or dates is aggregated. Statements
+    slower than slow_time seconds are logged, and their EXPLAIN is kept
+    (for the slowest execution) if explain is True.
+    """
+
+    def __init__(self, slow_time = None, explain = True):
+        self.slow_time = slow_time
+        self.explain = explain
+        self.statements = {}
+
+    def execute(self, sql, run, connection = None):
+        """ Return run(), which executes sql, recording its execution """
+        start = time.time()
+        result = run()
+        elapsed = time.time() - start
+        stats = self.record(sql, elapsed, count_rows(result), *get_origin(sys._getframe(1)))
+
+        if self.slow_time is not None and elapsed >= self.slow_time:
+            logging.warning("Slow query (%.2f s): %s" % (elapsed, " ".join(sql.split())[0:500]))
+            if self.explain and connection is not None and elapsed >= stats["max_time"]:
+                stats["explain"] = self.get_explain(sql, connection)
+        return result
+
+    def record(self, sql, elapsed, rows, origin = None, filter_ = None):
+        key = normalize_sql(sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = {"count": 0, "time": 0.0, "max_time": 0.0, "rows": 0,
+                     "origins": {}, "sql": sql, "explain": None}
+            self.statements[key] = stats
+        stats["count"] += 1
+        stats["time"] += elapsed
+        stats["rows"] += rows
+        if elapsed >= stats["max_time"]:
+            stats["max_time"] = elapsed
+            stats["sql"] = sql
+        if origin is not None:
+            if filter_ is not None: origin += " [" + filter_ + "]"
+            stats["origins"][origin] = stats["origins"].get(origin, 0) + 1
+        return stats
+
+    @staticmethod
+    def get_explain(sql, connection):
+        """ Rows of the EXPLAIN of a SELECT statement, None for other ones """
+        if not re.match("\s*\(?\s*SELECT\s", sql, re.IGNORECASE): return None
+        prefix = getattr(connection, "explain_prefix", "EXPLAIN ")
+        cursor = connection.cursor()
+        try:
+            cursor.execute(prefix + sql)
+            return [tuple(row) for row in cursor.fetchall()]
+        except Exception, e:
+            logging.info("Can not get the EXPLAIN of a query: " + str(e))
+            return None
+        finally:
+            cursor.close()
+
+    def pop_stats(self):
+        """ Return the statements recorded and start a new profile """
+        statements = self.statements
+        self.statements = {}
+        return statements
+
+    def merge(self, statements):
+        """ Add the statements recorded in other profile (i.e. other process) """
+        for (key, other) in statements.items():
+            stats = self.statements.get(key)
+            if stats is None:
+                self.statements[key] = other
+                continue
+            stats["count"] += other["count"]
+            stats["time"] += other["time"]
+            stats["rows"] += other["rows"]
+            if other["max_time"] >= stats["max_time"]:
+                stats["max_time"] = other["max_time"]
+                stats["sql"] = other["sql"]
+                if other["explain"] is not None: stats["explain"] = other["explain"]
+            for (origin, count) in other["origins"].items():
+                stats["origins"][origin] = stats["origins"].get(origin, 0) + count
+
+    def report(self, top = 20):
+        """ Text with the top statements by total time and by executions """
+        statements = self.statements.values()
+        lines = ["Queries: %i executions of %i statements in %.2f s" %
+                 (sum([stats["count"] for stats in statements]), len(statements),
+                  sum([stats["time"] for stats in statements]))]
+        for (title, field) in [("total time", "time"), ("executions", "count")]:
+            lines += ["", "== Top statements by " + title + " ==", ""]
+            statements.sort(key = lambda stats: stats[field], reverse = True)
+            for stats in statements[0:top]:
+                lines.append("%.3f s total, %i executions, %.3f s mean, %.3f s max, %i rows" %
+                             (stats["time"], stats["count"], stats["time"] / stats["count"],
+                              stats["max_time"], stats["rows"]))
+                origins = sorted(stats["origins"].items(), key = lambda item: -item[1])
+                if origins:
+                    lines.append("  from: " + ", ".join(["%s (%i)" % origin
+                                                         for origin in origins[0:5]]))
+                lines.append("  " + " ".join(stats["sql"].split()))
+                if stats["explain"]:
+                    lines.append("  explain:")
+                    lines += ["    " + str(row) for row in stats["explain"]]
+                lines.append("")
+        return "\n".join(lines)
+
+    def write(self, profile_file, top = 20):
+        profile = open(profile_file, "w")
+        profile.write(self.report(top) + "\n")
+        profile.close()
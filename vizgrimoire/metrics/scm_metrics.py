@@ -107,7 +107,7 @@ class Commits(Metrics):
                 "show_markers" : "true" }
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -121,10 +121,7 @@ class Commits(Metrics):
         filters.add("s.id = nomergers.id")
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        query = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                                   self.filters.enddate, " s.author_date ", fields,
-                                   tables, filters, evolutionary, self.filters.type_analysis)
-        return query
+        return (" s.author_date ", fields, tables, filters)
 
 
 class NewAuthors(Metrics):
@@ -294,7 +291,7 @@ class Authors(Metrics):
     action = "commits"
     data_source = SCM
 
-    def _get_sql (self, evolutionary):
+    def _get_sql_parts(self):
         # This function contains basic parts of the query to count authors
         # That query is later built and executed
         fields = Set([])
@@ -314,10 +311,7 @@ class Authors(Metrics):
         tables.add("people_uidentities pup")
         filters.add("s.author_id = pup.people_id")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
     def get_list (self, metric_filters = None, days = 0):
@@ -433,7 +427,7 @@ class Committers(Metrics):
     action = "commits"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # This function contains basic parts of the query to count committers
 
         fields = Set([])
@@ -460,11 +454,7 @@ class Committers(Metrics):
                 tables.add("people_uidentities pup")
                 filters.add("s.committer_id = pup.people_id")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
 class Files(Metrics):
@@ -475,7 +465,7 @@ class Files(Metrics):
     desc = "Number of files 'touched' (added, modified, removed, ) by at least one commit"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -490,10 +480,7 @@ class Files(Metrics):
         # (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
 class Lines(Metrics):
@@ -504,7 +491,7 @@ class Lines(Metrics):
     desc = "Number of added and/or removed lines"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # This function contains basic parts of the query to count added and removed lines
         fields = Set([])
         tables = Set([])
@@ -523,16 +510,10 @@ class Lines(Metrics):
         #TODO: left "author" as generic option coming from parameters (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
-    def get_ts(self):
+    def _complete_ts(self, data):
         #Specific needs for Added and Removed lines not considered in meta class Metrics
-        query = self._get_sql(True)
-        data = self.db.ExecuteQuery(query)
-
         if not (isinstance(data['removed_lines'], list)): data['removed_lines'] = [data['removed_lines']]
         if not (isinstance(data['added_lines'], list)): data['added_lines'] = [data['added_lines']]
 
@@ -584,7 +565,7 @@ class AddedLines(Metrics):
     desc = "Number of added lines"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # This function contains basic parts of the query to count added and removed lines
         fields = Set([])
         tables = Set([])
@@ -599,10 +580,7 @@ class AddedLines(Metrics):
         #TODO: left "author" as generic option coming from parameters (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 class RemovedLines(Metrics):
     """ Added and Removed lines for source code management system """
@@ -612,7 +590,7 @@ class RemovedLines(Metrics):
     desc = "Number of removed lines"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # This function contains basic parts of the query to count added and removed lines
         fields = Set([])
         tables = Set([])
@@ -627,10 +605,7 @@ class RemovedLines(Metrics):
         #TODO: left "author" as generic option coming from parameters (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 class Branches(Metrics):
     """ Branches metric class for source code management system """
@@ -640,7 +615,7 @@ class Branches(Metrics):
     desc = "Number of active branches"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating branches
         fields = Set([])
         tables = Set([])
@@ -656,10 +631,7 @@ class Branches(Metrics):
         #TODO: left "author" as generic option coming from parameters (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
 class Actions(Metrics):
@@ -670,7 +642,7 @@ class Actions(Metrics):
     desc = "Actions performed on several files (add, remove, copy, ... each file)"
     data_source = SCM
 
-    def _get_sql (self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating actions
         fields = Set([])
         tables = Set([])
@@ -684,10 +656,7 @@ class Actions(Metrics):
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
 class CommitsPeriod(Metrics):
@@ -698,7 +667,7 @@ class CommitsPeriod(Metrics):
     desc = "Average number of commits per period"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating commits per period
         fields = Set([])
         tables = Set([])
@@ -712,10 +681,7 @@ class CommitsPeriod(Metrics):
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
     def get_ts(self):
         # WARNING: This function should provide same information as Commits.get_ts(), do not use this.
@@ -730,7 +696,7 @@ class FilesPeriod(Metrics):
     desc = "Average number of files per period"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating commits per period
         fields = Set([])
         tables = Set([])
@@ -739,15 +705,12 @@ class FilesPeriod(Metrics):
         fields.add("count(distinct(a.file_id))/timestampdiff("+self.filters.period+",min(s.author_date),max(s.author_date)) as avg_files_"+self.filters.period)
         tables.add("scmlog s")
         tables.add("actions a")
-        filters.add("s.id = a.commit_id")
+        filters.add("a.commit_id = s.id")
 
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
     def get_ts(self):
         # WARNING: This function should provide same information as Files.get_ts(), do not use this.
@@ -762,7 +725,7 @@ class CommitsAuthor(Metrics):
     desc = "Average number of commits per author"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating commits per author
         fields = Set([])
         tables = Set([])
@@ -783,10 +746,7 @@ class CommitsAuthor(Metrics):
         tables.add("people_uidentities pup")
         filters.add("s.author_id = pup.people_id")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
 class AuthorsPeriod(Metrics):
@@ -797,7 +757,7 @@ class AuthorsPeriod(Metrics):
     desc = "Average number of authors per period"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating commits per period
         fields = Set([])
         tables = Set([])
@@ -817,10 +777,7 @@ class AuthorsPeriod(Metrics):
         tables.add("people_uidentities pup")
         filters.add("s.author_id = pup.people_id")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 
     def get_ts(self):
@@ -887,7 +844,7 @@ class FilesAuthor(Metrics):
     desc = "Average number of files per author"
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         # Basic parts of the query needed when calculating files per author
         fields = Set([])
         tables = Set([])
@@ -896,7 +853,7 @@ class FilesAuthor(Metrics):
         fields.add("count(distinct(a.file_id))/count(distinct(pup.uuid)) as avg_files_author")
         tables.add("scmlog s")
         tables.add("actions a")
-        filters.add("s.id = a.commit_id")
+        filters.add("a.commit_id = s.id")
 
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
 
@@ -908,10 +865,7 @@ class FilesAuthor(Metrics):
         tables.add("people_uidentities pup")
         filters.add("s.author_id = pup.people_id")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
 class Repositories(Metrics):
     """ Number of repositories in the source code management system """
@@ -923,7 +877,7 @@ class Repositories(Metrics):
     envision = {"gtype" : "whiskers"}
     data_source = SCM
 
-    def _get_sql(self, evolutionary):
+    def _get_sql_parts(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -936,11 +890,8 @@ class Repositories(Metrics):
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         #TODO: left "author" as generic option coming from parameters (this should be specified by command line)
         filters.union_update(self.db.GetSQLReportWhere(self.filters, "author"))
-        filters.add("s.id = a.commit_id")
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evolutionary, self.filters.type_analysis)
-        return q
+        filters.add("a.commit_id = s.id")
+        return (" s.author_date ", fields, tables, filters)
 
     def get_list(self):
         """Repositories list ordered by number of commits"""
@@ -965,7 +916,7 @@ class Companies(Metrics):
     desc = "Organizations participating in the source code management system"
     data_source = SCM
 
-    def _get_sql(self, evol):
+    def _get_sql_parts(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -978,10 +929,7 @@ class Companies(Metrics):
         filters.add("pup.uuid = enr.uuid")
         filters.add("s.author_date >= enr.start")
         filters.add("s.author_date < enr.end")
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evol, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
     def get_list(self, metric_filters = None, days = 0):
         #TODO: metric_filters parameter is deprecated and should be removed
@@ -1037,7 +985,7 @@ class Countries(Metrics):
     desc = "Countries participating in the source code management system"
     data_source = SCM
 
-    def _get_sql(self, evol):
+    def _get_sql_parts(self):
         fields = Set([])
         tables = Set([])
         filters = Set([])
@@ -1049,10 +997,7 @@ class Countries(Metrics):
         filters.add("s.author_id = pup.people_id")
         filters.add("pup.uuid = pro.uuid")
 
-        q = self.db.BuildQuery(self.filters.period, self.filters.startdate,
-                               self.filters.enddate, " s.author_date ", fields,
-                               tables, filters, evol, self.filters.type_analysis)
-        return q
+        return (" s.author_date ", fields, tables, filters)
 
     def get_list(self):
         rol = "author" #committer
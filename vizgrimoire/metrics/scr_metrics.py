@@ -29,7 +29,7 @@ import logging
 import MySQLdb
 import numpy
 
-from vizgrimoire.GrimoireUtils import completePeriodIds, checkListArray, medianAndAvgByPeriod, check_array_values
+from vizgrimoire.GrimoireUtils import completePeriodIds, checkListArray, check_array_values
 from vizgrimoire.metrics.query_builder import DSQuery
 
 from vizgrimoire.metrics.metrics import Metrics
@@ -175,47 +175,33 @@ class BMISCR(Metrics):
     name = "BMI SCR"
     desc = "Efficiency reviewing: (merged+abandoned reviews)/(submitted reviews)"
     data_source = SCR
+    depends_on = ["abandoned", "merged", "submitted"]
 
     def get_ts(self):
-        abandoned_reviews = Abandoned(self.db, self.filters)
-        merged_reviews = Merged(self.db, self.filters)
-        submitted_reviews = Submitted(self.db, self.filters)
-
-        abandoned = abandoned_reviews.get_ts()
-        abandoned = completePeriodIds(abandoned, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
-        # casting the type of the variable in order to use numpy
-        # faster way to deal with datasets...
-        abandoned_array = numpy.array(abandoned["abandoned"])
+        abandoned = self._get_dependency(Abandoned, True)
+        merged = self._get_dependency(Merged, True)
+        submitted = self._get_dependency(Submitted, True)
 
-        merged = merged_reviews.get_ts()
-        merged = completePeriodIds(merged, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
+        # The time series have the same complete periods. Casting the type
+        # of the variable in order to use numpy: faster way to deal with datasets
+        abandoned_array = numpy.array(abandoned["abandoned"])
         merged_array = numpy.array(merged["merged"])
-
-        submitted = submitted_reviews.get_ts()
-        submitted = completePeriodIds(submitted, self.filters.period, self.filters.startdate,
-                                      self.filters.enddate)
         submitted_array = numpy.array(submitted["submitted"])
 
         bmi_array = (abandoned_array.astype(float) + merged_array.astype(float)) / submitted_array.astype(float)
 
-        bmi = abandoned
-        bmi.pop("abandoned")
+        bmi = dict([(key, value) for (key, value) in abandoned.items()
+                    if key != "abandoned"])
         bmi["bmiscr"] = list(bmi_array)
 
         return bmi
 
     def get_agg(self):
-        abandoned_reviews = Abandoned(self.db, self.filters)
-        merged_reviews = Merged(self.db, self.filters)
-        submitted_reviews = Submitted(self.db, self.filters)
-
-        abandoned = abandoned_reviews.get_agg()
+        abandoned = self._get_dependency(Abandoned, False)
         abandoned_data = abandoned["abandoned"]
-        merged = merged_reviews.get_agg()
+        merged = self._get_dependency(Merged, False)
         merged_data = merged["merged"]
-        submitted = submitted_reviews.get_agg()
+        submitted = self._get_dependency(Submitted, False)
         submitted_data = submitted["submitted"]
 
         if submitted_data == 0:
@@ -234,6 +220,7 @@ class Pending(Metrics):
     name = "Pending reviews"
     desc = "Number of pending review processes"
     data_source = SCR
+    depends_on = ["submitted", "merged", "abandoned"]
 
     def _get_metrics_for_pending(self):
         # We need to fix the same filter for all metrics
@@ -328,30 +315,27 @@ class Pending(Metrics):
         return pending
 
     def get_agg(self):
-        metrics = self._get_metrics_for_pending()
-        submitted = metrics['submitted'].get_agg()
-        merged = metrics['merged'].get_agg()
-        abandoned = metrics['abandoned'].get_agg()
-
         # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_agg_all()
         else:
+            submitted = self._get_dependency(Submitted, False)
+            merged = self._get_dependency(Merged, False)
+            abandoned = self._get_dependency(Abandoned, False)
             pending = submitted['submitted']-merged['merged']-abandoned['abandoned']
             pending = {"pending":pending}
         return pending
 
     def get_ts(self):
-        metrics = self._get_metrics_for_pending()
-        submitted = metrics["submitted"].get_ts()
-        merged = metrics["merged"].get_ts()
-        abandoned = metrics["abandoned"].get_ts()
-        evol = dict(submitted.items() + merged.items() + abandoned.items())
         pending = {"pending":[]}
             # GROUP BY queries
         if self.filters.type_analysis is not None and self.filters.type_analysis[1] is None:
             pending = self.get_ts_all()
         else:
+            submitted = self._get_dependency(Submitted, True)
+            merged = self._get_dependency(Merged, True)
+            abandoned = self._get_dependency(Abandoned, True)
+            evol = dict(submitted.items() + merged.items() + abandoned.items())
             for i in range(0, len(evol['submitted'])):
                 pending_val = evol["submitted"][i] - evol["merged"][i] - evol["abandoned"][i]
                 pending["pending"].append(pending_val)
@@ -807,126 +791,180 @@ class ReviewsWaitingForReviewerTS(Metrics):
         # We need the last day of the month
         import calendar
         last_day = calendar.monthrange(year, month)[1]
-        current = str(year)+"-"+str(month)+"-"+str(last_day)
-        return (current)
+        return datetime(year, month, last_day)
 
-    def _get_pending(self, month, reviewers = False):
+    def _get_reviews(self, id_field = None):
+        """ Return the submission date and the items of each review """
         startdate = self.filters.startdate
         enddate = self.filters.enddate
-        identities_db = self.db.identities_db
-        type_analysis =  self.filters.type_analysis
-
-        current = self._get_date_from_month(month)
 
-        sql_max_patchset = self.db.get_sql_max_patchset_for_reviews (current)
-        sql_reviews_reviewed = self.db.get_sql_reviews_reviewed(self.filters.startdate, current)
-        sql_reviews_closed = self.db.get_sql_reviews_closed(self.filters.startdate, current)
-
-        fields = Set([])
-
-
-        fields.add("COUNT(DISTINCT(i.id)) as pending")
-        fields = self.db._get_fields_query(fields)
+        fields = "i.id as issue_id, i.submitted_on as submitted_on"
+        all_items = self.db.get_all_items(self.filters.type_analysis)
+        if all_items is not None:
+            fields = self.db.get_group_field(all_items) + ", " + fields
 
         tables = Set([])
         tables.add("issues i")
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         tables = self.db._get_tables_query(tables)
 
-        # Pending (NEW = submitted-merged-abandoned) REVIEWS
         filters = Set([])
-        filters.add(" i.submitted_on <= '"+current+"'")
         filters.union_update(self.db.GetSQLReportWhere(self.filters,"issues"))
-        # remove closed reviews
-        filters.add("i.id NOT IN ("+ sql_reviews_closed +")")
-
-        if reviewers:
-            filters.add("i.id NOT IN (%s)" % (sql_reviews_reviewed))
-
         filters = self.db._get_filters_query(filters)
 
-        all_items = self.db.get_all_items(self.filters.type_analysis)
-
         q = self.db.GetSQLGlobal('i.submitted_on', fields, tables, filters,
-                                 startdate, enddate, all_items)
-
+                                 startdate, enddate)
         rs = self.db.ExecuteQuery(q)
-        if all_items is not None:
-            checkListArray(rs)
-        else:
-            rs = rs['pending']
-        return rs
-
-
-    def _get_ts_all(self):
+        checkListArray(rs)
+
+        reviews = {}
+        for i in range(0, len(rs['issue_id'])):
+            issue_id = rs['issue_id'][i]
+            if issue_id not in reviews:
+                reviews[issue_id] = [rs['submitted_on'][i], Set([])]
+            if id_field is not None:
+                reviews[issue_id][1].add(rs[id_field][i])
+        return reviews
+
+    def _get_reviews_changes(self, reviews):
+        """Return the changes in the pending state of the reviews
+
+        A review is pending from its submission until it is merged or
+        abandoned, and it is waiting for reviewer while its last patchset
+        has no negative review. The changes are returned as a list of
+        (date, issue_id, pending, pending for reviewer) sorted by date,
+        with +1 or -1 for the pending counters.
+        """
         startdate = self.filters.startdate
         enddate = self.filters.enddate
-        period = self.filters.period
-        start = datetime.strptime(startdate, "'%Y-%m-%d'")
-        end = datetime.strptime(enddate, "'%Y-%m-%d'")
 
-        if (period != "month"):
-            logging.error("Period not supported in " + self.id  + " " + period)
-            return {}
+        closed = {}
+        rs = self.db.ExecuteQuery(self.db.get_sql_reviews_closed_dates(startdate, enddate))
+        checkListArray(rs)
+        for i in range(0, len(rs['issue_id'])):
+            closed[rs['issue_id'][i]] = rs['closed_on'][i]
+
+        rejected = {}
+        rs = self.db.ExecuteQuery(self.db.get_sql_reviews_rejected_patchsets(startdate, enddate))
+        checkListArray(rs)
+        for i in range(0, len(rs['issue_id'])):
+            rejected.setdefault(rs['issue_id'][i], Set([])).add(rs['patchset'][i])
+
+        # (date, last patchset) each time the last patchset of a review grows
+        last_patchsets = {}
+        rs = self.db.ExecuteQuery(self.db.get_sql_reviews_patchsets(startdate, enddate))
+        checkListArray(rs)
+        for i in range(0, len(rs['issue_id'])):
+            if rs['changed_on'][i] is None: continue
+            steps = last_patchsets.setdefault(rs['issue_id'][i], [])
+            if len(steps) == 0 or rs['patchset'][i] > steps[-1][1]:
+                steps.append((rs['changed_on'][i], rs['patchset'][i]))
+
+        changes = []
+        for issue_id in reviews:
+            submitted_on = reviews[issue_id][0]
+            if submitted_on is None: continue
+            closed_on = closed.get(issue_id)
+            steps = last_patchsets.get(issue_id, [])
+            issue_rejected = rejected.get(issue_id, Set([]))
+
+            dates = Set([submitted_on])
+            if closed_on is not None: dates.add(closed_on)
+            dates.union_update([step[0] for step in steps])
+
+            pending, pending_reviewer = 0, 0
+            last_patchset = None
+            step = 0
+            for date in sorted(dates):
+                while step < len(steps) and steps[step][0] <= date:
+                    last_patchset = steps[step][1]
+                    step += 1
+                now_pending = 0
+                if submitted_on <= date and (closed_on is None or closed_on > date):
+                    now_pending = 1
+                now_pending_reviewer = now_pending
+                if last_patchset is not None and last_patchset in issue_rejected:
+                    now_pending_reviewer = 0
+                if now_pending != pending or now_pending_reviewer != pending_reviewer:
+                    changes.append((date, issue_id, now_pending - pending,
+                                    now_pending_reviewer - pending_reviewer))
+                    pending, pending_reviewer = now_pending, now_pending_reviewer
+        changes.sort()
+        return changes
+
+    def _get_ts_months(self):
+        """ Return the ids of all the months in the period, None if not supported """
+        start = datetime.strptime(self.filters.startdate, "'%Y-%m-%d'")
+        end = datetime.strptime(self.filters.enddate, "'%Y-%m-%d'")
+
+        if (self.filters.period != "month"):
+            logging.error("Period not supported in " + self.id  + " " + self.filters.period)
+            return None
 
         start_month = start.year*12 + start.month
         end_month = end.year*12 + end.month
-        months = end_month - start_month
+        return range(start_month, end_month+1)
+
+    def _get_pending_ts(self, months, id_field = None):
+        """Return the reviews pending and pending for reviewer at the end of each month
+
+        All the changes in the state of the reviews are swept once in date
+        order, taking the counters at the last day of each month. With
+        id_field the counters are also computed for each item.
+        """
+        reviews = self._get_reviews(id_field)
+        changes = self._get_reviews_changes(reviews)
+
+        pending_ts, pending_reviewer_ts = [], []
+        items_pending = {}
+        items_pending_ts = {}
+        pending, pending_reviewer = 0, 0
+        change = 0
+        for i in range(0, len(months)):
+            current = self._get_date_from_month(months[i])
+            while change < len(changes) and changes[change][0] <= current:
+                (date, issue_id, pending_inc, pending_reviewer_inc) = changes[change]
+                pending += pending_inc
+                pending_reviewer += pending_reviewer_inc
+                for item in reviews[issue_id][1]:
+                    if item not in items_pending:
+                        items_pending[item] = [0, 0]
+                        items_pending_ts[item] = [[0] * len(months), [0] * len(months)]
+                    items_pending[item][0] += pending_inc
+                    items_pending[item][1] += pending_reviewer_inc
+                change += 1
+            pending_ts.append(pending)
+            pending_reviewer_ts.append(pending_reviewer)
+            for item in items_pending:
+                items_pending_ts[item][0][i] = items_pending[item][0]
+                items_pending_ts[item][1][i] = items_pending[item][1]
+
+        return pending_ts, pending_reviewer_ts, items_pending_ts
+
+    def _get_ts_all(self):
+        months = self._get_ts_months()
+        if months is None: return {}
 
         # First, we need to group by the filter field the data
         all_items = self.db.get_all_items(self.filters.type_analysis)
-        group_field = self.db.get_group_field(all_items)
-        id_field = group_field.split('.')[1] # remove table name
-
-        # First we get all the data from db
-        pending_data = {'month':[],'pending':[],id_field:[]}
-        pending_reviewers_data = {'month':[],'pending':[],id_field:[]}
-        for i in range(0, months+1):
-            # total pending this month
-            pending_month = self._get_pending(start_month+i)
-            pending_data['month'].append(start_month+i)
-            pending_data[id_field].append(pending_month[id_field])
-            pending_data['pending'].append(pending_month['pending'])
-            # total pending waiting for reviewers this month
-            pending_reviewers_month = self._get_pending(start_month+i, True)
-            pending_reviewers_data['month'].append(start_month+i)
-            pending_reviewers_data[id_field].append(pending_reviewers_month[id_field])
-            pending_reviewers_data['pending'].append(pending_reviewers_month['pending'])
-        # print pending_review_data
-        # Get the complete list of items
-        all_items = []
-        for data in pending_data[id_field]:
-            all_items = list(Set(all_items+data))
+        id_field = self.db.get_group_field_alias(all_items)
+
+        items_pending_ts = self._get_pending_ts(months, id_field)[2]
+
+        # Only the items with pending reviews in some month
+        all_items = [item for item in items_pending_ts
+                     if max(items_pending_ts[item][0]) > 0]
         # Build the final dict with format [[months],[itens],[[item1_ts],...]
         pending = {"month":[]}
-        pending['month'] = pending_data['month']
+        pending['month'] = months
         pending = completePeriodIds(pending, self.filters.period,
                                     self.filters.startdate, self.filters.enddate)
         pending["ReviewsWaiting_ts"] = []
         pending["ReviewsWaitingForReviewer_ts"] = []
         pending[id_field] = all_items
-        # For each item build the tme series and append it
         for item in all_items:
-            item_ts = []
-            for i in range(0, months+1):
-                if len(pending_data[id_field])>0 and \
-                   item in pending_data[id_field][i]:
-                    pos = pending_data[id_field][i].index(item)
-                    item_ts.append(pending_data['pending'][i][pos])
-                else:
-                    # No pendings reviews for this item
-                    item_ts.append(0)
-            pending['ReviewsWaiting_ts'].append(item_ts)
-            item_reviewers_ts = []
-            for i in range(0, months+1):
-                if len(pending_reviewers_data[id_field])>0 and \
-                   item in pending_reviewers_data[id_field][i]:
-                    pos = pending_reviewers_data[id_field][i].index(item)
-                    item_reviewers_ts.append(pending_reviewers_data['pending'][i][pos])
-                else:
-                    # No pendings reviews for this item
-                    item_reviewers_ts.append(0)
-            pending['ReviewsWaitingForReviewer_ts'].append(item_reviewers_ts)
+            pending['ReviewsWaiting_ts'].append(items_pending_ts[item][0])
+            pending['ReviewsWaitingForReviewer_ts'].append(items_pending_ts[item][1])
         return pending
 
     def get_ts(self):
@@ -935,30 +973,14 @@ class ReviewsWaitingForReviewerTS(Metrics):
             # Support for GROUP BY queries
             return self._get_ts_all()
 
-        pending = {"month":[],
-                   "ReviewsWaiting_ts":[],
-                   "ReviewsWaitingForReviewer_ts":[]}
-
-        startdate = self.filters.startdate
-        enddate = self.filters.enddate
-        period = self.filters.period
-        start = datetime.strptime(startdate, "'%Y-%m-%d'")
-        end = datetime.strptime(enddate, "'%Y-%m-%d'")
-
-        if (period != "month"):
-            logging.error("Period not supported in " + self.id  + " " + period)
-            return {}
+        months = self._get_ts_months()
+        if months is None: return {}
 
-        start_month = start.year*12 + start.month
-        end_month = end.year*12 + end.month
-        months = end_month - start_month
+        pending_ts, pending_reviewer_ts = self._get_pending_ts(months)[0:2]
 
-        for i in range(0, months+1):
-            pending['month'].append(start_month+i)
-            pending_month = self._get_pending(start_month+i)
-            pending_reviewers_month = self._get_pending(start_month+i, True)
-            pending['ReviewsWaiting_ts'].append(pending_month)
-            pending['ReviewsWaitingForReviewer_ts'].append(pending_reviewers_month)
+        pending = {"month":months,
+                   "ReviewsWaiting_ts":pending_ts,
+                   "ReviewsWaitingForReviewer_ts":pending_reviewer_ts}
 
         return pending
 
@@ -1650,101 +1672,88 @@ class TimeToReview(Metrics):
         q = self.db.GetTimeToReviewQuerySQL (self.filters, bots)
         return q
 
-    def _get_agg_all(self, data):
-        from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
-
+    def _get_sketches(self, key_fields):
+        """ QuantileSketch of the review times for each value of key_fields """
+        q = self._get_sql()
+        if q is None: return None
+        if 'month' in key_fields:
+            q = "SELECT t.*, YEAR(t.changed_on)*12+MONTH(t.changed_on) AS month " + \
+                "FROM (" + q + ") t"
+        return self.db.ExecuteQuerySketches(q, 'revtime', key_fields)
+
+    def _get_median_avg(self, sketch):
+        if sketch is None or sketch.count == 0:
+            return (float("nan"), float("nan"))
+        return (float(sketch.median()), float(sketch.mean()))
+
+    def _get_agg_all(self):
         data_all = {}
 
         # First, we need to group by the filter field the data
         all_items = self.db.get_all_items(self.filters.type_analysis)
         id_field = self.db.get_group_field_alias(all_items)
 
-        items =  list(Set(data[id_field]))
+        sketches = self._get_sketches([id_field])
+        if sketches is None: return {}
+
+        items = [key[0] for key in sketches]
         data_all[id_field] = items
         for id in ["review_time_days_median", "review_time_days_avg"]:
             data_all[id] = []
 
         for item in items:
-            # First, extract the data for the item
-            data_item = {"changed_on":[],"revtime":[]}
-            for i in range(0,len(data[id_field])):
-                if data[id_field][i] == item:
-                    data_item["changed_on"].append(data["changed_on"][i])
-                    data_item["revtime"].append(data["revtime"][i])
-            data_revtime = data_item['revtime']
-            if (isinstance(data, list) == False): data_revtime = [data_revtime]
-            # ttr_median = sorted(data)[len(data)//2]
-            if (len(data_revtime) == 0):
-                ttr_median = float("nan")
-                ttr_avg = float("nan")
-            else:
-                ttr_median = float(median(removeDecimals(data_revtime)))
-                ttr_avg = float(average(removeDecimals(data_revtime)))
+            (ttr_median, ttr_avg) = self._get_median_avg(sketches[(item,)])
             data_all["review_time_days_median"].append(ttr_median)
             data_all["review_time_days_avg"].append(ttr_avg)
         return data_all
 
     def get_agg(self):
-        from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
-
-        q = self._get_sql()
-        if q is None: return {}
-        data = self.db.ExecuteQuery(q)
-
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # Support for GROUP BY queries
-            return self._get_agg_all(data)
-
-        data = data['revtime']
-        if (isinstance(data, list) == False): data = [data]
-        # ttr_median = sorted(data)[len(data)//2]
-        if (len(data) == 0):
-            ttr_median = float("nan")
-            ttr_avg = float("nan")
-        else:
-            ttr_median = float(median(removeDecimals(data)))
-            ttr_avg = float(average(removeDecimals(data)))
+            return self._get_agg_all()
+
+        sketches = self._get_sketches([])
+        if sketches is None: return {}
+
+        (ttr_median, ttr_avg) = self._get_median_avg(sketches.get(()))
         return {"review_time_days_median":ttr_median, "review_time_days_avg":ttr_avg}
 
-    def _get_ts_all(self, data):
-        from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
+    def _get_ts_metrics(self, sketches):
+        # Time series from the sketches of each month
+        metrics_list = {'month':[],
+                        'review_time_days_median':[],
+                        'review_time_days_avg':[]}
+        for month in sorted(sketches):
+            (ttr_median, ttr_avg) = self._get_median_avg(sketches[month])
+            metrics_list['month'].append(month)
+            metrics_list['review_time_days_median'].append(ttr_median)
+            metrics_list['review_time_days_avg'].append(ttr_avg)
+
+        return completePeriodIds(metrics_list, self.filters.period,
+                                 self.filters.startdate, self.filters.enddate)
 
+    def _get_ts_all(self):
         data_all = {}
 
         # First, we need to group by the filter field the data
         all_items = self.db.get_all_items(self.filters.type_analysis)
         id_field = self.db.get_group_field_alias(all_items)
 
-        items =  list(Set(data[id_field]))
+        sketches = self._get_sketches([id_field, 'month'])
+        if sketches is None: return {}
+
+        # Sketches of each month for each item
+        items_sketches = {}
+        for (item, month) in sketches:
+            items_sketches.setdefault(item, {})[month] = sketches[(item, month)]
+
+        items = items_sketches.keys()
         data_all[id_field] = items
         for id in ["review_time_days_median", "review_time_days_avg"]:
             data_all[id] = []
 
         for item in items:
-            # First, extract the data for the item
-            data_item = {"changed_on":[],"revtime":[]}
-            for i in range(0,len(data[id_field])):
-                if data[id_field][i] == item:
-                    data_item["changed_on"].append(data["changed_on"][i])
-                    data_item["revtime"].append(data["revtime"][i])
-
-            med_avg_list = medianAndAvgByPeriod(self.filters.period,
-                                                data_item['changed_on'], data_item['revtime'])
-            metrics_list = {}
-            if (med_avg_list != None):
-                metrics_list['review_time_days_median'] = med_avg_list['median']
-                metrics_list['review_time_days_avg'] = med_avg_list['avg']
-                metrics_list['month'] = med_avg_list['month']
-            else:
-                metrics_list['review_time_days_median'] = []
-                metrics_list['review_time_days_avg'] = []
-                metrics_list['month'] = []
-
-            metrics_list = completePeriodIds(metrics_list, self.filters.period,
-                                             self.filters.startdate, self.filters.enddate)
+            metrics_list = self._get_ts_metrics(items_sketches[item])
 
             data_all['review_time_days_median'].append(metrics_list['review_time_days_median'])
             data_all['review_time_days_avg'].append(metrics_list['review_time_days_avg'])
@@ -1755,30 +1764,14 @@ class TimeToReview(Metrics):
         return data_all
 
     def get_ts(self):
-        q = self._get_sql()
-        if q is None: return {}
-        review_list = self.db.ExecuteQuery(q)
-        checkListArray(review_list)
-
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # Support for GROUP BY queries
-            return self._get_ts_all(review_list)
-
-        metrics_list = {}
-        med_avg_list = medianAndAvgByPeriod(self.filters.period, review_list['changed_on'], review_list['revtime'])
-        if (med_avg_list != None):
-            metrics_list['review_time_days_median'] = med_avg_list['median']
-            metrics_list['review_time_days_avg'] = med_avg_list['avg']
-            metrics_list['month'] = med_avg_list['month']
-        else:
-            metrics_list['review_time_days_median'] = []
-            metrics_list['review_time_days_avg'] = []
-            metrics_list['month'] = []
+            return self._get_ts_all()
 
-        metrics_list = completePeriodIds(metrics_list, self.filters.period,
-                          self.filters.startdate, self.filters.enddate)
+        sketches = self._get_sketches(['month'])
+        if sketches is None: return {}
 
-        return metrics_list
+        return self._get_ts_metrics(dict([(key[0], sketches[key]) for key in sketches]))
 
 
 class TimeToReviewPatch(Metrics):
@@ -0,0 +1,180 @@
+## Copyright (C) 2015 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+##
+
+""" Registry of the metrics and studies classes available """
+
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import zipfile
+
+MANIFEST_VERSION = 1
+
+
+def list_modules(package, suffix):
+    """ Modules of a package, installed in an egg or not, with their signature
+
+    Returns a list of (module name, signature). The signature changes when
+    the module file is changed.
+    """
+    __import__(package)
+    pfile = inspect.getfile(sys.modules[package])
+    pkg_path = package.replace(".", "/") + "/"
+    if ".egg" in pfile:
+        pdir = pfile.split(".egg")[0] + ".egg"
+    else:
+        pdir = os.path.dirname(pfile)
+
+    modules = []
+    if os.path.isfile(pdir):
+        # Modules zipped inside lib installed egg
+        zip = zipfile.ZipFile(pdir)
+        for info in zip.infolist():
+            if pkg_path in info.filename and info.filename.endswith(suffix):
+                mod_file = info.filename.replace(pkg_path, "")
+                modules.append((mod_file, "%i-%i" % (info.CRC, info.file_size)))
+        zip.close()
+    else:
+        if ".egg" in pdir: pdir += "/" + pkg_path
+        for mod_file in os.listdir(pdir):
+            if not mod_file.endswith(suffix): continue
+            if not os.path.isfile(os.path.join(pdir, mod_file)): continue
+            stat = os.stat(os.path.join(pdir, mod_file))
+            modules.append((mod_file, "%r-%i" % (stat.st_mtime, stat.st_size)))
+
+    return [(package + "." + mod_file.split(".py")[0], signature)
+            for (mod_file, signature) in modules]
+
+def read_module(module_name, base_class):
+    """ Metadata of the base_class subclasses in a module
+
+    Metrics classes without data source are not included.
+    """
+    from vizgrimoire.metrics.metrics import Metrics
+
+    __import__(module_name)
+    classes = []
+    for name, cls in inspect.getmembers(sys.modules[module_name], inspect.isclass):
+        if not issubclass(cls, base_class) or cls == base_class: continue
+        meta = {"class": name, "id": cls.id}
+        if issubclass(cls, Metrics):
+            if cls.data_source is None: continue
+            meta["data_source"] = cls.data_source.get_name()
+            meta["depends_on"] = list(cls.depends_on)
+            meta["filters"] = cls()._get_top_supported_filters()
+        classes.append(meta)
+    return classes
+
+def get_class(meta):
+    """ Class described by the metadata, importing its module """
+    __import__(meta["module"])
+    return getattr(sys.modules[meta["module"]], meta["class"])
+
+
+class PluginRegistry(object):
+    """ Metadata of the metrics and studies classes in a cached manifest
+
+    Getting the classes available needs to import all the modules, so
+    their id, data source (for metrics) and supported filters are kept in
+    a manifest file, updated only when the modules change. Modules are
+    imported when some of their classes are used.
+    """
+
+    default_manifest = os.path.join(os.path.expanduser("~"), ".cache",
+                                    "grimoirelib", "registry.json")
+
+    def __init__(self, manifest_file = None):
+        if manifest_file is None: manifest_file = PluginRegistry.default_manifest
+        self.manifest_file = manifest_file
+        self.modules = self._read_manifest()
+        self.changed = False
+
+    def _read_manifest(self):
+        try:
+            manifest = json.load(open(self.manifest_file))
+        except (IOError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION: return {}
+        return manifest["modules"]
+
+    def write(self):
+        """ Write the manifest if changed. Errors are logged, not raised """
+        if not self.changed: return
+        manifest = {"version": MANIFEST_VERSION, "modules": self.modules}
+        try:
+            manifest_dir = os.path.dirname(self.manifest_file)
+            if manifest_dir and not os.path.isdir(manifest_dir):
+                os.makedirs(manifest_dir)
+            # Written in a temporary file so parallel runs read a complete one
+            (fd, tmp_file) = tempfile.mkstemp(dir = manifest_dir or None)
+            tmp = os.fdopen(fd, "w")
+            json.dump(manifest, tmp)
+            tmp.close()
+            os.rename(tmp_file, self.manifest_file)
+            self.changed = False
+        except (IOError, OSError), e:
+            logging.warning("Can not write registry manifest " + self.manifest_file + ": " + str(e))
+
+    def scan(self, package, suffix, base_class):
+        """ Metadata of the base_class classes in the modules of a package
+
+        The modules are imported only if the package is not in the manifest
+        or any of its files has changed (classes can be imported from other
+        modules). Returns a list of dicts with the metadata of each class,
+        including its module, in the order in which they are found.
+        """
+        signature = ",".join(["%s:%s" % module for module in list_modules(package, ".py")])
+        entry = self.modules.get(package)
+        if entry is None or entry["signature"] != signature:
+            logging.info("Reading classes in " + package)
+            classes = []
+            for (module_name, mod_signature) in list_modules(package, suffix):
+                for meta in read_module(module_name, base_class):
+                    meta["module"] = module_name
+                    classes.append(meta)
+            entry = {"signature": signature, "classes": classes}
+            self.modules[package] = entry
+            self.changed = True
+        return [dict(meta) for meta in entry["classes"]]
+
+    @staticmethod
+    def select_metrics(metrics, data_sources = None, ids = None):
+        """ Metadata of the metrics of data_sources names with ids
+
+        The metrics the selected ones depend on are included. None for
+        data_sources or ids selects all of them.
+        """
+        if data_sources is not None:
+            metrics = [meta for meta in metrics if meta["data_source"] in data_sources]
+        if ids is None: return metrics
+        ids = list(ids)
+        while True:
+            selected = [meta for meta in metrics if meta["id"] in ids]
+            new_ids = [dep_id for meta in selected for dep_id in meta["depends_on"]
+                       if dep_id not in ids]
+            if not new_ids: return selected
+            ids += new_ids
@@ -40,6 +40,7 @@ from vizgrimoire.metrics.metrics import Metrics
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.analysis.analyses import Analyses
 from vizgrimoire.metrics.query_builder import DSQuery
+from vizgrimoire.registry import PluginRegistry, get_class
 
 class Report(object):
     """Basic class for a Grimoire automator based dashboard"""
@@ -49,20 +50,30 @@ class Report(object):
     _items = None
     _all_data_sources = []
     _all_studies = []
+    _studies_meta = []
     _on_studies = []
     _automator = None
     _automator_file = None
 
     @staticmethod
-    def init(automator_file, metrics_path = None):
+    def init(automator_file, metrics_path = None, data_sources = None,
+             metrics = None, studies = None):
+        """ Read the config and register the metrics and studies
+
+        Only the metrics of data_sources names with metrics ids, and the
+        studies configured with studies ids, are registered if they are not
+        None. Their modules are found using the registry manifest, so only
+        the ones needed are imported.
+        """
         Report._automator_file = automator_file
         Report._automator = read_main_conf(automator_file)
         Report._init_filters()
         Report._init_data_sources()
         if metrics_path is not None:
-            Report._init_metrics(metrics_path)
-            studies_path = metrics_path.replace("metrics","analysis")
-            Report._init_studies(studies_path)
+            registry = PluginRegistry()
+            Report._init_metrics(registry, data_sources, metrics)
+            Report._init_studies(registry, studies)
+            registry.write()
 
     @staticmethod
     def _init_filters():
@@ -123,15 +134,8 @@ class Report(object):
         return metric_filters
 
     @staticmethod
-    def _init_metrics(metrics_path):
-        """Register all available metrics"""
-
-        # logging.info("Loading metrics modules from %s" % (metrics_path))
-        # sys.path.insert(1,metrics_path) # Prepend the metrics path
-
-        from os import listdir
-        from os.path import isfile, isdir, join, dirname
-        import imp, inspect
+    def _init_metrics(registry, data_sources = None, metrics_ids = None):
+        """Register the available metrics"""
 
         db_identities = Report._automator['generic']['db_identities']
         db_projects = None
@@ -140,113 +144,60 @@ class Report(object):
         dbuser = Report._automator['generic']['db_user']
         dbpass = Report._automator['generic']['db_password']
 
-        # Read all available metrics installed in GrimoireLib egg
-        metrics_pkg = "vizgrimoire.metrics"
-        import vizgrimoire.metrics
-        mfile = inspect.getfile(vizgrimoire.metrics)
-        if ".egg" in mfile:
-            mdir = mfile.split(".egg")[0] + ".egg"
-        else:
-            mdir = dirname(mfile)
-
-        if isfile(mdir):
-            # Load list of metrics from files zipped inside lib installed egg
-            import zipfile
-            zip = zipfile.ZipFile(mdir)
-            metrics_mod = [f.replace("vizgrimoire/metrics/","") for f in zip.namelist()
-                           if "vizgrimoire/metrics/" in f and f.endswith(".py")]
-            zip.close()
-        else:
-            # Load list of metrics from metrics directory
-            if ".egg" in mdir: mdir += "/vizgrimoire/metrics/"
-            metrics_mod = [f for f in listdir(mdir)
-                           if isfile(join(mdir,f)) and f.endswith("_metrics.py")]
-
-        for metric_mod in metrics_mod:
-            mod_name = metric_mod.split(".py")[0]
-            mod = __import__(metrics_pkg+"."+mod_name)
-            # Support for having more than one metric per module
-            metrics_classes = [c for name, c in inspect.getmembers(sys.modules[metrics_pkg+"."+mod_name])
-                               if inspect.isclass(c) and issubclass(c, Metrics)]
-
-            for metrics_class in metrics_classes:
-                ds = metrics_class.data_source
-                if ds is None: continue
-                if ds.get_db_name() not in Report._automator['generic']: continue
-                builder = ds.get_query_builder()
-                db = Report._automator['generic'][ds.get_db_name()]
-                metric_filters = Report.get_default_filter()
-                if (ds.get_global_filter(ds) is not None):
-                    metric_filters.global_filter = ds.get_global_filter(ds)
-                metrics = metrics_class(builder(dbuser, dbpass, db, db_identities, db_projects), metric_filters)
-                ds.add_metrics(metrics, ds)
-                if ds == ITS.ITS:
-                    db_its1_name = ITS_1.ITS_1.get_db_name()
-                    if db_its1_name in Report._automator['generic']:
-                        db_its1 = Report._automator['generic'][db_its1_name]
-                        metric_filters = Report.get_default_filter()
-                        metric_filters.set_closed_condition(ITS_1.ITS_1._get_closed_condition())
-                        metrics = metrics_class(builder(dbuser, dbpass, db_its1, db_identities, db_projects), metric_filters)
-                        ITS_1.ITS_1.add_metrics(metrics, ITS_1.ITS_1)
-
-                # Specific filters
-                if ds.get_name() == "scr":
-                    if 'scr_start_date' in Report._automator['r']:
-                        metrics.filters.start_date = Report._automator['r']['scr_start_date']
+        its1_on = data_sources is None or ITS_1.ITS_1.get_name() in data_sources
+        if data_sources is not None and its1_on:
+            # ITS_1 metrics are created from the ITS ones
+            data_sources = data_sources + [ITS.ITS.get_name()]
+
+        # Metrics installed in GrimoireLib egg, read from the registry manifest
+        metrics_meta = registry.scan("vizgrimoire.metrics", "_metrics.py", Metrics)
+        metrics_meta = PluginRegistry.select_metrics(metrics_meta, data_sources, metrics_ids)
+        all_ds = dict([(ds.get_name(), ds) for ds in Report._all_data_sources])
+
+        for meta in metrics_meta:
+            ds = all_ds.get(meta["data_source"])
+            if ds is None: ds = get_class(meta).data_source
+            if ds.get_db_name() not in Report._automator['generic']: continue
+            metrics_class = get_class(meta)
+            builder = ds.get_query_builder()
+            db = Report._automator['generic'][ds.get_db_name()]
+            metric_filters = Report.get_default_filter()
+            if (ds.get_global_filter(ds) is not None):
+                metric_filters.global_filter = ds.get_global_filter(ds)
+            metrics = metrics_class(builder(dbuser, dbpass, db, db_identities, db_projects), metric_filters)
+            ds.add_metrics(metrics, ds)
+            if ds == ITS.ITS and its1_on:
+                db_its1_name = ITS_1.ITS_1.get_db_name()
+                if db_its1_name in Report._automator['generic']:
+                    db_its1 = Report._automator['generic'][db_its1_name]
+                    metric_filters = Report.get_default_filter()
+                    metric_filters.set_closed_condition(ITS_1.ITS_1._get_closed_condition())
+                    metrics = metrics_class(builder(dbuser, dbpass, db_its1, db_identities, db_projects), metric_filters)
+                    ITS_1.ITS_1.add_metrics(metrics, ITS_1.ITS_1)
+
+            # Specific filters
+            if ds.get_name() == "scr":
+                if 'scr_start_date' in Report._automator['r']:
+                    metrics.filters.start_date = Report._automator['r']['scr_start_date']
 
     @staticmethod
-    def _init_studies(studies_path):
-        """Register all available studies"""
-        # logging.info("Loading studies modules from %s" % (studies_path))
-        # sys.path.insert(1,studies_path) # Prepend the studies path
-
-        from os import listdir
-        from os.path import isfile, join, dirname
-        import imp, inspect
+    def _init_studies(registry, studies_ids = None):
+        """Register the available studies"""
 
-        db_identities = Report._automator['generic']['db_identities']
-        dbuser = Report._automator['generic']['db_user']
-        dbpass = Report._automator['generic']['db_password']
         if 'studies' not in Report._automator['r']:
             logging.info("No studies configured.")
             return
         studies_on = Report._automator['r']['studies'].split(",")
-
-        # Read all available studies installed in GrimoireLib egg
-        studies_pkg = "vizgrimoire.analysis"
-        import vizgrimoire.analysis
-        mfile = inspect.getfile(vizgrimoire.analysis)
-
-        if ".egg" in mfile:
-            mdir = mfile.split(".egg")[0] + ".egg"
-        else:
-            mdir = dirname(mfile)
-        if isfile(mdir):
-            # Load list of analysis from files zipped inside lib installed egg
-            mfile = mfile.split(".egg")[0] + ".egg"
-            import zipfile
-            zip = zipfile.ZipFile(mdir)
-            studies_mod = [f.replace("vizgrimoire/analysis/","") for f in zip.namelist()
-                           if "vizgrimoire/analysis/" in f and f.endswith(".py")]
-            zip.close()
-        else:
-            # Load list of analysis from analysis directory
-            if ".egg" in mdir: mdir += "/vizgrimoire/analysis/"
-            studies_mod = [f for f in listdir(mdir)
-                           if isfile(join(studies_path,f)) and f.endswith(".py")]
-
-        for study_mod in studies_mod:
-            mod_name = study_mod.split(".py")[0]
-            mod = __import__(studies_pkg+"."+mod_name)
-            # Support for having more than one study per module
-            studies_classes = [c for name, c in inspect.getmembers(sys.modules[studies_pkg+"."+mod_name])
-                               if inspect.isclass(c) and issubclass(c, Analyses)]
-            for study_class in studies_classes:
-                if study_class == Analyses: continue
-                Report._all_studies.append(study_class)
-                if study_class.id is None or study_class.id not in studies_on: continue
-                # logging.info("Adding new study: " + study_class.id)
-                Report._on_studies.append(study_class)
+        if studies_ids is not None:
+            studies_on = [study_id for study_id in studies_on if study_id in studies_ids]
+
+        # Studies installed in GrimoireLib egg, read from the registry manifest
+        Report._studies_meta = registry.scan("vizgrimoire.analysis", ".py", Analyses)
+        Report._all_studies = None # imported if needed
+        for meta in Report._studies_meta:
+            if meta["id"] is None or meta["id"] not in studies_on: continue
+            # logging.info("Adding new study: " + meta["id"])
+            Report._on_studies.append(get_class(meta))
         #  logging.info("Total studies: " + str(len(Report._on_studies)))
 
 
@@ -332,6 +283,8 @@ class Report(object):
 
     @staticmethod
     def get_all_studies():
+        if Report._all_studies is None:
+            Report._all_studies = [get_class(meta) for meta in Report._studies_meta]
         return Report._all_studies
 
     @staticmethod